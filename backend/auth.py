@@ -1,14 +1,121 @@
 from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from firebase_admin import auth
+from firebase_admin import auth, _token_gen
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict
+from threading import Lock
 from typing import Optional
+import asyncio
+import hashlib
+import re
+import time
 from config import settings
-from firebase_config import get_db
+from services.profile_cache import profile_exists
+from utils.local_jwt import LocalTokenVerifier
 
 # Security scheme for Swagger UI
 security = HTTPBearer(auto_error=False)
 
 
+class _VerifiedTokenCache:
+    """
+    Bounded LRU of decoded ID token claims, keyed by a SHA-256 of the raw token so tokens
+    are never held in memory. Entries are dropped at the token's own `exp`.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key_for(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """Return cached claims if unexpired and, when max_age is set, verified within max_age seconds."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, verified_at = entry
+            if claims.get("exp", 0) <= time.time() or (max_age and time.monotonic() - verified_at > max_age):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key: str, claims: dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (claims, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = _VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+_local_verifier: Optional[LocalTokenVerifier] = None
+
+
+def _id_token_verifier():
+    """Return the callable that verifies bearer tokens: Firebase Auth, or the local
+    load-test verifier when LOAD_TEST_JWT_PUBLIC_KEY_PATH is configured."""
+    global _local_verifier
+    if not settings.LOAD_TEST_JWT_PUBLIC_KEY_PATH:
+        return auth.verify_id_token
+    if _local_verifier is None:
+        with open(settings.LOAD_TEST_JWT_PUBLIC_KEY_PATH, "rb") as f:
+            _local_verifier = LocalTokenVerifier(f.read())
+    return _local_verifier
+
+
+async def _verify_token(token: str) -> dict:
+    """Return decoded claims for a Firebase ID token, verifying it only on a cache miss."""
+    revocation_interval = settings.AUTH_REVOCATION_CHECK_SECONDS
+    key = _VerifiedTokenCache.key_for(token)
+    claims = _token_cache.get(key, max_age=revocation_interval or None)
+    if claims is not None:
+        return claims
+
+    # Signature verification (and the occasional certificate fetch) is blocking work
+    claims = await run_in_threadpool(_id_token_verifier(), token, check_revoked=revocation_interval > 0)
+    _token_cache.put(key, claims)
+    return claims
+
+
+def refresh_signing_keys() -> int:
+    """
+    Force a fresh fetch of Google's ID token signing certificates into the Admin SDK's
+    cache-control session, so verify_id_token keeps reading them from memory.
+    Returns the number of seconds until the fetched certificates go stale.
+    """
+    # The SDK's certificate transport is private, but it is the cache verify_id_token reads from
+    request = auth._get_client(None)._token_verifier.request
+    response = request(_token_gen.ID_TOKEN_CERT_URI, method="GET", headers={"Cache-Control": "no-cache"})
+    if response.status != 200:
+        raise RuntimeError(f"Signing key fetch returned HTTP {response.status}")
+    match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+    return int(match.group(1)) if match else 3600
+
+
+async def keep_signing_keys_warm():
+    """Background task: refresh the signing certificates shortly before their cache-control expiry."""
+    while True:
+        try:
+            max_age = await run_in_threadpool(refresh_signing_keys)
+            delay = max(max_age - settings.AUTH_KEY_REFRESH_MARGIN_SECONDS, 60)
+        except Exception as e:
+            print(f"Warning: failed to refresh Firebase signing keys: {str(e)}")
+            delay = 60
+        await asyncio.sleep(delay)
+
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> str:
     # Development mode bypass — X-Dev-User-ID header lets the Postman
@@ -27,8 +134,8 @@ async def get_current_user(
     token = credentials.credentials
     
     try:
-        # Verify the Firebase ID token using Firebase Admin SDK
-        decoded_token = auth.verify_id_token(token)
+        # Verify the Firebase ID token using Firebase Admin SDK (cached until the token expires)
+        decoded_token = await _verify_token(token)
         user_id = decoded_token['uid']
         return user_id
     except auth.InvalidIdTokenError:
@@ -86,12 +193,8 @@ async def verify_profile_exists(
     if settings.DEV_MODE:
         return current_user_id
 
-    db = get_db()
-    # .get() is necessary to check existence. 
-    # This counts as 1 read in Firestore.
-    profile_ref = db.collection("profiles").document(current_user_id)
-    
-    if not profile_ref.get().exists:
+    # Served from the shared profile cache; only a miss costs a Firestore read.
+    if not profile_exists(current_user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Profile setup required. Please create a profile to access this resource."
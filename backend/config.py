@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Literal
 
 class Settings(BaseSettings):
     API_HOST: str = "0.0.0.0"
@@ -12,6 +12,93 @@ class Settings(BaseSettings):
     DEV_MODE: bool = False
     DEV_USER_ID: str = "dev_test_user_123"
     DEV_USER_ID_2: str = "dev_test_user_456"
+
+    # Load testing only: verify bearer tokens against this local RS256 public key instead of
+    # Firebase Auth (see scripts/load_test_tokens.py). WARNING: NOT FOR PRODUCTION USE
+    LOAD_TEST_JWT_PUBLIC_KEY_PATH: str = ""
+
+    # Verified ID token cache (decoded claims are reused until the token's exp)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # When > 0, cached tokens are re-verified with a revocation check after this many seconds
+    AUTH_REVOCATION_CHECK_SECONDS: int = 0
+    # In-process profile existence/summary cache shared by auth, posts, reviews and conversations
+    PROFILE_CACHE_TTL_SECONDS: int = 60
+    PROFILE_CACHE_NEGATIVE_TTL_SECONDS: int = 5
+    PROFILE_CACHE_MAX_SIZE: int = 10000
+    # In-process cache of conversation participant lists for message reads. Participants never change;
+    # a deletion is invalidated on the worker that accepts it and the one that runs its job, so the
+    # TTL bounds how long other workers keep serving reads. Broadcasts always read fresh.
+    PARTICIPANT_CACHE_TTL_SECONDS: int = 60
+    PARTICIPANT_CACHE_MAX_SIZE: int = 10000
+    # In-process cache of each active user's first inbox page, invalidated by writes on this worker.
+    # Other workers' writes show up after the TTL, or at once with a listener per cached inbox.
+    INBOX_CACHE_TTL_SECONDS: int = 30
+    INBOX_CACHE_MAX_SIZE: int = 5000
+    INBOX_CACHE_LISTENERS_ENABLED: bool = False
+    # Keep Google's signing certificates warm in the background so verification never fetches them inline
+    AUTH_KEY_REFRESH_ENABLED: bool = True
+    AUTH_KEY_REFRESH_MARGIN_SECONDS: int = 300  # refresh this long before cache-control expiry
+
+    # Per-user token buckets for expensive endpoints, as "<count>/<second|minute|hour>".
+    # "memory" buckets are per worker; "firestore" shares them across workers via the rate_limits collection
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "firestore"] = "memory"
+    RATE_LIMITS: Dict[str, str] = {
+        "like": "30/minute",          # POST, PUT and DELETE /posts/{post_id}/like (shared)
+        "send_message": "60/minute",  # POST /conversations/{conversation_id}/messages
+        "send_message_batch": "20/minute",  # POST /conversations/{conversation_id}/messages:batch
+        "broadcast_message": "10/minute",   # POST /messages:broadcast
+        "list_posts": "120/minute",   # GET /posts and GET /posts/trending
+    }
+    # Most user x bucket entries the "memory" backend keeps per worker
+    RATE_LIMIT_MEMORY_MAX_BUCKETS: int = 100000
+
+    # Likes are counted in this many posts/{id}/likeShards documents; more shards absorb bigger bursts
+    LIKE_COUNTER_SHARDS: int = 10
+    # How often shard totals are rolled up into each post's likes field (used for feed sorting)
+    LIKE_COUNT_ROLLUP_SECONDS: float = 5.0
+    # Write-behind likes: buffer like/unlike in process, answer from the buffer and flush coalesced
+    # per-post batches every LIKE_FLUSH_INTERVAL_MS. Buffered likes are lost if a worker dies uncleanly.
+    LIKE_WRITE_BEHIND_ENABLED: bool = False
+    LIKE_FLUSH_INTERVAL_MS: int = 250
+    # Most (post, user) like states the buffer remembers after flushing, so retried requests are no-ops
+    LIKE_BUFFER_KNOWN_STATES_MAX_SIZE: int = 100000
+    # Trending score: likes decayed with this half-life, re-decayed for all active posts every sweep
+    TRENDING_HALF_LIFE_HOURS: float = 6.0
+    # One worker at a time runs the decay sweep, under a lease in the backgroundLeases collection
+    TRENDING_SWEEP_SECONDS: int = 900
+    TRENDING_MIN_SCORE: float = 0.01  # scores below this are zeroed and leave the sweep
+    # DELETE /conversations/{id} queues a job (conversationDeletionJobs collection) that each worker
+    # process runs in the background, CONVERSATION_DELETE_WORKERS jobs at a time. Messages are deleted
+    # through a bulk writer CONVERSATION_DELETE_CHUNK_SIZE at a time, saving progress after each chunk.
+    # Unfinished jobs, including ones whose worker stopped heartbeating, are picked up every rescan.
+    CONVERSATION_DELETE_WORKERS: int = 2
+    CONVERSATION_DELETE_CHUNK_SIZE: int = 500
+    CONVERSATION_DELETE_MAX_OPS_PER_SECOND: int = 500
+    CONVERSATION_DELETE_RESCAN_SECONDS: int = 60
+    CONVERSATION_DELETE_LEASE_SECONDS: int = 120
+    # Server-sent event streams share one Firestore listener per conversation (or per user's inbox) in
+    # each worker process, up to REALTIME_MAX_LISTENERS. A subscriber that falls REALTIME_SUBSCRIBER_QUEUE_SIZE
+    # events behind is sent a resync event and disconnected, and reconnects from its last event ID.
+    REALTIME_MAX_LISTENERS: int = 500
+    REALTIME_SUBSCRIBER_QUEUE_SIZE: int = 100
+    REALTIME_HEARTBEAT_SECONDS: float = 15.0
+    REALTIME_BACKFILL_PAGE_SIZE: int = 200
+    REALTIME_INBOX_LIMIT: int = 50
+    # Messages older than MESSAGE_COMPACTION_AGE_DAYS are rolled up MESSAGE_CHUNK_SIZE at a time into
+    # conversations/{id}/messageChunks documents, checked every MESSAGE_COMPACTION_INTERVAL_SECONDS.
+    # A chunk and the deletes of its messages share one batch, so MESSAGE_CHUNK_SIZE stays under 498.
+    # Off by default: compaction deletes the archived messages from the messages subcollection, and the
+    # frontend still reads that subcollection directly (subscribeConversationMessages). Only enable it
+    # once clients read history through GET /conversations/{id}/messages or the SSE stream.
+    MESSAGE_COMPACTION_ENABLED: bool = False
+    MESSAGE_CHUNK_SIZE: int = 300
+    MESSAGE_COMPACTION_AGE_DAYS: int = 30
+    MESSAGE_COMPACTION_INTERVAL_SECONDS: int = 3600
+    # Broadcasts write this many conversations per batch (two writes each), with at most
+    # MESSAGE_BROADCAST_CONCURRENCY batches committing at once
+    MESSAGE_BROADCAST_BATCH_SIZE: int = 100
+    MESSAGE_BROADCAST_CONCURRENCY: int = 4
     
     # CORS configuration
     CORS_ORIGINS: List[str] = [
@@ -33,6 +120,14 @@ class Settings(BaseSettings):
     # Google Maps API Key (for geocoding and location services)
     GOOGLE_MAPS_API_KEY: str = ""
     GOOGLE_MAPS_API_TIMEOUT: int = 5  # seconds
+    # How long location_cache remembers failed lookups before the API is tried again
+    LOCATION_NEGATIVE_CACHE_TTL_SECONDS: int = 86400  # ZIPs that returned ZERO_RESULTS
+    LOCATION_ERROR_BACKOFF_SECONDS: int = 60  # quota and transient errors
+    # Serve radius searches from location.geohashPrefixes instead of a lat/lng range scan.
+    # Enable only after scripts/backfill_geohash_prefixes.py has run against existing data.
+    GEOHASH_PREFIX_QUERIES: bool = False
+    # How often the in-process nearest-ZIP index is rebuilt from location_cache
+    ZIP_INDEX_REFRESH_SECONDS: int = 3600
 
     # Google Cloud Storage configuration
     GOOGLE_STORAGE_BUCKET: str = ""
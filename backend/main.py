@@ -3,14 +3,50 @@ from fastapi.middleware.cors import CORSMiddleware
 from routers import profiles, posts, likes, location, conversations, messages, reviews
 from config import settings
 from firebase_config import initialize_firebase
-from contextlib import asynccontextmanager
+from auth import keep_signing_keys_warm
+from services.like_service import keep_like_counts_rolled_up, roll_up_like_counts
+from services.like_buffer import like_buffer
+from services.trending_service import keep_trending_scores_decayed
+from services.conversation_deletion import deletion_queue
+from services.message_archive import keep_messages_compacted
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize Firebase on startup
     initialize_firebase()
+
+    # Emulator, dev-mode and load-test tokens aren't signed by Google, so there are no keys to keep warm
+    background_tasks = []
+    if (settings.AUTH_KEY_REFRESH_ENABLED and not settings.DEV_MODE and not settings.LOAD_TEST_JWT_PUBLIC_KEY_PATH
+            and not os.getenv("FIREBASE_AUTH_EMULATOR_HOST")):
+        background_tasks.append(asyncio.create_task(keep_signing_keys_warm()))
+    background_tasks.append(asyncio.create_task(keep_like_counts_rolled_up()))
+    background_tasks.append(asyncio.create_task(keep_trending_scores_decayed()))
+    # Picks up deletion jobs left unfinished by a previous run as well as new ones
+    background_tasks.append(asyncio.create_task(deletion_queue.run()))
+    if settings.LIKE_WRITE_BEHIND_ENABLED:
+        background_tasks.append(asyncio.create_task(like_buffer.run()))
+    if settings.MESSAGE_COMPACTION_ENABLED:
+        background_tasks.append(asyncio.create_task(keep_messages_compacted()))
+
     yield
+
     # Shutdown actions can be added here
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Persist buffered likes (flush waits for one the cancelled loop left running in the threadpool),
+    # then don't leave posts liked in the last roll-up interval with a stale likes field
+    try:
+        await run_in_threadpool(like_buffer.flush)
+        await run_in_threadpool(roll_up_like_counts)
+    except Exception as e:
+        print(f"Warning: failed to persist likes on shutdown: {str(e)}")
 
 app = FastAPI(
     title="Jam Find Profile API",
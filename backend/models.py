@@ -224,8 +224,7 @@ class PostResponse(PostBase):
     first_name: str = Field(..., alias="firstName", description="First name of the post creator")
     last_name: str = Field(..., alias="lastName", description="Last name of the post creator")
     profile_pic_url: Optional[str] = Field(default=None, alias="profilePicUrl", description="URL to the post creator's profile picture")
-    liked_by: Optional[List[str]] = Field(default_factory=list, exclude=True, alias="likedBy", description="List of user IDs who liked the post")  # Exclude from API response for privacy
-    likes: int = Field(..., alias="likes", description="Computed from liked_by array length")
+    likes: int = Field(..., alias="likes", description="Total likes, aggregated from the post's like counter shards")
     liked_by_current_user: bool = Field(default=False, alias="likedByCurrentUser", description="Whether the current user has liked this post")
     edited: bool = Field(..., alias="edited", description="Boolean flag set to true when the post has been modified after creation")
     created_at: datetime = Field(..., alias="createdAt", description="Timestamp of when the post was created")
@@ -271,7 +270,7 @@ class PostListParams(BaseModel):
     radius_miles: Optional[float] = Field(default=None, ge=0)
     user_lat: Optional[float] = None
     user_lng: Optional[float] = None
-    sort_by: Literal["createdAt", "likes", "distance"] = "createdAt"
+    sort_by: Literal["createdAt", "likes", "distance", "trending"] = "createdAt"
     sort_order: Literal["asc", "desc"] = "desc"
     user_id: Optional[str] = None
     page: int = Field(default=0, ge=0)
@@ -348,6 +347,39 @@ class MessageResponse(MessageBase):
         populate_by_name = True
     )
 
+
+
+class MessageBatchCreate(BaseModel):
+    """Several messages sent to one conversation at once, stored in the order given."""
+    messages: List[MessageCreate] = Field(..., min_length=1, max_length=50, description="Messages to send, oldest first")
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class MessageBatchResponse(BaseModel):
+    """Response model for a batch send."""
+    messages: List[MessageResponse] = Field(..., description="The stored messages, oldest first")
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class MessageBroadcastCreate(MessageBase):
+    """One message sent to several of the sender's existing conversations."""
+    conversation_ids: List[str] = Field(..., min_length=1, max_length=200, alias="conversationIds",
+                                        description="Conversations to post the message to")
+
+
+class BroadcastFailure(BaseModel):
+    """A conversation the broadcast could not be sent to."""
+    conversation_id: str = Field(..., alias="conversationId")
+    status_code: int = Field(..., alias="statusCode", description="HTTP status a single send would have returned")
+    detail: str
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class MessageBroadcastResponse(BaseModel):
+    """Response model for a broadcast: what was sent and where it failed."""
+    sent: List[MessageResponse] = Field(default_factory=list)
+    failed: List[BroadcastFailure] = Field(default_factory=list)
+    model_config = ConfigDict(populate_by_name=True)
     
 class ConversationCreate(BaseModel):
     """Model for creating a new conversation. Inherits from ConversationBase."""
@@ -390,6 +422,16 @@ class ConversationResponse(BaseModel):
         default_factory=dict,
         alias="participantSnapshots",
         description="Denormalized profile snapshots keyed by participant user ID")
+
+    unread_counts: Dict[str, int] = Field(
+        default_factory=dict,
+        alias="unreadCounts",
+        description="Messages each participant hasn't read yet, keyed by participant user ID")
+
+    last_read_at: Dict[str, datetime] = Field(
+        default_factory=dict,
+        alias="lastReadAt",
+        description="When each participant last read the conversation, keyed by participant user ID")
     
     model_config = ConfigDict(
         from_attributes = True,
@@ -403,7 +445,7 @@ class PaginatedConversationsResponse(BaseModel):
         ..., alias="conversations",
         description="List of conversations for the current page"
         )
-    # Using last document ID as the pagination token for simplicity and efficiency as the token.
+    # Opaque keyset cursor (updatedAt + ID of the last conversation on the page), see utils/cursors.py
     next_page_token: Optional[str] = Field( 
         default=None, alias="nextPageToken",
         description="Token to retrieve the next page of results, if any"
@@ -413,6 +455,34 @@ class PaginatedConversationsResponse(BaseModel):
         populate_by_name = True
     )
 
+class UnreadSummaryResponse(BaseModel):
+    """Unread totals across the current user's conversations, for badges."""
+    total_unread: int = Field(..., alias="totalUnread", description="Unread messages across all conversations")
+    unread_conversation_ids: List[str] = Field(
+        default_factory=list, alias="unreadConversationIds",
+        description="Conversations with at least one unread message")
+
+    model_config = ConfigDict(
+        populate_by_name = True
+    )
+
+
+class ConversationDeletionJobResponse(BaseModel):
+    """Status of a background conversation deletion, returned by DELETE /conversations/{id}."""
+    job_id: str = Field(..., alias="jobId", description="ID of the deletion job")
+    conversation_id: str = Field(..., alias="conversationId", description="Conversation being deleted")
+    status: Literal["queued", "running", "completed"] = Field(..., description="Job state")
+    deleted_messages: int = Field(default=0, alias="deletedMessages", description="Messages deleted so far")
+    error: Optional[str] = Field(default=None, description="Error from the last failed attempt, if any; the job is retried")
+    created_at: datetime = Field(..., alias="createdAt", description="When the deletion was requested")
+    updated_at: datetime = Field(..., alias="updatedAt", description="Last progress update")
+    completed_at: Optional[datetime] = Field(default=None, alias="completedAt", description="When the deletion finished")
+
+    model_config = ConfigDict(
+        populate_by_name = True
+    )
+
+
 class ReviewCreate(BaseModel):
     """Model for creating a new review of another user."""
     rating: int = Field(..., ge=1, le=5, alias="rating", description="Star rating from 1 to 5")
@@ -0,0 +1,124 @@
+from fastapi import HTTPException, status, Depends
+from firebase_config import get_db
+from google.cloud import firestore
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+import math
+import re
+import time
+from config import settings
+from auth import get_current_user
+
+RATE_LIMITS_COLLECTION = "rate_limits"
+
+_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour)\s*$")
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """Parse '30/minute' into (bucket capacity, refill rate in tokens per second)."""
+    match = _LIMIT_RE.match(limit)
+    if not match:
+        raise ValueError(f"Invalid rate limit '{limit}'. Expected '<count>/<second|minute|hour>'")
+    capacity = int(match.group(1))
+    return capacity, capacity / _UNIT_SECONDS[match.group(2)]
+
+
+def _take_token(tokens: float, updated_at: float, now: float, capacity: int, rate: float) -> Tuple[bool, float, float]:
+    """Refill a token bucket up to now and try to take one token.
+    Returns (allowed, tokens_left, seconds_until_next_token)."""
+    tokens = min(capacity, tokens + max(now - updated_at, 0) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate if rate > 0 else float("inf")
+
+
+class InMemoryRateLimitStore:
+    """Per-process buckets. Limits only hold within one worker; fine for tests and single-worker runs.
+    Bounded LRU: the least recently used buckets are dropped first, and those have usually refilled anyway."""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = settings.RATE_LIMIT_MEMORY_MAX_BUCKETS if max_size is None else max_size
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            allowed, tokens, retry_after = _take_token(tokens, updated_at, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class FirestoreRateLimitStore:
+    """Buckets kept in the rate_limits collection so limits hold across workers.
+    Each check is one small transaction; expiresAt can back a Firestore TTL policy."""
+
+    def consume(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        db = get_db()
+        bucket_ref = db.collection(RATE_LIMITS_COLLECTION).document(key)
+
+        @firestore.transactional
+        def _txn(transaction):
+            snap = bucket_ref.get(transaction=transaction)
+            data = snap.to_dict() if snap.exists else {}
+            now = time.time()
+            allowed, tokens, retry_after = _take_token(
+                data.get("tokens", capacity), data.get("updatedAt", now), now, capacity, rate
+            )
+            # A bucket is full again after capacity / rate seconds; nothing worth keeping after that
+            ttl = capacity / rate if rate > 0 else 3600
+            transaction.set(bucket_ref, {
+                "tokens": tokens,
+                "updatedAt": now,
+                "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            })
+            return allowed, retry_after
+
+        return _txn(db.transaction())
+
+    def reset(self) -> None:
+        pass
+
+
+_stores = {"memory": InMemoryRateLimitStore, "firestore": FirestoreRateLimitStore}
+_store = _stores[settings.RATE_LIMIT_BACKEND]()
+
+
+def reset_rate_limits() -> None:
+    """Clear in-process buckets (used by tests)."""
+    _store.reset()
+
+
+def rate_limit(bucket: str):
+    """
+    Dependency factory enforcing the token bucket configured in RATE_LIMITS[bucket],
+    keyed by authenticated user and bucket. Exceeding it returns 429 with Retry-After.
+
+    Usage:
+        @router.post("/posts/{post_id}/like", dependencies=[Depends(rate_limit("like"))])
+    """
+    async def _check_rate_limit(current_user_id: str = Depends(get_current_user)):
+        if not settings.RATE_LIMIT_ENABLED or bucket not in settings.RATE_LIMITS:
+            return
+        capacity, rate = parse_limit(settings.RATE_LIMITS[bucket])
+        allowed, retry_after = await run_in_threadpool(_store.consume, f"{bucket}:{current_user_id}", capacity, rate)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded for {bucket}. Try again later.",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+            )
+
+    return _check_rate_limit
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, status, Depends, Query
+from fastapi import APIRouter, status, Depends, Query, Header
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from models import ConversationCreate, ConversationResponse, PaginatedConversationsResponse
+from models import (ConversationCreate, ConversationResponse, PaginatedConversationsResponse,
+                    ConversationDeletionJobResponse, UnreadSummaryResponse)
 from auth import get_current_user
-from services import conversation_service
+from services import conversation_service, realtime
+from services.profile_loader import ProfileLoader, get_profile_loader
 
 
 router = APIRouter()
@@ -10,9 +13,10 @@ router = APIRouter()
 @router.post("/conversations", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation: ConversationCreate,
-    current_user_id: str = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user),
+    loader: ProfileLoader = Depends(get_profile_loader)
 ):
-    return await conversation_service.create_conversation(conversation, current_user_id)
+    return await conversation_service.create_conversation(conversation, current_user_id, loader)
 
 
 @router.get("/conversations", response_model=PaginatedConversationsResponse)
@@ -24,6 +28,34 @@ async def list_conversations(
     return await conversation_service.list_conversations(current_user_id, limit, last_doc_id)
 
 
+@router.get("/conversations/events")
+async def inbox_events(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    cursor: Optional[str] = Query(None, description="Resume after this event ID (same as Last-Event-ID)"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """Server-sent events for the first page of the caller's inbox: conversation and conversation_removed."""
+    events = await realtime.inbox_event_stream(current_user_id, cursor or last_event_id)
+    return StreamingResponse(events, media_type="text/event-stream", headers=realtime.SSE_HEADERS)
+
+
+@router.get("/conversations/unread-summary", response_model=UnreadSummaryResponse)
+async def get_unread_summary(
+    current_user_id: str = Depends(get_current_user)
+):
+    """Unread totals for badges, without listing any messages."""
+    return await conversation_service.get_unread_summary(current_user_id)
+
+
+@router.get("/conversations/deletion-jobs/{job_id}", response_model=ConversationDeletionJobResponse)
+async def get_deletion_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Progress of a deletion started with DELETE /conversations/{conversation_id}."""
+    return await conversation_service.get_deletion_job(job_id, current_user_id)
+
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: str,
@@ -32,18 +64,43 @@ async def get_conversation(
     return await conversation_service.get_conversation_by_id(conversation_id, current_user_id)
 
 
+@router.get("/conversations/{conversation_id}/events")
+async def conversation_events(
+    conversation_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    cursor: Optional[str] = Query(None, description="Resume after this event ID (same as Last-Event-ID)"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """Server-sent message events for a conversation. Caller must be a participant."""
+    events = await realtime.conversation_event_stream(conversation_id, current_user_id, cursor or last_event_id)
+    return StreamingResponse(events, media_type="text/event-stream", headers=realtime.SSE_HEADERS)
+
+
+@router.post("/conversations/{conversation_id}/read", response_model=ConversationResponse)
+async def mark_conversation_read(
+    conversation_id: str,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Mark everything in the conversation as read by the caller."""
+    return await conversation_service.mark_conversation_read(conversation_id, current_user_id)
+
+
 @router.patch("/conversations/{conversation_id}/sync-snapshots", response_model=ConversationResponse)
 async def sync_conversation_snapshots(
     conversation_id: str,
-    current_user_id: str = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user),
+    loader: ProfileLoader = Depends(get_profile_loader)
 ):
     """Endpoint to rebuild participant snapshots from canonical profile documents.
     Caller must be a participant. Returns the updated conversation."""
-    return await conversation_service.refresh_participant_snapshots(conversation_id, current_user_id)
+    return await conversation_service.refresh_participant_snapshots(conversation_id, current_user_id, loader)
 
-@router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/conversations/{conversation_id}", response_model=ConversationDeletionJobResponse,
+               status_code=status.HTTP_202_ACCEPTED)
 async def delete_conversation(
     conversation_id: str,
     current_user_id: str = Depends(get_current_user)
 ):
-    await conversation_service.delete_conversation(conversation_id, current_user_id)
\ No newline at end of file
+    """Queues the deletion and returns its job; poll GET /conversations/deletion-jobs/{job_id} for progress.
+    The conversation is hidden from reads as soon as this returns."""
+    return await conversation_service.delete_conversation(conversation_id, current_user_id)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from models import Location
 from auth import get_current_user
-from utils.location import resolve_location_from_zip
+from utils.location import resolve_location_from_zip, GeocodingUnavailableError
+from utils.zip_index import nearest_zip
 from google.cloud import exceptions as gcp_exceptions
 
 router = APIRouter()
@@ -29,6 +30,12 @@ async def get_location_from_zip(
     except HTTPException:
         # Re-raise HTTP exceptions to be handled by FastAPI
         raise
+    except GeocodingUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -43,4 +50,38 @@ async def get_location_from_zip(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/location/nearest", response_model=Location)
+async def get_nearest_location(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Reverse-geocode coordinates (e.g. from browser geolocation) to the nearest known zip code.
+    Served from an in-process index over location_cache, so it never calls Google Maps.
+    """
+    try:
+        nearest = await nearest_zip(lat, lng)
+
+        if nearest is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No known zip codes to match against"
+            )
+
+        return nearest
+
+    except HTTPException:
+        raise
+    except gcp_exceptions.GoogleCloudError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database error while accessing location cache"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred: {str(e)}"
+        )
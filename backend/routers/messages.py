@@ -1,12 +1,15 @@
 from fastapi import APIRouter, status, Depends, Query
 from typing import Optional
-from models import MessageCreate, MessageResponse
+from models import (MessageCreate, MessageResponse, MessageBatchCreate, MessageBatchResponse,
+                    MessageBroadcastCreate, MessageBroadcastResponse)
 from auth import get_current_user
+from rate_limit import rate_limit
 from services import message_service
 
 
 router = APIRouter()
-@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(rate_limit("send_message"))])
 async def send_message(
     conversation_id: str,
     message: MessageCreate,
@@ -15,12 +18,36 @@ async def send_message(
     return await message_service.send_message(conversation_id, current_user_id, message)
 
 
+@router.post("/conversations/{conversation_id}/messages:batch", response_model=MessageBatchResponse,
+             status_code=status.HTTP_201_CREATED, dependencies=[Depends(rate_limit("send_message_batch"))])
+async def send_messages(
+    conversation_id: str,
+    batch: MessageBatchCreate,
+    current_user_id: str = Depends(get_current_user)
+):
+    return await message_service.send_messages(conversation_id, current_user_id, batch)
+
+
+@router.post("/messages:broadcast", response_model=MessageBroadcastResponse,
+             dependencies=[Depends(rate_limit("broadcast_message"))])
+async def broadcast_message(
+    broadcast: MessageBroadcastCreate,
+    current_user_id: str = Depends(get_current_user)
+):
+    return await message_service.broadcast_message(current_user_id, broadcast)
+
+
 @router.get("/conversations/{conversation_id}/messages")
 async def list_messages(
     conversation_id: str,
     limit: int = Query(20, ge=1),
     last_doc_id: Optional[str] = Query(None),
+    before: Optional[str] = Query(None, description="Page token or message ID; messages older than it"),
+    after: Optional[str] = Query(None, description="Page token or message ID; messages newer than it"),
+    around: Optional[str] = Query(None, description="Message ID; the page centred on that message"),
     current_user_id: str = Depends(get_current_user)
 ):
-    return await message_service.list_messages(conversation_id, current_user_id, limit, last_doc_id)
+    return await message_service.list_messages(
+        conversation_id, current_user_id, limit, last_doc_id, before=before, after=after, around=around
+    )
 
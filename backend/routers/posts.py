@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Annotated
+from typing import Annotated, Optional
 from models import PostCreate, PostUpdate, PostResponse, PaginatedPostsResponse, PostListParams
 from auth import get_current_user
-from services import post_service
+from rate_limit import rate_limit
+from services import post_service, trending_service
 
 router = APIRouter()
 
@@ -16,6 +17,20 @@ async def create_post(
     return await post_service.create_post(post, current_user_id)
 
 
+# Declared before /posts/{post_id} so "trending" isn't taken for a post ID
+@router.get("/posts/trending", response_model=PaginatedPostsResponse, dependencies=[Depends(rate_limit("list_posts"))])
+async def list_trending_posts(
+    limit: int = Query(20, ge=1, le=100),
+    user_lat: Optional[float] = Query(None, ge=-90, le=90),
+    user_lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_miles: Optional[float] = Query(None, ge=0),
+    current_user_id: str = Depends(get_current_user)
+):
+    if (user_lat is None) != (user_lng is None):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="user_lat and user_lng must be provided together.")
+    return await trending_service.list_trending_posts(current_user_id, limit, user_lat, user_lng, radius_miles)
+
+
 @router.get("/posts/{post_id}", response_model=PostResponse)
 async def get_post(
     post_id: str,
@@ -41,7 +56,7 @@ async def delete_post(
     return await post_service.delete_post(post_id, current_user_id)
 
 
-@router.get("/posts", response_model=PaginatedPostsResponse)
+@router.get("/posts", response_model=PaginatedPostsResponse, dependencies=[Depends(rate_limit("list_posts"))])
 async def list_posts(
     params: Annotated[PostListParams, Query()],
     current_user_id: str = Depends(get_current_user)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
 from typing import List, Optional
 from datetime import datetime, timezone
 from models import ProfileCreate, ProfileUpdate, ProfileResponse
@@ -7,7 +7,12 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud import exceptions as gcp_exceptions
 from firebase_admin import auth, storage
 from auth import get_current_user, verify_user_access
-from utils.location import resolve_location_from_zip
+from utils.location import resolve_location_from_zip, GeocodingUnavailableError, add_geohash_fields
+from services.profile_cache import profile_exists, prime_profile, invalidate_profile
+from services.conversation_service import sync_participant_snapshots
+
+# Profile fields copied into conversations' participant_snapshots
+SNAPSHOT_FIELDS = ("firstName", "lastName", "profilePicUrl")
 
 router = APIRouter()
 
@@ -51,6 +56,7 @@ async def create_profile(
             resolved = await resolve_location_from_zip(loc["zipCode"])
             if resolved:
                 profile_data["location"] = resolved.model_dump(by_alias=True)
+        add_geohash_fields(profile_data.get("location"))
 
         # Create profile document with timestamps
         now = datetime.now(timezone.utc)
@@ -59,12 +65,19 @@ async def create_profile(
 
         # Save to Firestore
         profiles_ref.document(profile.user_id).set(profile_data)
+        prime_profile(profile.user_id, profile_data)
         
         # Return the created profile
         return ProfileResponse(**profile_data)
         
     except HTTPException:
         raise
+    except GeocodingUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except gcp_exceptions.GoogleCloudError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -125,6 +138,7 @@ async def get_profile(
 async def update_profile(
     user_id: str,
     profile_update: ProfileUpdate,
+    background_tasks: BackgroundTasks,
     current_user_id: str = Depends(get_current_user)
 ):
     """Update a user profile (user can only update their own profile)"""
@@ -168,6 +182,7 @@ async def update_profile(
             resolved = await resolve_location_from_zip(loc["zipCode"])
             if resolved:
                 update_data["location"] = resolved.model_dump(by_alias=True)
+        add_geohash_fields(update_data.get("location"))
 
         # Add updated_at timestamp
         update_data["updatedAt"] = datetime.now(timezone.utc)
@@ -176,12 +191,26 @@ async def update_profile(
         profiles_ref.document(user_id).update(update_data)
 
         
+        snapshot_changed = any(
+            field in update_data and update_data[field] != existing_data.get(field) for field in SNAPSHOT_FIELDS
+        )
+
         # Merge data for the response
         existing_data.update(update_data)
+        prime_profile(user_id, existing_data)
+        if snapshot_changed:
+            # Runs after the response is sent
+            background_tasks.add_task(sync_participant_snapshots, user_id, existing_data)
         return ProfileResponse(**existing_data)
 
     except HTTPException:
         raise
+    except GeocodingUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except gcp_exceptions.GoogleCloudError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -272,6 +301,7 @@ def _delete_storage_files(user_id: str) -> None:
 @router.delete("/profiles/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_profile(
     user_id: str,
+    background_tasks: BackgroundTasks,
     current_user_id: str = Depends(get_current_user)
 ):
     verify_user_access(current_user_id, user_id)
@@ -280,7 +310,7 @@ async def delete_profile(
         db = get_db()
         profiles_ref = db.collection(COLLECTION_NAME)
 
-        if not profiles_ref.document(user_id).get().exists:
+        if not profile_exists(user_id, db):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Profile not found for userId: {user_id}"
@@ -306,7 +336,10 @@ async def delete_profile(
             profiles_ref.document(user_id).delete()
         except Exception as e:
             print(f"CLEANUP NEEDED: Auth deleted but profile remains for {user_id}: {str(e)}")
+        finally:
+            invalidate_profile(user_id)
 
+        background_tasks.add_task(sync_participant_snapshots, user_id, None)
         return None
     # Here we catch and re-raise HTTPExceptions to ensure they are returned as intended
     except HTTPException:
@@ -7,6 +7,8 @@ from google.cloud import exceptions as gcp_exceptions, firestore as firestore_cl
 from google.api_core import exceptions as api_exceptions
 from google.cloud.firestore_v1.base_query import FieldFilter
 from auth import get_current_user
+from services.profile_cache import profile_exists
+from services.profile_loader import ProfileLoader, get_profile_loader
 
 router = APIRouter()
 
@@ -59,6 +61,7 @@ async def create_review(
     user_id: str,
     review: ReviewCreate,
     current_user_id: str = Depends(get_current_user),
+    loader: ProfileLoader = Depends(get_profile_loader),
 ):
     """Submit a star rating (1–5) and optional text review for another user.
     A user may not review themselves, and may only submit one review per reviewed user."""
@@ -70,23 +73,24 @@ async def create_review(
 
     try:
         db = get_db()
+        loader.bind(db)
+
+        # Both profiles come from the profile cache, or one batched read on a miss
+        profile_data, reviewer_data = await loader.load_summaries([user_id, current_user_id])
 
         # Verify the reviewed user exists
-        profile_doc = db.collection(PROFILES_COLLECTION).document(user_id).get()
-        if not profile_doc.exists:
+        if profile_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Profile not found for userId: {user_id}",
             )
 
         # Verify the reviewer has a profile (must be a registered user)
-        reviewer_doc = db.collection(PROFILES_COLLECTION).document(current_user_id).get()
-        if not reviewer_doc.exists:
+        if reviewer_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Your profile was not found. Please create a profile before submitting reviews.",
             )
-        reviewer_data = reviewer_doc.to_dict()
 
         # Deterministic document ID enforces one review per reviewer per reviewed user.
         review_id = f"{current_user_id}_{user_id}"
@@ -137,7 +141,7 @@ async def list_reviews(
         db = get_db()
 
         # Verify the reviewed user exists
-        if not db.collection(PROFILES_COLLECTION).document(user_id).get().exists:
+        if not profile_exists(user_id, db):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Profile not found for userId: {user_id}",
@@ -184,7 +188,7 @@ async def get_my_review(
     try:
         db = get_db()
 
-        if not db.collection(PROFILES_COLLECTION).document(user_id).get().exists:
+        if not profile_exists(user_id, db):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Profile not found for userId: {user_id}",
@@ -0,0 +1,82 @@
+"""
+backfill_geohash_prefixes.py
+
+One-off migration that stamps location.geohashPrefixes (and a recomputed location.geohash)
+onto existing posts and profiles. Run it before enabling GEOHASH_PREFIX_QUERIES, otherwise
+radius searches will skip documents written before multi-precision prefixes existed.
+
+Usage (run from backend/ directory):
+    python -m scripts.backfill_geohash_prefixes [--dry-run] [collection ...]
+
+    collection   Collections to migrate (default: posts profiles)
+    --dry-run    Report how many documents would change without writing anything.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_config import get_db
+from utils.location import geohash_prefixes, calculate_geohash
+
+# Firestore batches have a limit of 500 operations
+BATCH_LIMIT = 500
+
+
+def backfill_collection(db, collection: str, dry_run: bool = False) -> int:
+    """Update every document in *collection* whose location prefixes are missing or stale."""
+    batch = db.batch()
+    pending = 0
+    updated = 0
+    scanned = 0
+
+    for doc in db.collection(collection).stream():
+        scanned += 1
+        location = (doc.to_dict() or {}).get("location") or {}
+        lat, lng = location.get("lat"), location.get("lng")
+        if lat is None or lng is None:
+            continue
+
+        prefixes = geohash_prefixes(lat, lng)
+        if location.get("geohashPrefixes") == prefixes:
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+
+        batch.update(doc.reference, {
+            "location.geohash": calculate_geohash(lat, lng),
+            "location.geohashPrefixes": prefixes,
+        })
+        pending += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    verb = "would update" if dry_run else "updated"
+    print(f"  [{collection}] scanned {scanned}, {verb} {updated}")
+    return updated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill multi-precision geohash prefixes on posts and profiles.")
+    parser.add_argument("collections", nargs="*", default=["posts", "profiles"])
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing.")
+    args = parser.parse_args()
+
+    db = get_db()
+    print(f"Backfilling geohash prefixes{' (dry run)' if args.dry_run else ''}...\n")
+    for collection in args.collections:
+        backfill_collection(db, collection, dry_run=args.dry_run)
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
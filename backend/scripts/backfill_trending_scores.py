@@ -0,0 +1,79 @@
+"""
+backfill_trending_scores.py
+
+One-off migration that gives posts written before trending scores a trendingScore and
+trendingUpdatedAt. Without them, sort_by=trending and GET /posts/trending (which order by
+trendingScore in Firestore) skip those posts entirely.
+
+A post's existing likes are treated as if they all arrived when it was created, so the seeded
+score is its like count decayed from createdAt to now. Older posts start near 0 and newer popular
+ones rank. Posts that already have a trendingScore are left alone. Run it right after deploying
+trending scores: a like rolled up on a post between the read and the write below can be overwritten.
+
+Usage (run from backend/ directory):
+    python -m scripts.backfill_trending_scores [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from firebase_config import get_db
+from services.trending_service import COLLECTION_NAME, decay
+
+# Firestore batches have a limit of 500 operations
+BATCH_LIMIT = 500
+
+
+def backfill_posts(db, dry_run: bool = False) -> int:
+    """Seed trendingScore on every post that has none. Returns the number of posts updated."""
+    now = datetime.now(timezone.utc)
+    batch = db.batch()
+    pending = updated = scanned = 0
+
+    for doc in db.collection(COLLECTION_NAME).stream():
+        scanned += 1
+        data = doc.to_dict() or {}
+        if "trendingScore" in data:
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+
+        score = decay(float(data.get("likes") or 0), data.get("createdAt"), now)
+        batch.update(doc.reference, {
+            "trendingScore": score if score >= settings.TRENDING_MIN_SCORE else 0.0,
+            "trendingUpdatedAt": now,
+        })
+        pending += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    verb = "would update" if dry_run else "updated"
+    print(f"  [{COLLECTION_NAME}] scanned {scanned}, {verb} {updated}")
+    return updated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed trending scores on posts written before they existed.")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing.")
+    args = parser.parse_args()
+
+    db = get_db()
+    print(f"Backfilling trending scores{' (dry run)' if args.dry_run else ''}...\n")
+    backfill_posts(db, dry_run=args.dry_run)
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
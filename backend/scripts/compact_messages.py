@@ -0,0 +1,60 @@
+"""
+compact_messages.py
+
+Backfill for message history compaction (see services/message_archive.py).
+
+The background sweep only visits conversations whose loose_message_count (kept by send_message)
+shows at least a chunk's worth of messages, and conversations from before compaction have no
+counter. For every conversation this:
+  1. counts its messages subcollection and stores the count as loose_message_count,
+  2. compacts its old messages into chunk documents, as the sweep would.
+
+Like the sweep, this moves old messages out of conversations/{id}/messages: don't run it until
+clients read history through the API rather than from that subcollection (see
+MESSAGE_COMPACTION_ENABLED). --dry-run only counts.
+
+The counter only decides which conversations the sweep looks at, so a message sent while the
+count is taken being off by one does no harm. Re-running is safe.
+
+Usage (run from backend/ directory):
+    python -m scripts.compact_messages [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_config import get_db
+from services.message_archive import COLLECTION_NAME, MESSAGES_SUBCOLLECTION, compact_conversation
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count loose messages and compact old message history.")
+    parser.add_argument("--dry-run", action="store_true", help="Report counts without writing.")
+    args = parser.parse_args()
+
+    db = get_db()
+    print(f"Compacting messages{' (dry run)' if args.dry_run else ''}...\n")
+
+    scanned = skipped = loose = archived = 0
+    for doc in db.collection(COLLECTION_NAME).stream():
+        scanned += 1
+        if (doc.to_dict() or {}).get("is_deleting"):
+            skipped += 1
+            continue
+        count = doc.reference.collection(MESSAGES_SUBCOLLECTION).count().get()[0][0].value
+        loose += count
+        if args.dry_run:
+            continue
+        doc.reference.update({"loose_message_count": count})
+        archived += compact_conversation(db, doc.id)
+
+    print(f"  [{COLLECTION_NAME}] scanned {scanned}, skipped {skipped}, {loose} loose messages"
+          + ("" if args.dry_run else f", {archived} archived into chunks"))
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,7 +31,7 @@ FAKE_USER   = "index_probe_user"
 
 # ── all combinations worth probing ───────────────────────────────────────────
 COMBOS = []
-for sort_by in ("createdAt", "likes", "distance"):
+for sort_by in ("createdAt", "likes", "distance", "trending"):
     for sort_order in ("asc", "desc"):
         for post_type in (None, SAMPLE_TYPE):
             for genres in ([], [SAMPLE_GENRE]):
@@ -0,0 +1,67 @@
+"""
+load_test_tokens.py
+
+Issues bearer tokens for many synthetic users so authenticated endpoints can be load tested
+without Firebase Auth or its emulator.
+
+Usage (run from backend/ directory):
+    python -m scripts.load_test_tokens keygen [--out-dir load_test_keys]
+    python -m scripts.load_test_tokens mint --key load_test_keys/private.pem --count 5000 > tokens.csv
+
+Then start the API with LOAD_TEST_JWT_PUBLIC_KEY_PATH=load_test_keys/public.pem (never in
+production). mint writes "uid,token" CSV rows; uids are <prefix><n> (default loadtest_user_0..N-1).
+Profiles for those uids are not created here; create them through POST /api/v1/profiles
+with the matching token if the endpoints under test require one.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.local_jwt import LocalTokenIssuer, generate_keypair
+
+
+def keygen(out_dir: Path) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    private_pem, public_pem = generate_keypair()
+    (out_dir / "private.pem").write_bytes(private_pem)
+    (out_dir / "public.pem").write_bytes(public_pem)
+    print(f"Wrote {out_dir / 'private.pem'} and {out_dir / 'public.pem'}", file=sys.stderr)
+
+
+def mint(key_path: Path, count: int, prefix: str, start: int, ttl: int) -> None:
+    issuer = LocalTokenIssuer(key_path.read_bytes())
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["uid", "token"])
+    for n in range(start, start + count):
+        uid = f"{prefix}{n}"
+        writer.writerow([uid, issuer.mint(uid, ttl_seconds=ttl)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local JWT issuer for load testing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    keygen_parser = commands.add_parser("keygen", help="Generate an RSA keypair")
+    keygen_parser.add_argument("--out-dir", type=Path, default=Path("load_test_keys"))
+
+    mint_parser = commands.add_parser("mint", help="Mint tokens for synthetic users (CSV on stdout)")
+    mint_parser.add_argument("--key", type=Path, required=True, help="Private key PEM from keygen")
+    mint_parser.add_argument("--count", type=int, default=1000)
+    mint_parser.add_argument("--prefix", default="loadtest_user_")
+    mint_parser.add_argument("--start", type=int, default=0, help="First synthetic user number")
+    mint_parser.add_argument("--ttl", type=int, default=3600, help="Token lifetime in seconds")
+
+    args = parser.parse_args()
+    if args.command == "keygen":
+        keygen(args.out_dir)
+    else:
+        mint(args.key, args.count, args.prefix, args.start, args.ttl)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+migrate_conversation_ids.py
+
+One-off migration of conversations created with auto-generated IDs to the deterministic
+pair-keyed IDs used by create_conversation (see conversation_service.pair_conversation_id).
+
+For every two-person conversation whose ID is not its pair ID it:
+  1. copies the messages subcollection to conversations/{pairId}/messages, keeping message IDs,
+  2. writes conversations/{pairId}, merging duplicates of the same pair (earliest createdAt,
+     last-message fields and snapshots from the most recently updated one),
+  3. recursively deletes the old conversation document.
+
+Run it when deploying pair-keyed conversations: until a pair is migrated, starting a chat with
+the same user creates a new, empty conversation next to the old one (the next run merges them).
+Re-running is safe; a crash part way leaves the old document in place and the pair is redone,
+overwriting the copied messages with the same IDs.
+
+Usage (run from backend/ directory):
+    python -m scripts.migrate_conversation_ids [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_config import get_db
+from services.conversation_service import COLLECTION_NAME, pair_conversation_id
+
+MESSAGES_SUBCOLLECTION = "messages"
+
+# Firestore batches have a limit of 500 operations
+BATCH_LIMIT = 500
+
+
+def copy_messages(db, source_ref, target_ref) -> int:
+    """Copy every message under source_ref to target_ref. Returns the number copied."""
+    batch = db.batch()
+    pending = copied = 0
+    for message in source_ref.collection(MESSAGES_SUBCOLLECTION).stream():
+        batch.set(target_ref.collection(MESSAGES_SUBCOLLECTION).document(message.id), message.to_dict())
+        pending += 1
+        copied += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return copied
+
+
+def merge_conversations(docs: list) -> dict:
+    """Conversation fields for the pair: the most recently updated document, earliest createdAt."""
+    datas = [doc.to_dict() or {} for doc in docs]
+    merged = dict(max(datas, key=lambda d: d.get("updatedAt") or d.get("createdAt")))
+    created = [d["createdAt"] for d in datas if d.get("createdAt")]
+    if created:
+        merged["createdAt"] = min(created)
+    merged.pop("is_deleting", None)
+    return merged
+
+
+def migrate_pair(db, pair_id: str, legacy_docs: list) -> int:
+    """Move one pair's legacy conversations to its pair ID. Returns the number of messages moved."""
+    target_ref = db.collection(COLLECTION_NAME).document(pair_id)
+    target_doc = target_ref.get()
+
+    moved = 0
+    for doc in legacy_docs:
+        moved += copy_messages(db, doc.reference, target_ref)
+
+    # The conversation document is written only after all messages are in place
+    target_ref.set(merge_conversations(legacy_docs + ([target_doc] if target_doc.exists else [])))
+    for doc in legacy_docs:
+        db.recursive_delete(doc.reference)
+    return moved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-key conversations to deterministic pair IDs.")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing.")
+    args = parser.parse_args()
+
+    db = get_db()
+    print(f"Migrating conversation IDs{' (dry run)' if args.dry_run else ''}...\n")
+
+    scanned = skipped = 0
+    pairs = defaultdict(list)
+    for doc in db.collection(COLLECTION_NAME).stream():
+        scanned += 1
+        data = doc.to_dict() or {}
+        participant_ids = data.get("participant_ids") or []
+        if len(set(participant_ids)) != 2 or data.get("is_deleting"):
+            skipped += 1
+            continue
+        pair_id = pair_conversation_id(*participant_ids)
+        if doc.id != pair_id:
+            pairs[pair_id].append(doc)
+
+    legacy = sum(len(docs) for docs in pairs.values())
+    messages = 0
+    if not args.dry_run:
+        for pair_id, docs in pairs.items():
+            messages += migrate_pair(db, pair_id, docs)
+
+    verb = "would re-key" if args.dry_run else "re-keyed"
+    print(f"  [{COLLECTION_NAME}] scanned {scanned}, skipped {skipped}, "
+          f"{verb} {legacy} conversations into {len(pairs)} pairs"
+          + ("" if args.dry_run else f" ({messages} messages moved)"))
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
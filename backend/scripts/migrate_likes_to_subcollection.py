@@ -0,0 +1,110 @@
+"""
+migrate_likes_to_subcollection.py
+
+One-off migration from the likedBy array on post documents to the posts/{postId}/likes/{userId}
+subcollection plus sharded like counters (posts/{postId}/likeShards/{n}).
+
+For every post that still carries a likedBy field, in one transaction it:
+  1. takes the likers as the union of likedBy and the post's existing likes/{userId} documents
+     (likes recorded through the new code after deploy are kept, and nobody is counted twice),
+  2. creates a likes/{userId} document for each liker that doesn't have one yet,
+  3. sets the counter shards so that they sum to the number of likers,
+  4. sets the post's likes field to that total and removes likedBy.
+
+The transaction reads the counter shards, so a like written to the post meanwhile (which always
+updates a shard) makes it retry with the new state rather than being overwritten. A post with more
+missing like documents than fit in one transaction gets them created over several, and only the
+last one sets the shards and removes likedBy. Re-running is safe: the likers are recomputed from
+the documents, and migrated posts no longer have likedBy and are skipped.
+
+Usage (run from backend/ directory):
+    python -m scripts.migrate_likes_to_subcollection [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import firestore
+from google.cloud.firestore import DELETE_FIELD
+from config import settings
+from firebase_config import get_db
+from services.like_service import COLLECTION_NAME, LIKES_SUBCOLLECTION, LIKE_SHARDS_SUBCOLLECTION
+
+# Firestore batches have a limit of 500 operations
+BATCH_LIMIT = 500
+
+
+def migrate_post(db, post_ref) -> int:
+    """Move one post's likedBy array into like documents and shards. Returns the like count."""
+    likes_ref = post_ref.collection(LIKES_SUBCOLLECTION)
+    shards = post_ref.collection(LIKE_SHARDS_SUBCOLLECTION)
+    shard_count = max(settings.LIKE_COUNTER_SHARDS, 1)
+    # Room for the like documents next to the shard writes and the post update
+    create_limit = BATCH_LIMIT - shard_count - 1
+
+    @firestore.transactional
+    def _txn(transaction) -> Optional[int]:
+        post_doc = post_ref.get(transaction=transaction)
+        data = (post_doc.to_dict() or {}) if post_doc.exists else {}
+        if "likedBy" not in data:
+            return 0  # Already migrated (or deleted) since the scan
+        existing = {doc.id for doc in transaction.get(likes_ref.select([]))}
+        # Read so a concurrent like, which always updates a shard, conflicts with this transaction
+        for shard_id in range(shard_count):
+            shards.document(str(shard_id)).get(transaction=transaction)
+
+        missing = [user_id for user_id in dict.fromkeys(data.get("likedBy") or []) if user_id not in existing]
+        now = datetime.now(timezone.utc)
+        for user_id in missing[:create_limit]:
+            transaction.create(likes_ref.document(user_id), {
+                "userId": user_id,
+                "postId": post_ref.id,
+                "createdAt": now,
+            })
+        if len(missing) > create_limit:
+            return None  # More like documents to create before the count can be set
+
+        total = len(existing) + len(missing)
+        for shard_id in range(shard_count):
+            transaction.set(shards.document(str(shard_id)), {"count": total if shard_id == 0 else 0})
+        transaction.update(post_ref, {"likes": total, "likedBy": DELETE_FIELD})
+        return total
+
+    while True:
+        total = _txn(db.transaction())
+        if total is not None:
+            return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move post likedBy arrays into likes subcollections and counter shards.")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing.")
+    args = parser.parse_args()
+
+    db = get_db()
+    print(f"Migrating likes{' (dry run)' if args.dry_run else ''}...\n")
+
+    scanned = migrated = likes = 0
+    for post_doc in db.collection(COLLECTION_NAME).stream():
+        scanned += 1
+        data = post_doc.to_dict() or {}
+        if "likedBy" not in data:
+            continue
+        migrated += 1
+        if args.dry_run:
+            likes += len(set(data.get("likedBy") or []))
+            continue
+        likes += migrate_post(db, post_doc.reference)
+
+    verb = "would migrate" if args.dry_run else "migrated"
+    print(f"  [{COLLECTION_NAME}] scanned {scanned}, {verb} {migrated} posts with {likes} likes")
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,7 +33,7 @@ from firebase_admin import credentials, firestore, storage
 from google.api_core import exceptions as gcp_exceptions
 
 from config import settings
-from utils.location import resolve_location_from_zip
+from utils.location import resolve_location_from_zip, add_geohash_fields
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -135,7 +135,7 @@ async def resolve_location(zip_code: str) -> dict:
         loc = await resolve_location_from_zip(zip_code)
         if loc is None:
             raise RuntimeError(f"Could not resolve zip code: {zip_code}")
-        _location_cache[zip_code] = loc.model_dump(by_alias=True)
+        _location_cache[zip_code] = add_geohash_fields(loc.model_dump(by_alias=True))
     return _location_cache[zip_code]
 
 
@@ -309,8 +309,9 @@ async def seed_post(db, uid: str, profile_doc: dict, post_data: dict, post_index
         "photoUrl": photo_url,
         "photoThumbUrl": None,   # No server-side thumbnail generation in seed
         "songUrl": song_url,
-        "likedBy": [],
         "likes": 0,
+        "trendingScore": 0.0,
+        "trendingUpdatedAt": post_time,
         "edited": False,
         "createdAt": post_time,
         "updatedAt": post_time,
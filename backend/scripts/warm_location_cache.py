@@ -0,0 +1,183 @@
+"""
+warm_location_cache.py
+
+Bulk-loads ZIP Location records into the location_cache collection ahead of a regional launch,
+so the first profile and post writes never wait on a cold Geocoding lookup.
+
+Input is a CSV with a header row. The ZIP column may be named zip, zip_code or zipCode.
+Rows that also carry lat/lng (an offline ZIP dataset) are written directly in batched writes;
+optional formatted_address/formattedAddress and place_id/placeId columns are copied through.
+Rows with only a ZIP are resolved through resolve_location_from_zip, throttled to --rate calls/sec.
+
+The run is resumable: ZIPs already present in location_cache are skipped (unless --force),
+so an interrupted run can simply be started again with the same file. Negative-cache entries
+(ZERO_RESULTS / ERROR) don't count as present and are rewritten. With --force, ZIP-only rows have
+their cache entry deleted and are geocoded again. Rows with unparseable lat/lng are skipped.
+
+Usage (run from backend/ directory):
+    python -m scripts.warm_location_cache zips.csv [--rate 10] [--force] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_config import get_db
+from models import Location
+from utils.location import (
+    LOCATION_CACHE_COLLECTION,
+    calculate_geohash,
+    normalize_zip_code,
+    resolve_location_from_zip,
+)
+
+# Firestore batches have a limit of 500 operations; also the size of each existence check
+CHUNK_SIZE = 500
+
+_ZIP_COLUMNS = ("zip", "zip_code", "zipCode")
+_ADDRESS_COLUMNS = ("formatted_address", "formattedAddress")
+_PLACE_ID_COLUMNS = ("place_id", "placeId")
+
+
+def _first(row: dict, columns) -> str | None:
+    for column in columns:
+        value = (row.get(column) or "").strip()
+        if value:
+            return value
+    return None
+
+
+def read_rows(path: str) -> list[dict]:
+    """Read the CSV into a list of {"zip", "lat", "lng", "formattedAddress", "placeId"} dicts."""
+    rows = []
+    with open(path, newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            raw_zip = _first(row, _ZIP_COLUMNS)
+            try:
+                zip_code = normalize_zip_code(raw_zip or "")
+            except ValueError:
+                print(f"  line {line_no}: skipping invalid ZIP {raw_zip!r}")
+                continue
+            lat, lng = _first(row, ("lat",)), _first(row, ("lng", "lon"))
+            try:
+                lat, lng = float(lat) if lat else None, float(lng) if lng else None
+            except ValueError:
+                print(f"Warning: line {line_no}: skipping ZIP {zip_code} with invalid coordinates {lat!r}, {lng!r}")
+                continue
+            rows.append({
+                "zip": zip_code,
+                "lat": lat,
+                "lng": lng,
+                "formattedAddress": _first(row, _ADDRESS_COLUMNS),
+                "placeId": _first(row, _PLACE_ID_COLUMNS),
+            })
+    return rows
+
+
+class RateLimiter:
+    """Spaces out awaits so at most *rate* calls start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+async def warm(rows: list[dict], rate: float, force: bool = False, dry_run: bool = False) -> dict:
+    db = get_db()
+    cache = db.collection(LOCATION_CACHE_COLLECTION)
+    limiter = RateLimiter(rate)
+    stats = {"written": 0, "geocoded": 0, "skipped": 0, "unresolved": 0, "failed": 0}
+    started = time.monotonic()
+
+    # De-duplicate while keeping file order so progress lines up with the input
+    unique = list({row["zip"]: row for row in rows}.values())
+
+    for start in range(0, len(unique), CHUNK_SIZE):
+        chunk = unique[start:start + CHUNK_SIZE]
+
+        if not force:
+            refs = [cache.document(row["zip"]) for row in chunk]
+            # Negative-cache entries (ZERO_RESULTS / ERROR, marked by a status field) aren't warm: overwrite them
+            cached = {
+                snap.id for snap in db.get_all(refs)
+                if snap.exists and "status" not in (snap.to_dict() or {})
+            }
+            stats["skipped"] += sum(1 for row in chunk if row["zip"] in cached)
+            chunk = [row for row in chunk if row["zip"] not in cached]
+
+        batch = db.batch()
+        pending = 0
+        for row in chunk:
+            if row["lat"] is not None and row["lng"] is not None:
+                location = Location(
+                    zipCode=row["zip"],
+                    formattedAddress=row["formattedAddress"],
+                    lat=row["lat"],
+                    lng=row["lng"],
+                    placeId=row["placeId"],
+                    geohash=calculate_geohash(row["lat"], row["lng"]),
+                )
+                if not dry_run:
+                    batch.set(cache.document(row["zip"]), location.model_dump(by_alias=True))
+                    pending += 1
+                stats["written"] += 1
+                continue
+
+            if dry_run:
+                stats["geocoded"] += 1
+                continue
+
+            # No coordinates: fall back to Geocoding, which writes the cache entry itself. It answers
+            # from the cache first, so --force drops the existing entry to make it call the API again.
+            if force:
+                cache.document(row["zip"]).delete()
+            await limiter.wait()
+            try:
+                resolved = await resolve_location_from_zip(row["zip"])
+            except Exception as e:
+                print(f"  {row['zip']}: geocoding failed: {e}")
+                stats["failed"] += 1
+                continue
+            stats["geocoded" if resolved else "unresolved"] += 1
+
+        if pending:
+            batch.commit()
+
+        done = min(start + CHUNK_SIZE, len(unique))
+        elapsed = time.monotonic() - started
+        print(
+            f"  [{done}/{len(unique)}] written={stats['written']} geocoded={stats['geocoded']} "
+            f"skipped={stats['skipped']} unresolved={stats['unresolved']} failed={stats['failed']} "
+            f"({elapsed:.1f}s)"
+        )
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preload ZIP locations into location_cache.")
+    parser.add_argument("csv_path", help="CSV file with a zip column and optional lat/lng columns")
+    parser.add_argument("--rate", type=float, default=10.0, help="Max Geocoding calls per second (default: 10)")
+    parser.add_argument("--force", action="store_true", help="Rewrite ZIPs that are already cached")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would happen without writing")
+    args = parser.parse_args()
+
+    rows = read_rows(args.csv_path)
+    print(f"Warming {LOCATION_CACHE_COLLECTION} with {len(rows)} ZIP rows{' (dry run)' if args.dry_run else ''}...\n")
+    asyncio.run(warm(rows, args.rate, force=args.force, dry_run=args.dry_run))
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from firebase_config import get_db
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from google.cloud.firestore_v1.field_path import FieldPath
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from services.participant_cache import invalidate_participants
+
+JOBS_COLLECTION = "conversationDeletionJobs"
+CONVERSATIONS_COLLECTION = "conversations"
+MESSAGES_SUBCOLLECTION = "messages"
+
+# Job documents: conversationId, participant_ids (who may read the status), requestedBy, status,
+# deletedMessages, attempts, error, createdAt, updatedAt, heartbeatAt, completedAt.
+QUEUED, RUNNING, COMPLETED = "queued", "running", "completed"
+
+
+def new_job(db, conversation_id: str, participant_ids: list, requested_by: str, now: datetime) -> tuple:
+    """(job reference, job data) for a queued deletion of conversation_id; the caller writes it."""
+    job_ref = db.collection(JOBS_COLLECTION).document()
+    return job_ref, {
+        "conversationId": conversation_id,
+        "participant_ids": participant_ids,
+        "requestedBy": requested_by,
+        "status": QUEUED,
+        "deletedMessages": 0,
+        "attempts": 0,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "heartbeatAt": None,
+        "completedAt": None,
+    }
+
+
+def _lease_expired(job: dict, now: datetime) -> bool:
+    heartbeat = job.get("heartbeatAt")
+    return heartbeat is None or now - heartbeat > timedelta(seconds=settings.CONVERSATION_DELETE_LEASE_SECONDS)
+
+
+def claim_job(db, job_ref) -> Optional[dict]:
+    """
+    Mark the job running for this worker. Returns its data, or None if it is finished or another
+    worker holds a live lease on it (every process resumes unfinished jobs).
+    """
+    @firestore.transactional
+    def _claim(transaction):
+        snap = job_ref.get(transaction=transaction)
+        if not snap.exists:
+            return None
+        job = snap.to_dict()
+        now = datetime.now(timezone.utc)
+        if job.get("status") == COMPLETED or (job.get("status") == RUNNING and not _lease_expired(job, now)):
+            return None
+        job.update({"status": RUNNING, "attempts": job.get("attempts", 0) + 1, "heartbeatAt": now, "updatedAt": now})
+        transaction.update(job_ref, {k: job[k] for k in ("status", "attempts", "heartbeatAt", "updatedAt")})
+        return job
+
+    return _claim(db.transaction())
+
+
+def run_job(db, job_id: str) -> bool:
+    """
+    Delete the job's conversation: messages first, a chunk at a time through a bulk writer with the
+    count saved after each chunk, then anything else under the conversation and the document itself.
+    Safe to re-run after a crash; deleted messages are simply no longer found.
+    Returns True if the job completed here.
+    """
+    job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+    job = claim_job(db, job_ref)
+    if job is None:
+        return False
+
+    # The job may run on a worker other than the one that accepted the delete
+    invalidate_participants(job["conversationId"])
+    convo_ref = db.collection(CONVERSATIONS_COLLECTION).document(job["conversationId"])
+    writer = db.bulk_writer(BulkWriterOptions(
+        initial_ops_per_second=settings.CONVERSATION_DELETE_MAX_OPS_PER_SECOND,
+        max_ops_per_second=settings.CONVERSATION_DELETE_MAX_OPS_PER_SECOND,
+    ))
+    deleted = job.get("deletedMessages", 0)
+    try:
+        messages = convo_ref.collection(MESSAGES_SUBCOLLECTION)
+        while True:
+            chunk = list(messages.select([FieldPath.document_id()]).limit(settings.CONVERSATION_DELETE_CHUNK_SIZE).stream())
+            if not chunk:
+                break
+            for message in chunk:
+                writer.delete(message.reference)
+            writer.flush()
+            deleted += len(chunk)
+            now = datetime.now(timezone.utc)
+            job_ref.update({"deletedMessages": deleted, "heartbeatAt": now, "updatedAt": now})
+
+        # Closes the writer
+        db.recursive_delete(convo_ref, bulk_writer=writer)
+        now = datetime.now(timezone.utc)
+        job_ref.update({"status": COMPLETED, "deletedMessages": deleted, "error": None, "completedAt": now, "updatedAt": now})
+        return True
+    except Exception as e:
+        # Back in the queue for the next rescan
+        job_ref.update({"status": QUEUED, "error": str(e), "heartbeatAt": None, "updatedAt": datetime.now(timezone.utc)})
+        raise
+
+
+def unfinished_job_ids(db) -> list:
+    """Queued jobs and running jobs whose worker has stopped heartbeating."""
+    now = datetime.now(timezone.utc)
+    query = db.collection(JOBS_COLLECTION).where(filter=FieldFilter("status", "in", [QUEUED, RUNNING]))
+    return [
+        snap.id for snap in query.stream()
+        if snap.to_dict().get("status") == QUEUED or _lease_expired(snap.to_dict(), now)
+    ]
+
+
+class ConversationDeletionQueue:
+    """
+    In-process queue of conversation deletion jobs. Job state lives in Firestore, so the queue only
+    holds job IDs: run() resumes unfinished jobs at startup and on every rescan, which also retries
+    failed attempts and takes over jobs from workers that died mid-delete.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued: set = set()
+
+    def enqueue(self, job_id: str) -> None:
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await run_in_threadpool(run_job, get_db(), job_id)
+            except Exception as e:
+                print(f"Warning: conversation deletion job {job_id} failed: {str(e)}")
+
+    async def run(self) -> None:
+        """Background loop started from the app lifespan."""
+        # A fresh queue bound to this event loop, keeping anything enqueued before startup
+        self._queue = asyncio.Queue()
+        for job_id in self._queued:
+            self._queue.put_nowait(job_id)
+        workers = [asyncio.create_task(self._work()) for _ in range(max(settings.CONVERSATION_DELETE_WORKERS, 1))]
+        try:
+            while True:
+                try:
+                    for job_id in await run_in_threadpool(unfinished_job_ids, get_db()):
+                        self.enqueue(job_id)
+                except Exception as e:
+                    print(f"Warning: failed to scan conversation deletion jobs: {str(e)}")
+                await asyncio.sleep(settings.CONVERSATION_DELETE_RESCAN_SECONDS)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+deletion_queue = ConversationDeletionQueue()
@@ -1,9 +1,20 @@
-from models import ConversationCreate, ConversationResponse, PaginatedConversationsResponse
+from models import (ConversationCreate, ConversationResponse, PaginatedConversationsResponse,
+                    ConversationDeletionJobResponse, UnreadSummaryResponse)
 from firebase_config import get_db
 from datetime import datetime, timezone
+import hashlib
 from fastapi import HTTPException, status
 from typing import Optional
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud import firestore
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.api_core import exceptions as api_exceptions
+from services import conversation_deletion
+from services.participant_cache import invalidate_participants
+from services import inbox_cache
+from services.profile_loader import ProfileLoader
+from utils.cursors import encode_cursor, decode_cursor
 
 COLLECTION_NAME = "conversations"
 
@@ -17,45 +28,59 @@ def _build_profile_snapshot(profile_data: dict) -> dict:
     }
 
 
+DELETED_PARTICIPANT_SNAPSHOT = {"firstName": "Deleted", "lastName": "User", "profilePicUrl": None}
+
+# Firestore batches have a limit of 500 operations
+BATCH_LIMIT = 500
+
+
+def pair_conversation_id(user_id: str, other_user_id: str) -> str:
+    """Deterministic conversation ID for a pair of users, the same whichever of them starts it.
+    Hashed because UIDs may contain characters that aren't allowed in document IDs."""
+    first, second = sorted([user_id, other_user_id])
+    return hashlib.sha256(f"{first}\n{second}".encode()).hexdigest()
+
+
+def unread_count_field(user_id: str) -> str:
+    """Field path of user_id's unread message count on a conversation document."""
+    return FieldPath("unread_counts", user_id).to_api_repr()
+
+
+def last_read_field(user_id: str) -> str:
+    """Field path of when user_id last read a conversation."""
+    return FieldPath("last_read_at", user_id).to_api_repr()
+
+
 def validate_participant(recipient_id: str, current_user_id: str):
     """Helper function to validate that a user ID is unique."""
     if current_user_id == recipient_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot create a conversation with yourself")
 
 
-async def create_conversation(conversation: ConversationCreate, current_user_id: str) -> ConversationResponse:
+async def create_conversation(
+    conversation: ConversationCreate,
+    current_user_id: str,
+    loader: Optional[ProfileLoader] = None) -> ConversationResponse:
     try:
         now = datetime.now(timezone.utc)
         recipient_id = conversation.recipient_id
         validate_participant(recipient_id, current_user_id)
         db = get_db()
+        loader = (loader or ProfileLoader()).bind(db)
 
-        current_user_profile_doc = db.collection("profiles").document(current_user_id).get()
-        if current_user_profile_doc.exists is False:
+        # Both summaries come from the profile cache, or one batched read on a miss
+        current_user_profile, recipient_profile = await loader.load_summaries([current_user_id, recipient_id])
+        if current_user_profile is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Current user profile not found")
 
-        recipient_profile_doc = db.collection("profiles").document(recipient_id).get()
-        if recipient_profile_doc.exists is False:
+        if recipient_profile is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipient user not found")
 
         participant_snapshots = {
-            current_user_id: _build_profile_snapshot(current_user_profile_doc.to_dict()),
-            recipient_id: _build_profile_snapshot(recipient_profile_doc.to_dict())
+            current_user_id: _build_profile_snapshot(current_user_profile),
+            recipient_id: _build_profile_snapshot(recipient_profile)
         }
         
-        # Check if conversation already exists between these two users
-        # we search for any conversation that contains the current user,
-        # then check if the recipient is also a participant.
-        existing_convos = db.collection(COLLECTION_NAME)\
-                    .where(filter=FieldFilter("participant_ids", "array_contains", current_user_id)).stream()
-        
-        for doc in existing_convos:
-            data = doc.to_dict()
-            if recipient_id in data.get("participant_ids", []):
-                # Conversation already exists, return it
-                return ConversationResponse(**data, conversation_id=doc.id)
-            
-        # No existing conversation, create a new one
         conversation_data = {
             "createdAt": now,
             "updatedAt": now,
@@ -63,15 +88,29 @@ async def create_conversation(conversation: ConversationCreate, current_user_id:
             "last_message_preview": None,
             "last_message_sent_at": None,
             "last_message_sender_id": None,
-            "participant_snapshots": participant_snapshots
+            "participant_snapshots": participant_snapshots,
+            "unread_counts": {current_user_id: 0, recipient_id: 0},
+            "last_read_at": {}
         }
-        # Create new conversation document with auto-generated ID
-        new_conversation_ref = db.collection(COLLECTION_NAME).document()
-        new_conversation_ref.set(conversation_data)
-        
-        # Build response model including the new conversation ID from the document reference
-        conversation_data["conversation_id"] = new_conversation_ref.id
-        return ConversationResponse(**conversation_data)
+        # The pair's conversation lives at a fixed ID, so finding it is one read and two users
+        # starting the same chat at once both end up with the one document
+        convo_ref = db.collection(COLLECTION_NAME).document(pair_conversation_id(current_user_id, recipient_id))
+
+        @firestore.transactional
+        def _get_or_create(transaction):
+            existing = convo_ref.get(transaction=transaction)
+            if existing.exists:
+                data = existing.to_dict()
+                if data.get("is_deleting"):
+                    # Deletion of the pair's previous conversation is still running
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conversation is being deleted")
+                return data
+            transaction.create(convo_ref, conversation_data)
+            return conversation_data
+
+        data = _get_or_create(db.transaction())
+        inbox_cache.invalidate_inboxes(data.get("participant_ids", []))
+        return ConversationResponse(**data, conversation_id=convo_ref.id)
         
     except HTTPException:
         raise
@@ -83,43 +122,110 @@ async def list_conversations(
     current_user_id: str,             
     limit: int = 10, 
     last_doc_id: Optional[str] = None) -> PaginatedConversationsResponse:
-    """List conversations for the current user with pagination."""
+    """List conversations for the current user, newest activity first, one page per query.
+    Served by the participant_ids CONTAINS + updatedAt DESC + __name__ DESC composite index."""
     try:
+        # Clients reload the inbox on every visit; the first page is usually unchanged
+        if not last_doc_id:
+            cached = inbox_cache.get_first_page(current_user_id, limit)
+            if cached is not None:
+                return cached
+            version = inbox_cache.inbox_version()
+
         db = get_db()
+        conversations_ref = db.collection(COLLECTION_NAME)
+        query = conversations_ref\
+            .where(filter=FieldFilter("participant_ids", "array_contains", current_user_id))\
+            .order_by("updatedAt", direction=firestore.Query.DESCENDING)\
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+
+        if last_doc_id:
+            cursor = decode_cursor(last_doc_id)
+            if cursor:
+                updated_at, conversation_id = cursor
+                query = query.start_after({"updatedAt": updated_at, "__name__": conversation_id})
+            else:
+                # Tokens issued before keyset cursors were bare conversation IDs
+                last_doc = conversations_ref.document(last_doc_id).get()
+                if last_doc.exists:
+                    query = query.start_after(last_doc)
+
+        # Fetch one extra document to determine if there is a next page
+        docs = list(query.limit(limit + 1).stream())
+        # Conversations queued for deletion are hidden; the page can come back a little short
+        page = [
+            ConversationResponse(**doc.to_dict(), conversation_id=doc.id)
+            for doc in docs[:limit] if not doc.to_dict().get("is_deleting")
+        ]
+
+        next_page_token = None
+        if len(docs) > limit:
+            last = docs[limit - 1]
+            next_page_token = encode_cursor(last.to_dict()["updatedAt"], last.id)
+
+        response = PaginatedConversationsResponse(conversations=page, next_page_token=next_page_token)
+        if not last_doc_id:
+            inbox_cache.put_first_page(current_user_id, limit, response, version, db)
+        return response
         
-        # We fetch all conversations that include the current user, then sort and paginate in memory.
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def mark_conversation_read(conversation_id: str, current_user_id: str) -> ConversationResponse:
+    """Reset the caller's unread count and move their last-read marker to now."""
+    try:
+        db = get_db()
+        convo_ref = db.collection(COLLECTION_NAME).document(conversation_id)
+        doc = convo_ref.get()
+        if not doc.exists:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+
+        data = doc.to_dict()
+        if current_user_id not in data.get("participant_ids", []):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a participant in this conversation")
+        if data.get("is_deleting"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+
+        # updatedAt is left alone: reading a conversation shouldn't move it up the inbox
+        now = datetime.now(timezone.utc)
+        convo_ref.update({unread_count_field(current_user_id): 0, last_read_field(current_user_id): now})
+        inbox_cache.invalidate_inboxes([current_user_id])
+
+        data.setdefault("unread_counts", {})[current_user_id] = 0
+        data.setdefault("last_read_at", {})[current_user_id] = now
+        return ConversationResponse(**data, conversation_id=conversation_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def get_unread_summary(current_user_id: str) -> UnreadSummaryResponse:
+    """
+    Badge totals from the inbox query alone: one read per conversation, fetching only the caller's
+    counter, instead of listing messages.
+    """
+    try:
+        db = get_db()
+        counter = unread_count_field(current_user_id)
         docs = db.collection(COLLECTION_NAME)\
             .where(filter=FieldFilter("participant_ids", "array_contains", current_user_id))\
+            .select([counter, "is_deleting"])\
             .stream()
 
-        all_conversations = []
-        # we convert each document to a ConversationResponse model
+        total = 0
+        conversation_ids = []
         for doc in docs:
-            data = doc.to_dict()
-            all_conversations.append(ConversationResponse(**data, conversation_id=doc.id))
-       # Then we sort the conversations by updated_at timestamp in descending order
-        all_conversations.sort(key=lambda convo: convo.updated_at, reverse=True)
-
-       # Here we implement pagination by finding the index of the last document from the previous page.
-       # If last_doc_id is provided, we find its index and start the next page from the following document.
-       # otherwise we start from the top of the list.
-        start_index = 0
-        if last_doc_id:
-            for index, convo in enumerate(all_conversations):
-                if convo.conversation_id == last_doc_id:
-                    start_index = index + 1
-                    break
-
-        # we then take the slice of conversations for the current page based on the limit.
-        # we fetch one extra document than the limit to determine if there is a next page.
-        page = all_conversations[start_index:start_index + limit + 1]
-        next_page_token = None
-        if len(page) > limit:
-            next_page_token = page[limit - 1].conversation_id
-            page = page[:limit]
-        
-        return PaginatedConversationsResponse(conversations=page, next_page_token=next_page_token)
-        
+            data = doc.to_dict() or {}
+            count = (data.get("unread_counts") or {}).get(current_user_id, 0)
+            if count > 0 and not data.get("is_deleting"):
+                total += count
+                conversation_ids.append(doc.id)
+
+        return UnreadSummaryResponse(total_unread=total, unread_conversation_ids=conversation_ids)
+
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -137,6 +243,10 @@ async def get_conversation_by_id(conversation_id: str, current_user_id: str) ->
         
         if current_user_id not in data.get("participant_ids", []):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a participant in this conversation")
+
+        # Deletion runs in the background; the conversation is gone as far as clients are concerned
+        if data.get("is_deleting"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
         
         return ConversationResponse(**data, conversation_id=doc.id)
         
@@ -146,8 +256,8 @@ async def get_conversation_by_id(conversation_id: str, current_user_id: str) ->
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-async def delete_conversation(conversation_id: str, current_user_id: str):
-
+async def delete_conversation(conversation_id: str, current_user_id: str) -> ConversationDeletionJobResponse:
+    """Mark the conversation as deleting and queue a background job to remove it and its messages."""
     try:
 
         if (conversation_id is None) or (conversation_id.strip() == ""):
@@ -168,12 +278,25 @@ async def delete_conversation(conversation_id: str, current_user_id: str):
         if data.get("is_deleting"):
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conversation is already being deleted")
 
-        convo_ref.update({
+        now = datetime.now(timezone.utc)
+        job_ref, job_data = conversation_deletion.new_job(db, conversation_id, data.get("participant_ids", []), current_user_id, now)
+        batch = db.batch()
+        # Precondition on the read above, so of two concurrent deletes only one queues a job
+        batch.update(convo_ref, {
             "is_deleting": True,
-            "updatedAt": datetime.now(timezone.utc)
-        })
-        db.recursive_delete(convo_ref) 
-        return {"detail": "Conversation deleted successfully"}
+            "deletion_job_id": job_ref.id,
+            "updatedAt": now
+        }, option=db.write_option(last_update_time=doc.update_time))
+        batch.create(job_ref, job_data)
+        try:
+            batch.commit()
+        except api_exceptions.FailedPrecondition:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conversation is already being deleted")
+
+        invalidate_participants(conversation_id)
+        inbox_cache.invalidate_inboxes(data.get("participant_ids", []))
+        conversation_deletion.deletion_queue.enqueue(job_ref.id)
+        return _deletion_job_response(job_ref.id, job_data)
         
     except HTTPException:
         raise
@@ -181,10 +304,43 @@ async def delete_conversation(conversation_id: str, current_user_id: str):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-async def refresh_participant_snapshots(conversation_id: str, current_user_id: str) -> ConversationResponse:
+def _deletion_job_response(job_id: str, data: dict) -> ConversationDeletionJobResponse:
+    return ConversationDeletionJobResponse(
+        job_id=job_id,
+        conversation_id=data["conversationId"],
+        status=data["status"],
+        deleted_messages=data.get("deletedMessages", 0),
+        error=data.get("error"),
+        created_at=data["createdAt"],
+        updated_at=data["updatedAt"],
+        completed_at=data.get("completedAt"),
+    )
+
 
+async def get_deletion_job(job_id: str, current_user_id: str) -> ConversationDeletionJobResponse:
+    """Progress of a conversation deletion. Visible to the conversation's participants."""
     try:
         db = get_db()
+        doc = db.collection(conversation_deletion.JOBS_COLLECTION).document(job_id).get()
+        # Don't reveal other users' jobs exist
+        if not doc.exists or current_user_id not in doc.to_dict().get("participant_ids", []):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deletion job not found")
+        return _deletion_job_response(doc.id, doc.to_dict())
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def refresh_participant_snapshots(
+    conversation_id: str,
+    current_user_id: str,
+    loader: Optional[ProfileLoader] = None) -> ConversationResponse:
+
+    try:
+        db = get_db()
+        loader = (loader or ProfileLoader()).bind(db)
         convo_ref = db.collection(COLLECTION_NAME).document(conversation_id)
         doc = convo_ref.get()
         if not doc.exists:
@@ -196,29 +352,77 @@ async def refresh_participant_snapshots(conversation_id: str, current_user_id: s
         if current_user_id not in participant_ids:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a participant in this conversation")
 
-        # Rebuild snapshots from profiles
+        # Rebuild snapshots from profiles, read in a single batch
+        profiles = await loader.load_many(participant_ids)
         new_snapshots = {}
-        for pid in participant_ids:
-            profile_doc = db.collection("profiles").document(pid).get()
-            if profile_doc.exists:
-                new_snapshots[pid] = _build_profile_snapshot(profile_doc.to_dict())
+        for pid, profile_data in zip(participant_ids, profiles):
+            if profile_data is not None:
+                new_snapshots[pid] = _build_profile_snapshot(profile_data)
             # If a profile is missing, we set the values to None. This allows the frontend to handle
             # deleted profiles gracefully
             else:
-                new_snapshots[pid] = {"firstName": "Deleted", "lastName": "User", "profilePicUrl": None}
+                new_snapshots[pid] = dict(DELETED_PARTICIPANT_SNAPSHOT)
 
         now = datetime.now(timezone.utc)
         convo_ref.update({
             "participant_snapshots": new_snapshots,
             "updatedAt": now
         })
+        inbox_cache.invalidate_inboxes(participant_ids)
 
-        # Return updated conversation
-        updated_doc = convo_ref.get()
-        return ConversationResponse(**updated_doc.to_dict(), conversation_id=updated_doc.id)
+        # Return the conversation as written, without reading it back
+        data.update({"participant_snapshots": new_snapshots, "updatedAt": now})
+        return ConversationResponse(**data, conversation_id=conversation_id)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
+
+
+def fan_out_participant_snapshot(user_id: str, profile_data: Optional[dict], db=None) -> int:
+    """
+    Rewrite user_id's snapshot in every conversation they are in, so a name or photo change shows up
+    in other users' inboxes without anyone calling sync-snapshots. profile_data None writes the
+    deleted-user placeholder. Only the user's own snapshot field is written and updatedAt is left
+    alone, so inbox order doesn't change. Returns the number of conversations updated.
+    """
+    db = db or get_db()
+    snapshot = _build_profile_snapshot(profile_data) if profile_data is not None else dict(DELETED_PARTICIPANT_SNAPSHOT)
+    field = FieldPath("participant_snapshots", user_id).to_api_repr()
+    docs = db.collection(COLLECTION_NAME)\
+        .where(filter=FieldFilter("participant_ids", "array_contains", user_id))\
+        .select(["is_deleting", "participant_ids"])\
+        .stream()
+    live = [doc for doc in docs if not (doc.to_dict() or {}).get("is_deleting")]
+    refs = [doc.reference for doc in live]
+
+    updated = 0
+    for start in range(0, len(refs), BATCH_LIMIT):
+        chunk = refs[start:start + BATCH_LIMIT]
+        batch = db.batch()
+        for ref in chunk:
+            batch.update(ref, {field: snapshot})
+        try:
+            batch.commit()
+            updated += len(chunk)
+        except gcp_exceptions.NotFound:
+            # A conversation in the chunk was deleted since the query; write the rest one by one
+            for ref in chunk:
+                try:
+                    ref.update({field: snapshot})
+                    updated += 1
+                except gcp_exceptions.NotFound:
+                    pass
+    # Everyone who has a conversation with the user sees the new snapshot in their inbox
+    inbox_cache.invalidate_inboxes({pid for doc in live for pid in (doc.to_dict() or {}).get("participant_ids", [])})
+    return updated
+
+
+def sync_participant_snapshots(user_id: str, profile_data: Optional[dict]) -> None:
+    """Background task queued by profile updates and deletion."""
+    try:
+        fan_out_participant_snapshot(user_id, profile_data)
+    except Exception as e:
+        print(f"Warning: failed to update conversation snapshots for {user_id}: {str(e)}")
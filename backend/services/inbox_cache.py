@@ -0,0 +1,177 @@
+from firebase_config import get_db
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from config import settings
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Iterable, Optional
+import time
+
+COLLECTION_NAME = "conversations"
+
+
+class _InboxEntry:
+    def __init__(self):
+        # limit -> PaginatedConversationsResponse
+        self.pages: dict = {}
+        self.expires_at = 0.0
+        self.watch = None
+
+
+class _InboxCache:
+    """
+    Bounded in-process TTL cache of each active user's first inbox page, per page size.
+    Writes that change what a user's inbox shows invalidate it in this process; other workers
+    catch up when the entry expires, or straight away when INBOX_CACHE_LISTENERS_ENABLED keeps a
+    Firestore listener on each cached inbox. A listener is closed with its entry, on expiry or eviction.
+
+    A page read before an invalidation must not be stored after it, so every read takes a version
+    first and put() drops pages whose version predates the user's last invalidation.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, _InboxEntry]" = OrderedDict()
+        # user_id -> version of their last invalidation, bounded like the entries; _floor covers
+        # users whose stamp has been dropped
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self._clock = 0
+        self._lock = Lock()
+
+    def version(self) -> int:
+        with self._lock:
+            return self._clock
+
+    def _pop_expired(self, now: float) -> list:
+        """Drop expired entries from the least recently used end and return their listeners, so an
+        idle user's listener doesn't outlive their pages. Callers hold the lock."""
+        watches = []
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[user_id]
+            watches.append(entry.watch)
+        return watches
+
+    @staticmethod
+    def _close(watches: list) -> None:
+        for watch in watches:
+            if watch is not None:
+                watch.unsubscribe()
+
+    def get(self, user_id: str, limit: int):
+        with self._lock:
+            now = time.monotonic()
+            closed = self._pop_expired(now)
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[user_id]
+                closed.append(entry.watch)
+                entry = None
+            page = None
+            if entry is not None and limit in entry.pages:
+                self._entries.move_to_end(user_id)
+                page = entry.pages[limit]
+        self._close(closed)
+        return page
+
+    def put(self, user_id: str, limit: int, page, version: int, start_watch: Optional[Callable] = None) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if version < max(self._floor, self._invalidated.get(user_id, 0)):
+                return
+            now = time.monotonic()
+            evicted = self._pop_expired(now)
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = _InboxEntry()
+            if not entry.pages or entry.expires_at <= now:
+                entry.pages.clear()
+                entry.expires_at = now + settings.INBOX_CACHE_TTL_SECONDS
+            entry.pages[limit] = page
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                _, old = self._entries.popitem(last=False)
+                evicted.append(old.watch)
+            needs_watch = start_watch is not None and entry.watch is None
+
+        self._close(evicted)
+        if needs_watch:
+            watch = start_watch()
+            with self._lock:
+                if self._entries.get(user_id) is entry and entry.watch is None:
+                    entry.watch, watch = watch, None
+            if watch is not None:
+                watch.unsubscribe()
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._clock += 1
+            for user_id in user_ids:
+                self._invalidated[user_id] = self._clock
+                self._invalidated.move_to_end(user_id)
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    entry.pages.clear()
+            while len(self._invalidated) > max(self.max_size, 1):
+                _, stamp = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, stamp)
+
+    def clear(self) -> None:
+        with self._lock:
+            watches = [entry.watch for entry in self._entries.values() if entry.watch is not None]
+            self._entries.clear()
+            self._invalidated.clear()
+            self._floor = self._clock
+        self._close(watches)
+
+
+_cache = _InboxCache(settings.INBOX_CACHE_MAX_SIZE)
+
+
+def _watch_inbox(db, user_id: str, limit: int) -> Callable:
+    def start():
+        query = db.collection(COLLECTION_NAME)\
+            .where(filter=FieldFilter("participant_ids", "array_contains", user_id))\
+            .order_by("updatedAt", direction=firestore.Query.DESCENDING)\
+            .limit(limit + 1)
+        initial = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            # The first snapshot is the page that was just cached
+            if initial[0]:
+                initial[0] = False
+                return
+            if changes:
+                _cache.invalidate([user_id])
+
+        return query.on_snapshot(on_snapshot)
+    return start
+
+
+def inbox_version() -> int:
+    """Taken before reading a first page, and passed back to put_first_page."""
+    return _cache.version()
+
+
+def get_first_page(user_id: str, limit: int):
+    return _cache.get(user_id, limit)
+
+
+def put_first_page(user_id: str, limit: int, page, version: int, db=None) -> None:
+    start_watch = None
+    if settings.INBOX_CACHE_LISTENERS_ENABLED:
+        start_watch = _watch_inbox(db or get_db(), user_id, limit)
+    _cache.put(user_id, limit, page, version, start_watch)
+
+
+def invalidate_inboxes(user_ids: Iterable[str]) -> None:
+    """Drop the cached first pages of these users (participants of a conversation that changed)."""
+    _cache.invalidate(user_ids)
+
+
+def clear_inbox_cache() -> None:
+    _cache.clear()
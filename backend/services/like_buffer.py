@@ -0,0 +1,230 @@
+from firebase_config import get_db
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud.firestore import Increment
+from fastapi import HTTPException, status
+from datetime import datetime, timezone
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from services import like_service
+
+# Firestore batches have a limit of 500 operations; one slot is kept for the shard update
+BATCH_LIMIT = 500
+
+
+class _PendingLikes:
+    """Buffered like state for one post: user_id -> (persisted state when first buffered, requested state).
+    PUT/DELETE never read the persisted state: it is taken from what the buffer last saw for the user
+    (in flight or flushed), and only when that is unknown assumed to be the opposite of the request.
+    That only affects the reported change and estimated count, since flush() checks the real like documents."""
+
+    def __init__(self):
+        self.users: dict[str, tuple[bool, bool]] = {}
+
+    def state(self, user_id: str) -> Optional[bool]:
+        entry = self.users.get(user_id)
+        return entry[1] if entry else None
+
+    def set(self, user_id: str, known: Optional[bool], liked: bool) -> None:
+        if user_id in self.users:
+            prior = self.users[user_id][0]
+        else:
+            prior = known if known is not None else not liked
+        self.users[user_id] = (prior, liked)
+
+    @property
+    def delta(self) -> int:
+        """Estimated change to the like count."""
+        return sum(int(liked) - int(prior) for prior, liked in self.users.values())
+
+
+class LikeWriteBuffer:
+    """
+    Write-behind buffer for likes (LIKE_WRITE_BEHIND_ENABLED). Like/unlike requests only update
+    in-process state, coalesced per post, and are answered from it straight away. flush() runs
+    every LIKE_FLUSH_INTERVAL_MS: per post it reads the affected like documents in one get_all,
+    writes only the real transitions and applies the net count in a single shard update, so a
+    burst of taps costs a few batched writes instead of a transaction each. The app lifespan
+    flushes once more on shutdown. Likes buffered by a worker that dies without shutting down are lost.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, _PendingLikes] = {}
+        # Entries taken by a flush that is still writing them; still counted in estimates
+        self._inflight: dict[str, _PendingLikes] = {}
+        # Shard total read when a post was first buffered; dropped once the post's flush has landed
+        self._base_counts: dict[str, int] = {}
+        # (post_id, user_id) -> like state as of the last flush or read, bounded LRU
+        self._known: "OrderedDict[tuple[str, str], bool]" = OrderedDict()
+        self._lock = Lock()
+        # Held for a whole flush. flush() runs in the threadpool, and cancelling run() on shutdown
+        # doesn't stop a flush already there, so the final flush must wait for it
+        self._flush_lock = Lock()
+
+    def _remember(self, post_id: str, user_id: str, liked: bool) -> None:
+        # Callers hold the lock
+        key = (post_id, user_id)
+        self._known[key] = liked
+        self._known.move_to_end(key)
+        while len(self._known) > settings.LIKE_BUFFER_KNOWN_STATES_MAX_SIZE:
+            self._known.popitem(last=False)
+
+    def _buffered_state(self, post_id: str, user_id: str) -> Optional[bool]:
+        # Callers hold the lock
+        for entries in (self._pending, self._inflight):
+            state = entries[post_id].state(user_id) if post_id in entries else None
+            if state is not None:
+                return state
+        return None
+
+    def _delta(self, post_id: str) -> int:
+        # Callers hold the lock
+        return sum(entries[post_id].delta for entries in (self._pending, self._inflight) if post_id in entries)
+
+    def peek(self, post_id: str, user_id: str) -> tuple[Optional[bool], int]:
+        """(buffered like state for the user or None, estimated count delta not yet in the shards)."""
+        with self._lock:
+            return self._buffered_state(post_id, user_id), self._delta(post_id)
+
+    def pending_delta(self, post_id: str) -> int:
+        return self.peek(post_id, "")[1]
+
+    def _base_count(self, db, post_id: str) -> int:
+        with self._lock:
+            if post_id in self._base_counts:
+                return self._base_counts[post_id]
+        count = like_service.get_like_count(post_id, db)
+        # No shards with a zero count: either an unliked post from before shards were pre-created,
+        # or no post at all. Only the latter must be rejected up front.
+        if count == 0 and not db.collection(like_service.COLLECTION_NAME).document(post_id).get().exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Post not found with post_id: {post_id}"
+            )
+        return count
+
+    def apply(self, db, post_id: str, user_id: str, liked: Optional[bool]) -> tuple[bool, bool, int]:
+        """
+        Buffer a like (True), unlike (False) or toggle (None).
+        Returns (liked, changed, estimated like count).
+        """
+        base = self._base_count(db, post_id)
+        with self._lock:
+            known = self._buffered_state(post_id, user_id)
+            if known is None:
+                known = self._known.get((post_id, user_id))
+        if known is None and liked is None:
+            # A toggle needs the current state; one read, still no write
+            known = like_service.like_ref(db, post_id, user_id).get().exists
+            with self._lock:
+                self._remember(post_id, user_id, known)
+
+        with self._lock:
+            self._base_counts.setdefault(post_id, base)
+            pending = self._pending.setdefault(post_id, _PendingLikes())
+            current = self._buffered_state(post_id, user_id)
+            if current is None:
+                current = known
+            target = (not current) if liked is None else liked
+            pending.set(user_id, current, target)
+            likes = max(self._base_counts[post_id] + self._delta(post_id), 0)
+        return target, current != target, likes
+
+    def flush(self, db=None) -> int:
+        """Write out everything buffered so far. Returns the number of like documents changed.
+        Flushes run one at a time."""
+        with self._flush_lock:
+            return self._flush(db)
+
+    def _flush(self, db=None) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._inflight.update(pending)
+        if not pending:
+            return 0
+
+        db = db or get_db()
+        changed = 0
+        for post_id, likes in pending.items():
+            try:
+                changed += self._flush_post(db, post_id, likes)
+            except HTTPException:
+                self._finish(post_id, likes, landed=False)  # Post was deleted; nothing to attach likes to
+            except Exception as e:
+                self._requeue(post_id, likes)
+                print(f"Warning: failed to flush buffered likes for post {post_id}: {str(e)}")
+            else:
+                self._finish(post_id, likes, landed=True)
+        return changed
+
+    def _finish(self, post_id: str, likes: _PendingLikes, landed: bool) -> None:
+        """The post's flushed entries are in the shards now: stop counting them and re-read the total next time."""
+        with self._lock:
+            self._inflight.pop(post_id, None)
+            self._base_counts.pop(post_id, None)
+            if landed:
+                for user_id, (_, liked) in likes.users.items():
+                    self._remember(post_id, user_id, liked)
+
+    def _flush_post(self, db, post_id: str, likes: _PendingLikes) -> int:
+        user_ids = list(likes.users)
+        refs = [like_service.like_ref(db, post_id, user_id) for user_id in user_ids]
+        existing = {snap.reference.id for snap in db.get_all(refs) if snap.exists}
+
+        ops = []
+        for user_id, ref in zip(user_ids, refs):
+            liked = likes.users[user_id][1]
+            if liked and user_id not in existing:
+                ops.append((ref, user_id, True))
+            elif not liked and user_id in existing:
+                ops.append((ref, user_id, False))
+        if not ops:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        for start in range(0, len(ops), BATCH_LIMIT - 1):
+            chunk = ops[start:start + BATCH_LIMIT - 1]
+            batch = db.batch()
+            for ref, user_id, liked in chunk:
+                if liked:
+                    batch.create(ref, {"userId": user_id, "postId": post_id, "createdAt": now})
+                else:
+                    batch.delete(ref, option=db.write_option(exists=True))
+            delta = sum(1 if liked else -1 for _, _, liked in chunk)
+            batch.update(like_service.random_shard_ref(db, post_id), {"count": Increment(delta)})
+            try:
+                batch.commit()
+            except (gcp_exceptions.Conflict, gcp_exceptions.NotFound):
+                # Someone changed a like document since the get_all above, or the post has no shards:
+                # fall back to the idempotent per-user write, which handles both
+                for _, user_id, liked in chunk:
+                    like_service.write_like(db, post_id, user_id, liked)
+
+        like_service.mark_dirty(post_id, sum(1 if liked else -1 for _, _, liked in ops))
+        return len(ops)
+
+    def _requeue(self, post_id: str, likes: _PendingLikes) -> None:
+        """Put a post's unflushed entries back, keeping any newer request for the same user."""
+        with self._lock:
+            self._inflight.pop(post_id, None)
+            pending = self._pending.setdefault(post_id, _PendingLikes())
+            for user_id, (prior, liked) in likes.users.items():
+                if user_id in pending.users:
+                    pending.users[user_id] = (prior, pending.users[user_id][1])
+                else:
+                    pending.users[user_id] = (prior, liked)
+
+    async def run(self) -> None:
+        """Background flush loop started from the app lifespan."""
+        while True:
+            await asyncio.sleep(settings.LIKE_FLUSH_INTERVAL_MS / 1000)
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                print(f"Warning: failed to flush buffered likes: {str(e)}")
+
+
+like_buffer = LikeWriteBuffer()
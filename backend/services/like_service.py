@@ -0,0 +1,300 @@
+from models import LikeResponse
+from firebase_config import get_db
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud import firestore
+from google.cloud.firestore import Increment
+from fastapi import HTTPException, status
+from datetime import datetime, timezone
+from threading import Lock
+import asyncio
+import random
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+COLLECTION_NAME = "posts"
+# posts/{postId}/likes/{userId}: one document per liker
+LIKES_SUBCOLLECTION = "likes"
+# posts/{postId}/likeShards/{n}: like counter split over LIKE_COUNTER_SHARDS documents so bursts
+# of likes on one post don't contend on a single document
+LIKE_SHARDS_SUBCOLLECTION = "likeShards"
+
+# Posts whose shards changed since the last roll-up into the post document, with the net number
+# of likes added meanwhile (fed into the trending score)
+_dirty_posts: dict[str, int] = {}
+_dirty_lock = Lock()
+
+
+def mark_dirty(post_id: str, like_delta: int = 0) -> None:
+    """Queue the post for the next roll-up, with the net number of likes its shards just gained."""
+    with _dirty_lock:
+        _dirty_posts[post_id] = _dirty_posts.get(post_id, 0) + like_delta
+
+
+def like_ref(db, post_id: str, user_id: str):
+    return db.collection(COLLECTION_NAME).document(post_id).collection(LIKES_SUBCOLLECTION).document(user_id)
+
+
+def random_shard_ref(db, post_id: str):
+    shard_id = str(random.randrange(max(settings.LIKE_COUNTER_SHARDS, 1)))
+    return db.collection(COLLECTION_NAME).document(post_id).collection(LIKE_SHARDS_SUBCOLLECTION).document(shard_id)
+
+
+def initial_shards(db, post_id: str) -> list:
+    """(shard_ref, data) pairs that create a post's zeroed counter shards. Writing them alongside
+    the post lets like/unlike use shard updates, which fail if the post doesn't exist, instead of reading it."""
+    shards = db.collection(COLLECTION_NAME).document(post_id).collection(LIKE_SHARDS_SUBCOLLECTION)
+    return [(shards.document(str(n)), {"count": 0}) for n in range(max(settings.LIKE_COUNTER_SHARDS, 1))]
+
+
+def get_like_count(post_id: str, db=None) -> int:
+    """Exact like count: the sum of the post's counter shards."""
+    db = db or get_db()
+    shards = db.collection(COLLECTION_NAME).document(post_id).collection(LIKE_SHARDS_SUBCOLLECTION).stream()
+    return max(sum((shard.to_dict() or {}).get("count", 0) for shard in shards), 0)
+
+
+def current_like_count(post_id: str, db=None) -> int:
+    """Like count as the API reports it: the shard total plus any likes still in the write-behind buffer."""
+    count = get_like_count(post_id, db)
+    if settings.LIKE_WRITE_BEHIND_ENABLED:
+        from services.like_buffer import like_buffer
+        count = max(count + like_buffer.pending_delta(post_id), 0)
+    return count
+
+
+def liked_post_ids(post_ids: list, user_id: str, db=None) -> set:
+    """
+    Which of post_ids the user has liked, in one round-trip: a single get_all over the
+    posts/{id}/likes/{user_id} documents. Cost is one document read per post on the page,
+    however many likes those posts have. Buffered write-behind state takes precedence.
+    """
+    if not post_ids or not user_id:
+        return set()
+    liked = set()
+    to_read = list(dict.fromkeys(post_ids))
+    if settings.LIKE_WRITE_BEHIND_ENABLED:
+        from services.like_buffer import like_buffer
+        unresolved = []
+        for post_id in to_read:
+            buffered, _ = like_buffer.peek(post_id, user_id)
+            if buffered is None:
+                unresolved.append(post_id)
+            elif buffered:
+                liked.add(post_id)
+        to_read = unresolved
+    if to_read:
+        db = db or get_db()
+        refs = [like_ref(db, post_id, user_id) for post_id in to_read]
+        # The like document's parent is the likes subcollection, whose parent is the post
+        liked.update(snap.reference.parent.parent.id for snap in db.get_all(refs) if snap.exists)
+    return liked
+
+
+def _toggle_like(db, post_id: str, user_id: str) -> bool:
+    """Flip the user's like in one transaction. Returns True if the post is now liked."""
+    post_ref = db.collection(COLLECTION_NAME).document(post_id)
+    user_like_ref = like_ref(db, post_id, user_id)
+
+    @firestore.transactional
+    def _txn(transaction):
+        if not post_ref.get(transaction=transaction).exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Post not found with post_id: {post_id}"
+            )
+        liked = user_like_ref.get(transaction=transaction).exists
+
+        # Shards are written blind (never read here), so concurrent likers don't conflict on them
+        shard_ref = random_shard_ref(db, post_id)
+        if liked:
+            transaction.delete(user_like_ref)
+            transaction.set(shard_ref, {"count": Increment(-1)}, merge=True)
+        else:
+            transaction.set(user_like_ref, {
+                "userId": user_id,
+                "postId": post_id,
+                "createdAt": datetime.now(timezone.utc),
+            })
+            transaction.set(shard_ref, {"count": Increment(1)}, merge=True)
+        return not liked
+
+    return _txn(db.transaction())
+
+
+async def _buffer_like(post_id: str, current_user_id: str, liked) -> LikeResponse:
+    """Write-behind path: record the request in the like buffer and answer from the buffered state."""
+    from services.like_buffer import like_buffer
+    try:
+        liked, changed, likes = await run_in_threadpool(like_buffer.apply, get_db(), post_id, current_user_id, liked)
+        if liked:
+            message = "Post liked successfully" if changed else "Post already liked"
+        else:
+            message = "Post unliked successfully" if changed else "Post was not liked"
+        return LikeResponse(post_id=post_id, likes=likes, liked=liked, message=message)
+
+    except HTTPException:
+        raise
+    except gcp_exceptions.GoogleCloudError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while updating like: {str(e)}"
+        )
+
+
+async def toggle_like(post_id: str, current_user_id: str) -> LikeResponse:
+    """Toggle like on a post. If user hasn't liked, add like. If already liked, remove like."""
+    if settings.LIKE_WRITE_BEHIND_ENABLED:
+        return await _buffer_like(post_id, current_user_id, None)
+    try:
+        db = get_db()
+        liked = await run_in_threadpool(_toggle_like, db, post_id, current_user_id)
+        mark_dirty(post_id, 1 if liked else -1)
+        likes = await run_in_threadpool(get_like_count, post_id, db)
+
+        return LikeResponse(
+            post_id=post_id,
+            likes=likes,
+            liked=liked,
+            message="Post liked successfully" if liked else "Post unliked successfully"
+        )
+
+    except HTTPException:
+        raise
+    except gcp_exceptions.GoogleCloudError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while toggling like: {str(e)}"
+        )
+
+
+def write_like(db, post_id: str, user_id: str, liked: bool) -> bool:
+    """
+    Set the user's like state with a single blind batch: the like document is created (or deleted
+    with an exists precondition) together with a shard update. If the like is already in the
+    requested state the precondition fails, the whole batch is rejected and nothing is counted
+    twice, so retries and double taps are harmless. Returns True if the state changed.
+    """
+    user_like_ref = like_ref(db, post_id, user_id)
+
+    def _commit():
+        batch = db.batch()
+        if liked:
+            batch.create(user_like_ref, {
+                "userId": user_id,
+                "postId": post_id,
+                "createdAt": datetime.now(timezone.utc),
+            })
+        else:
+            batch.delete(user_like_ref, option=db.write_option(exists=True))
+        batch.update(random_shard_ref(db, post_id), {"count": Increment(1 if liked else -1)})
+        batch.commit()
+
+    try:
+        _commit()
+        return True
+    except gcp_exceptions.Conflict:
+        return False  # Like document already exists
+    except gcp_exceptions.NotFound:
+        # On unlike, usually the like document was already gone: a retry or double tap. One read
+        # tells that apart from a missing shard without touching the shards.
+        if not liked and not user_like_ref.get().exists:
+            return False
+
+    # The shard is missing: the post doesn't exist, or it predates pre-created shards.
+    post_ref = db.collection(COLLECTION_NAME).document(post_id)
+    if not post_ref.get().exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Post not found with post_id: {post_id}"
+        )
+    shards_batch = db.batch()
+    for shard_ref, _ in initial_shards(db, post_id):
+        # Increment(0) creates a missing shard at 0 without touching an existing count
+        shards_batch.set(shard_ref, {"count": Increment(0)}, merge=True)
+    shards_batch.commit()
+
+    try:
+        _commit()
+        return True
+    except (gcp_exceptions.Conflict, gcp_exceptions.NotFound):
+        return False  # A concurrent request already applied the same change
+
+
+async def set_like(post_id: str, current_user_id: str, liked: bool) -> LikeResponse:
+    """Idempotently like (liked=True) or unlike a post. The count is read from the shards after the write."""
+    if settings.LIKE_WRITE_BEHIND_ENABLED:
+        return await _buffer_like(post_id, current_user_id, liked)
+    try:
+        db = get_db()
+        changed = await run_in_threadpool(write_like, db, post_id, current_user_id, liked)
+        if changed:
+            mark_dirty(post_id, 1 if liked else -1)
+        likes = await run_in_threadpool(get_like_count, post_id, db)
+
+        if liked:
+            message = "Post liked successfully" if changed else "Post already liked"
+        else:
+            message = "Post unliked successfully" if changed else "Post was not liked"
+        return LikeResponse(post_id=post_id, likes=likes, liked=liked, message=message)
+
+    except HTTPException:
+        raise
+    except gcp_exceptions.GoogleCloudError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while {'liking' if liked else 'unliking'} post: {str(e)}"
+        )
+
+
+def roll_up_like_counts(db=None) -> int:
+    """
+    Copy the shard totals of recently liked/unliked posts into each post document's likes field,
+    which feeds sort on, and fold the likes added meanwhile into its trending score.
+    One write per post per roll-up, however many likes arrived meanwhile.
+    Returns the number of posts updated.
+    """
+    from services.trending_service import apply_like_delta
+    with _dirty_lock:
+        pending = list(_dirty_posts.items())
+        _dirty_posts.clear()
+    if not pending:
+        return 0
+
+    db = db or get_db()
+    updated = 0
+    for i, (post_id, like_delta) in enumerate(pending):
+        try:
+            post_ref = db.collection(COLLECTION_NAME).document(post_id)
+            if apply_like_delta(db, post_ref, get_like_count(post_id, db), like_delta):
+                updated += 1
+        except Exception:
+            # Retry this post and the ones not reached on the next roll-up
+            for retry_post_id, retry_delta in pending[i:]:
+                mark_dirty(retry_post_id, retry_delta)
+            raise
+    return updated
+
+
+async def keep_like_counts_rolled_up() -> None:
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(settings.LIKE_COUNT_ROLLUP_SECONDS)
+        try:
+            await run_in_threadpool(roll_up_like_counts)
+        except Exception as e:
+            print(f"Warning: failed to roll up like counts: {str(e)}")
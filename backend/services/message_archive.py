@@ -0,0 +1,183 @@
+from firebase_config import get_db
+from google.cloud import firestore
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud.firestore_v1.base_query import FieldFilter
+from models import MessageResponse
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+COLLECTION_NAME = "conversations"
+MESSAGES_SUBCOLLECTION = "messages"
+CHUNKS_SUBCOLLECTION = "messageChunks"
+
+# Firestore documents are limited to 1 MiB; leave room for field names and the messageIds list
+CHUNK_MAX_BYTES = 900_000
+
+# Chunk documents: messages (oldest first, each with its original id), messageIds, count,
+# firstCreatedAt/firstId, lastCreatedAt/lastId, createdAt.
+# Compaction always takes the oldest loose messages, so every archived message is older than
+# every message still in the messages subcollection. Readers rely on that ordering.
+
+
+def _key(entry: dict) -> tuple:
+    return entry["createdAt"], entry["id"]
+
+
+def _entry_size(entry: dict) -> int:
+    # Content dominates; the rest is a generous allowance for the other fields and the ID list
+    return len((entry.get("content") or "").encode()) + 256
+
+
+def _to_response(entry: dict, conversation_id: str) -> MessageResponse:
+    data = {k: v for k, v in entry.items() if k != "id"}
+    return MessageResponse(**data, message_id=entry["id"], conversation_id=conversation_id)
+
+
+def compact_conversation(db, conversation_id: str, now: Optional[datetime] = None) -> int:
+    """
+    Move the conversation's messages older than MESSAGE_COMPACTION_AGE_DAYS into chunk documents,
+    MESSAGE_CHUNK_SIZE at a time (fewer if they'd exceed CHUNK_MAX_BYTES). Only full chunks are
+    written, so a quiet old conversation keeps its last few messages loose. Each chunk is created
+    and its messages deleted in one batch; the deletes require the messages to still exist, so a
+    concurrent compaction or deletion makes the batch fail rather than archive a message twice.
+    Returns the number of messages archived.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.MESSAGE_COMPACTION_AGE_DAYS)
+    convo_ref = db.collection(COLLECTION_NAME).document(conversation_id)
+    messages_ref = convo_ref.collection(MESSAGES_SUBCOLLECTION)
+
+    archived = 0
+    while True:
+        docs = list(
+            messages_ref.where(filter=FieldFilter("createdAt", "<", cutoff))
+            .order_by("createdAt")
+            .order_by("__name__")
+            .limit(settings.MESSAGE_CHUNK_SIZE)
+            .stream()
+        )
+        if len(docs) < settings.MESSAGE_CHUNK_SIZE:
+            return archived
+
+        entries = []
+        size = 0
+        for doc in docs:
+            entry = {**doc.to_dict(), "id": doc.id}
+            size += _entry_size(entry)
+            if entries and size > CHUNK_MAX_BYTES:
+                break
+            entries.append(entry)
+
+        batch = db.batch()
+        batch.create(convo_ref.collection(CHUNKS_SUBCOLLECTION).document(), {
+            "messages": entries,
+            "messageIds": [entry["id"] for entry in entries],
+            "count": len(entries),
+            "firstCreatedAt": entries[0]["createdAt"],
+            "firstId": entries[0]["id"],
+            "lastCreatedAt": entries[-1]["createdAt"],
+            "lastId": entries[-1]["id"],
+            "createdAt": now,
+        })
+        for entry in entries:
+            batch.delete(messages_ref.document(entry["id"]), option=db.write_option(exists=True))
+        batch.update(convo_ref, {
+            "loose_message_count": firestore.Increment(-len(entries)),
+            "archived_message_count": firestore.Increment(len(entries)),
+        })
+        batch.commit()
+        archived += len(entries)
+
+
+def compact_due_conversations(db=None) -> int:
+    """Compaction sweep over conversations with at least a chunk's worth of loose messages."""
+    db = db or get_db()
+    query = db.collection(COLLECTION_NAME)\
+        .where(filter=FieldFilter("loose_message_count", ">=", settings.MESSAGE_CHUNK_SIZE))\
+        .select(["is_deleting"])
+    archived = 0
+    for doc in query.stream():
+        if (doc.to_dict() or {}).get("is_deleting"):
+            continue
+        try:
+            archived += compact_conversation(db, doc.id)
+        except (gcp_exceptions.Conflict, gcp_exceptions.NotFound, gcp_exceptions.PreconditionFailed) as e:
+            # Raced with another worker's compaction or with a deletion; the next sweep catches up
+            print(f"Warning: skipped compacting conversation {doc.id}: {str(e)}")
+    return archived
+
+
+async def keep_messages_compacted() -> None:
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(settings.MESSAGE_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(compact_due_conversations)
+        except Exception as e:
+            print(f"Warning: failed to compact messages: {str(e)}")
+
+
+def find_archived_message(convo_ref, message_id: str) -> Optional[tuple]:
+    """(createdAt, message ID) of an archived message, or None."""
+    chunks = convo_ref.collection(CHUNKS_SUBCOLLECTION)\
+        .where(filter=FieldFilter("messageIds", "array_contains", message_id))\
+        .limit(1)\
+        .stream()
+    for chunk in chunks:
+        for entry in chunk.to_dict()["messages"]:
+            if entry["id"] == message_id:
+                return _key(entry)
+    return None
+
+
+def archived_older(convo_ref, conversation_id: str, anchor: Optional[tuple], count: int,
+                   inclusive: bool = False) -> list:
+    """Up to count archived messages older than anchor (or the newest ones), newest first.
+    One read per chunk of up to MESSAGE_CHUNK_SIZE messages."""
+    query = convo_ref.collection(CHUNKS_SUBCOLLECTION)
+    if anchor:
+        query = query.where(filter=FieldFilter("firstCreatedAt", "<=", anchor[0]))
+    query = query.order_by("firstCreatedAt", direction=firestore.Query.DESCENDING)
+
+    found = []
+    last_chunk = None
+    while len(found) < count:
+        page = query.start_after(last_chunk) if last_chunk else query
+        chunks = list(page.limit(count // settings.MESSAGE_CHUNK_SIZE + 2).stream())
+        for chunk in chunks:
+            for entry in chunk.to_dict()["messages"]:
+                if anchor is None or _key(entry) < anchor or (inclusive and _key(entry) == anchor):
+                    found.append(entry)
+        if not chunks or len(chunks) < count // settings.MESSAGE_CHUNK_SIZE + 2:
+            break
+        last_chunk = chunks[-1]
+
+    found.sort(key=_key, reverse=True)
+    return [_to_response(entry, conversation_id) for entry in found[:count]]
+
+
+def archived_newer(convo_ref, conversation_id: str, anchor: tuple, count: int,
+                   inclusive: bool = False) -> list:
+    """Up to count archived messages newer than anchor, oldest first."""
+    query = convo_ref.collection(CHUNKS_SUBCOLLECTION)\
+        .where(filter=FieldFilter("lastCreatedAt", ">=", anchor[0]))\
+        .order_by("lastCreatedAt")
+
+    found = []
+    last_chunk = None
+    while len(found) < count:
+        page = query.start_after(last_chunk) if last_chunk else query
+        chunks = list(page.limit(count // settings.MESSAGE_CHUNK_SIZE + 2).stream())
+        for chunk in chunks:
+            for entry in chunk.to_dict()["messages"]:
+                if _key(entry) > anchor or (inclusive and _key(entry) == anchor):
+                    found.append(entry)
+        if not chunks or len(chunks) < count // settings.MESSAGE_CHUNK_SIZE + 2:
+            break
+        last_chunk = chunks[-1]
+
+    found.sort(key=_key)
+    return [_to_response(entry, conversation_id) for entry in found[:count]]
@@ -1,9 +1,93 @@
-from models import MessageCreate, MessageResponse
+from models import (MessageCreate, MessageResponse, MessageBatchCreate, MessageBatchResponse,
+                    MessageBroadcastCreate, MessageBroadcastResponse, BroadcastFailure)
 from firebase_config import get_db
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 from typing import Optional
+import asyncio
 from google.cloud import firestore
+from google.cloud import exceptions as gcp_exceptions
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from services import conversation_service, inbox_cache, message_archive
+from services.participant_cache import load_participants, require_participant
+from utils.cursors import encode_cursor, decode_cursor
+
+def _conversation_update(participant_ids, sender_id: str, last_content: str, sent_at: datetime, count: int) -> dict:
+    """Conversation fields written alongside count new messages from sender_id, the last one at sent_at."""
+    update = {
+        "last_message_preview": last_content[:100],
+        "last_message_sent_at": sent_at,
+        "last_message_sender_id": sender_id,
+        "updatedAt": sent_at
+    }
+    # Unread state: everyone else has count more unread messages, the sender has read up to here
+    for participant_id in participant_ids:
+        if participant_id != sender_id:
+            update[conversation_service.unread_count_field(participant_id)] = firestore.Increment(count)
+    update[conversation_service.unread_count_field(sender_id)] = 0
+    update[conversation_service.last_read_field(sender_id)] = sent_at
+    # Drives message_archive's compaction sweep
+    update["loose_message_count"] = firestore.Increment(count)
+    return update
+
+
+def _write_messages(db, conversation_id: str, sender_id: str, contents: list) -> list:
+    """
+    Store contents as consecutive messages with one conversation read and update, in one transaction.
+    Verifies conversation exists and user is a participant.
+    """
+    now = datetime.now(timezone.utc)
+    convo_ref = db.collection("conversations").document(conversation_id)
+    messages_ref = convo_ref.collection("messages")
+    # A microsecond apart, so the batch keeps its order in (createdAt, ID) pages
+    messages = [
+        MessageResponse(
+            message_id=messages_ref.document().id,
+            conversation_id=conversation_id,
+            sender_id=sender_id,
+            content=content,
+            createdAt=now + timedelta(microseconds=i)
+        )
+        for i, content in enumerate(contents)
+    ]
+
+    # Write messages + conversation update atomically so concurrent deletion
+    # (which marks is_deleting=true) is detected and rejected.
+    @firestore.transactional
+    def _write(transaction):
+        convo_doc = convo_ref.get(transaction=transaction)
+        if not convo_doc.exists:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+
+        convo_data = convo_doc.to_dict()
+        if sender_id not in convo_data.get("participant_ids", []):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not a participant in this conversation"
+            )
+
+        if convo_data.get("is_deleting"):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Conversation is being deleted"
+            )
+
+        for message in messages:
+            transaction.set(messages_ref.document(message.message_id), {
+                "sender_id": sender_id,
+                "content": message.content,
+                "createdAt": message.created_at
+            })
+        transaction.update(convo_ref, _conversation_update(
+            convo_data.get("participant_ids", []), sender_id, messages[-1].content, messages[-1].created_at, len(messages)
+        ))
+        return convo_data.get("participant_ids", [])
+
+    participant_ids = _write(db.transaction())
+    inbox_cache.invalidate_inboxes(participant_ids)
+    return messages
+
 
 async def send_message(conversation_id: str, sender_id: str, message_create: MessageCreate) -> MessageResponse:
     """
@@ -13,98 +97,230 @@ async def send_message(conversation_id: str, sender_id: str, message_create: Mes
     """
     try:
         db = get_db()
-        now = datetime.now(timezone.utc)
-        convo_ref = db.collection("conversations").document(conversation_id)
-        message_ref = convo_ref.collection("messages").document()
+        return _write_messages(db, conversation_id, sender_id, [message_create.content])[0]
 
-        # Write message + conversation update atomically so concurrent deletion
-        # (which marks is_deleting=true) is detected and rejected.
-        @firestore.transactional
-        def _write_message(transaction):
-            convo_doc = convo_ref.get(transaction=transaction)
-            if not convo_doc.exists:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-
-            convo_data = convo_doc.to_dict()
-            if sender_id not in convo_data.get("participant_ids", []):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You are not a participant in this conversation"
-                )
-
-            if convo_data.get("is_deleting"):
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Conversation is being deleted"
-                )
-
-            message_data = {
-                "sender_id": sender_id,
-                "content": message_create.content,
-                "createdAt": now
-            }
-
-            transaction.set(message_ref, message_data)
-            transaction.update(convo_ref, {
-                "last_message_preview": message_create.content[:100],
-                "last_message_sent_at": now,
-                "last_message_sender_id": sender_id,
-                "updatedAt": now
-            })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-        transaction = db.transaction()
-        _write_message(transaction)
-        
+
+async def send_messages(conversation_id: str, sender_id: str, batch: MessageBatchCreate) -> MessageBatchResponse:
+    """Send several messages to a conversation in one transaction: all are stored or none are."""
+    try:
+        db = get_db()
+        messages = _write_messages(db, conversation_id, sender_id, [message.content for message in batch.messages])
+        return MessageBatchResponse(messages=messages)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+def _commit_broadcast(db, sender_id: str, content: str, now: datetime, targets: list) -> tuple:
+    """
+    Write the message to each (conversation_id, participant IDs) in targets with one batch.
+    If the batch fails (usually a conversation deleted since its participants were loaded), each
+    conversation is retried on its own so one bad target doesn't fail the rest.
+    Returns (sent messages, failures).
+    """
+    def _add(batch, conversation_id, participant_ids):
+        convo_ref = db.collection("conversations").document(conversation_id)
+        message_ref = convo_ref.collection("messages").document()
+        batch.set(message_ref, {"sender_id": sender_id, "content": content, "createdAt": now})
+        batch.update(convo_ref, _conversation_update(participant_ids, sender_id, content, now, 1))
         return MessageResponse(
-            message_id=message_ref.id,
-            conversation_id=conversation_id,
-            sender_id=sender_id,
-            content=message_create.content,
-            createdAt=now
+            message_id=message_ref.id, conversation_id=conversation_id, sender_id=sender_id, content=content, createdAt=now
         )
-        
+
+    batch = db.batch()
+    sent = [_add(batch, conversation_id, participant_ids) for conversation_id, participant_ids in targets]
+    try:
+        batch.commit()
+        return sent, []
+    except Exception:
+        if len(targets) == 1:
+            raise
+
+    sent, failed = [], []
+    for target in targets:
+        try:
+            more, _ = _commit_broadcast(db, sender_id, content, now, [target])
+            sent.extend(more)
+        except gcp_exceptions.NotFound:
+            failed.append(BroadcastFailure(conversation_id=target[0], status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"))
+        except Exception as e:
+            failed.append(BroadcastFailure(conversation_id=target[0], status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)))
+    return sent, failed
+
+
+async def broadcast_message(sender_id: str, broadcast: MessageBroadcastCreate) -> MessageBroadcastResponse:
+    """
+    Send one message to many of the sender's conversations. Participants and is_deleting are read
+    in one batch rather than a transaction per conversation, and the writes go
+    out MESSAGE_BROADCAST_BATCH_SIZE conversations per batch with MESSAGE_BROADCAST_CONCURRENCY
+    batches in flight. Conversations that can't be sent to are reported in failed.
+    A conversation deleted between the participant check and the write just has its new message
+    deleted along with the rest.
+    """
+    try:
+        db = get_db()
+        now = datetime.now(timezone.utc)
+        conversation_ids = list(dict.fromkeys(broadcast.conversation_ids))
+        # Read fresh: a cached entry would miss a deletion started on another worker, and the
+        # batched writes below don't check is_deleting themselves
+        participants = await run_in_threadpool(load_participants, conversation_ids, db, True)
+
+        targets, failed = [], []
+        for conversation_id in conversation_ids:
+            participant_ids = participants.get(conversation_id)
+            if participant_ids is None:
+                failed.append(BroadcastFailure(conversation_id=conversation_id, status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"))
+            elif sender_id not in participant_ids:
+                failed.append(BroadcastFailure(conversation_id=conversation_id, status_code=status.HTTP_403_FORBIDDEN, detail="You are not a participant in this conversation"))
+            else:
+                targets.append((conversation_id, sorted(participant_ids)))
+
+        size = max(settings.MESSAGE_BROADCAST_BATCH_SIZE, 1)
+        limit = asyncio.Semaphore(max(settings.MESSAGE_BROADCAST_CONCURRENCY, 1))
+
+        async def _commit(chunk):
+            async with limit:
+                return await run_in_threadpool(_commit_broadcast, db, sender_id, broadcast.content, now, chunk)
+
+        results = await asyncio.gather(*(_commit(targets[i:i + size]) for i in range(0, len(targets), size)))
+        sent = [message for chunk_sent, _ in results for message in chunk_sent]
+        failed += [failure for _, chunk_failed in results for failure in chunk_failed]
+
+        delivered = {message.conversation_id for message in sent}
+        inbox_cache.invalidate_inboxes({pid for conversation_id, pids in targets if conversation_id in delivered for pid in pids})
+        return MessageBroadcastResponse(sent=sent, failed=failed)
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-async def list_messages(conversation_id: str, current_user_id: str, limit: int = 20, last_doc_id: Optional[str] = None):
+def _message_cursor(message: MessageResponse) -> str:
+    return encode_cursor(message.created_at, message.message_id)
+
+
+def _resolve_anchor(convo_ref, token: str) -> tuple:
+    """(createdAt, message ID) for a page token or a bare message ID. Only a bare ID costs a read."""
+    cursor = decode_cursor(token)
+    if cursor:
+        return cursor
+    doc = convo_ref.collection("messages").document(token).get()
+    if doc.exists:
+        return doc.to_dict()["createdAt"], doc.id
+    archived = message_archive.find_archived_message(convo_ref, token)
+    if archived is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    return archived
+
+
+def _loose_page(messages_ref, conversation_id: str, anchor: Optional[tuple], count: int,
+                newer: bool, inclusive: bool) -> list:
+    direction = firestore.Query.ASCENDING if newer else firestore.Query.DESCENDING
+    query = messages_ref.order_by("createdAt", direction=direction).order_by("__name__", direction=direction)
+    if anchor:
+        position = {"createdAt": anchor[0], "__name__": anchor[1]}
+        query = query.start_at(position) if inclusive else query.start_after(position)
+    return [
+        MessageResponse(**doc.to_dict(), message_id=doc.id, conversation_id=conversation_id)
+        for doc in query.limit(count).stream()
+    ]
+
+
+def _page(convo_ref, conversation_id: str, anchor: Optional[tuple], limit: int,
+          newer: bool = False, inclusive: bool = False) -> list:
+    """
+    Up to limit + 1 messages walking away from anchor: older (newest first) or newer (oldest first).
+    Archived messages are all older than the ones still in the messages subcollection, so older
+    pages read messages first and continue into chunks, and newer pages the other way round.
     """
-    List messages from a conversation with cursor pagination.
+    messages_ref = convo_ref.collection("messages")
+    wanted = limit + 1
+    if newer:
+        page = message_archive.archived_newer(convo_ref, conversation_id, anchor, wanted, inclusive) if anchor else []
+        if len(page) < wanted:
+            page += _loose_page(messages_ref, conversation_id, anchor, wanted - len(page), True, inclusive)
+        return page
+    page = _loose_page(messages_ref, conversation_id, anchor, wanted, False, inclusive)
+    if len(page) < wanted:
+        page += message_archive.archived_older(convo_ref, conversation_id, anchor, wanted - len(page), inclusive)
+    return page
+
+
+async def list_messages(
+    conversation_id: str,
+    current_user_id: str,
+    limit: int = 20,
+    last_doc_id: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    around: Optional[str] = None):
+    """
+    List messages from a conversation, newest first, one query per page (plus one read per chunk of
+    archived messages on older pages).
+    last_doc_id/before page towards older messages and after towards newer ones; each takes a page
+    token or a message ID. around returns the page centred on a message, for jump-to-message.
+    nextPageToken continues towards older messages and prevPageToken towards newer ones.
     Verifies user is a participant in the conversation.
     """
     try:
-        # Verify conversation exists and user is participant
-        await conversation_service.get_conversation_by_id(conversation_id, current_user_id)
-        
+        if sum(token is not None for token in (last_doc_id, before, after, around)) > 1:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Use only one of last_doc_id, before, after and around"
+            )
+
         db = get_db()
-        # We query the messages subcollection for the conversation, ordering by createdAt descending for pagination.
-        query = db.collection("conversations").document(conversation_id)\
-            .collection("messages")\
-            .order_by("createdAt", direction=firestore.Query.DESCENDING)
-        # If last_doc_id is provided, we use it as the starting point for the next page of results.
-        if last_doc_id:
-            last_doc = db.collection("conversations").document(conversation_id)\
-                .collection("messages").document(last_doc_id).get()
-            query = query.start_after(last_doc)
-        # again, here we fetch one more document than the limit to determine if there is a next page.
-        docs = query.limit(limit + 1).stream()
-        messages = []
-        
-        # we convert each document to a MessageResponse model, including the message_id and conversation_id in the response.
-        for doc in docs:
-            data = doc.to_dict()
-            messages.append(MessageResponse(**data, message_id=doc.id, conversation_id=conversation_id))
-        
-        # Handle pagination by checking if we have more messages than the limit.
-        # If so, we set the next_page_token to the ID of the last message in the current page.
+        # Participants are cached, so on most pages this costs no read
+        require_participant(conversation_id, current_user_id, db)
+        convo_ref = db.collection("conversations").document(conversation_id)
+
         next_page_token = None
-        if len(messages) > limit:
-            messages = messages[:limit]
-            next_page_token = messages[-1].message_id
-        
-        return {"messages": messages, "nextPageToken": next_page_token}
+        prev_page_token = None
+        if after:
+            anchor = _resolve_anchor(convo_ref, after)
+            newer = _page(convo_ref, conversation_id, anchor, limit, newer=True)
+            if len(newer) > limit:
+                newer = newer[:limit]
+                prev_page_token = _message_cursor(newer[-1])
+            messages = list(reversed(newer))
+            # The anchor itself is older than this page
+            next_page_token = _message_cursor(messages[-1]) if messages else encode_cursor(*anchor)
+        elif around:
+            anchor = _resolve_anchor(convo_ref, around)
+            # The anchor and the older half, then fill the rest with newer messages
+            older_limit = (limit + 1) // 2
+            older = _page(convo_ref, conversation_id, anchor, older_limit, inclusive=True)
+            if len(older) > older_limit:
+                older = older[:older_limit]
+                next_page_token = _message_cursor(older[-1])
+            newer_limit = limit - len(older)
+            newer = _page(convo_ref, conversation_id, anchor, newer_limit, newer=True) if newer_limit > 0 else []
+            if len(newer) > newer_limit:
+                newer = newer[:newer_limit]
+                prev_page_token = _message_cursor(newer[-1])
+            elif newer_limit == 0:
+                prev_page_token = encode_cursor(*anchor)
+            messages = list(reversed(newer)) + older
+        else:
+            token = before or last_doc_id
+            anchor = _resolve_anchor(convo_ref, token) if token else None
+            messages = _page(convo_ref, conversation_id, anchor, limit)
+            # again, here we fetch one more document than the limit to determine if there is a next page.
+            if len(messages) > limit:
+                messages = messages[:limit]
+                next_page_token = _message_cursor(messages[-1])
+            if anchor:
+                prev_page_token = _message_cursor(messages[0]) if messages else encode_cursor(*anchor)
+
+        return {"messages": messages, "nextPageToken": next_page_token, "prevPageToken": prev_page_token}
         
     except HTTPException:
         raise
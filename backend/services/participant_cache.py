@@ -0,0 +1,103 @@
+from firebase_config import get_db
+from config import settings
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from threading import Lock
+from typing import Optional
+import time
+
+COLLECTION_NAME = "conversations"
+
+
+class _ParticipantCache:
+    """Bounded in-process TTL cache of conversation_id -> participant IDs, for conversations that
+    exist and aren't being deleted."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[frozenset, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, conversation_id: str) -> Optional[frozenset]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            participants, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[conversation_id]
+                return None
+            self._entries.move_to_end(conversation_id)
+            return participants
+
+    def put(self, conversation_id: str, participants: frozenset) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[conversation_id] = (participants, time.monotonic() + settings.PARTICIPANT_CACHE_TTL_SECONDS)
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, conversation_id: str) -> None:
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _ParticipantCache(settings.PARTICIPANT_CACHE_MAX_SIZE)
+
+
+def require_participant(conversation_id: str, user_id: str, db=None) -> None:
+    """
+    Raise 404 if the conversation doesn't exist (or is being deleted) and 403 if user_id isn't in it.
+    Reads the conversation only on a cache miss.
+    """
+    participants = _cache.get(conversation_id)
+    if participants is None:
+        db = db or get_db()
+        doc = db.collection(COLLECTION_NAME).document(conversation_id).get()
+        data = doc.to_dict() if doc.exists else None
+        if data is None or data.get("is_deleting"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+        participants = frozenset(data.get("participant_ids", []))
+        _cache.put(conversation_id, participants)
+
+    if user_id not in participants:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a participant in this conversation")
+
+
+def load_participants(conversation_ids: list, db=None, fresh: bool = False) -> dict:
+    """
+    conversation_id -> participant IDs for each of conversation_ids, None for conversations that
+    don't exist or are being deleted. Cache misses are read in one batch; with fresh=True every
+    conversation is, so a deletion started on another worker is seen (the cache is still refreshed).
+    """
+    found = {
+        conversation_id: None if fresh else _cache.get(conversation_id)
+        for conversation_id in conversation_ids
+    }
+    missing = [conversation_id for conversation_id, participants in found.items() if participants is None]
+    if missing:
+        db = db or get_db()
+        refs = [db.collection(COLLECTION_NAME).document(conversation_id) for conversation_id in missing]
+        for doc in db.get_all(refs):
+            data = doc.to_dict() if doc.exists else None
+            if data is None or data.get("is_deleting"):
+                _cache.invalidate(doc.id)
+                continue
+            found[doc.id] = frozenset(data.get("participant_ids", []))
+            _cache.put(doc.id, found[doc.id])
+    return found
+
+
+def invalidate_participants(conversation_id: str) -> None:
+    """Drop the cached entry (call when the conversation is marked for deletion and when its job runs)."""
+    _cache.invalidate(conversation_id)
+
+
+def clear_participant_cache() -> None:
+    _cache.clear()
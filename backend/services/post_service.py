@@ -5,36 +5,46 @@ from google.cloud import exceptions as gcp_exceptions
 from google.cloud import firestore
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
-from utils.location import resolve_location_from_zip, haversine_miles, bounding_box_from_miles
+from config import settings
+from services.profile_cache import get_profile_summary
+from services import like_service
+from services.trending_service import current_score
+from utils.location import resolve_location_from_zip, GeocodingUnavailableError, haversine_miles, bounding_box_from_miles, add_geohash_fields, geohash_cover
 
 COLLECTION_NAME = "posts"
 
-def add_computed_fields(post_data: dict, current_user_id: str = None) -> dict:
-    """Add computed likes field and likedByCurrentUser flag"""
-    post_data["likes"] = len(post_data.get("likedBy", []))
-    if current_user_id:
-        post_data["likedByCurrentUser"] = current_user_id in post_data.get("likedBy", [])
-    else:
-        post_data["likedByCurrentUser"] = False
+def add_computed_fields(post_data: dict, liked_by_current_user: bool = False) -> dict:
+    """Add the likes count and likedByCurrentUser flag.
+    likes is the post document's rolled-up count; likers live in the posts/{id}/likes subcollection."""
+    post_data.setdefault("likes", 0)
+    post_data.pop("likedBy", None)  # Documents not yet migrated by scripts/migrate_likes_to_subcollection.py
+    post_data["likedByCurrentUser"] = liked_by_current_user
     return post_data
 
 
+def mark_liked_by_current_user(db, posts: list, current_user_id: str) -> None:
+    """Set likedByCurrentUser on a page of posts with one batched lookup."""
+    liked = like_service.liked_post_ids([post["postId"] for post in posts], current_user_id, db)
+    for post in posts:
+        post["likedByCurrentUser"] = post["postId"] in liked
+
+
 async def create_post(post: PostCreate, current_user_id: str) -> PostResponse:
     try:
         db = get_db()
         post_data = post.model_dump(by_alias=True)
         now = datetime.now(timezone.utc)
 
-        user_doc = db.collection("profiles").document(current_user_id).get()
-        if not user_doc.exists:
+        user_data = get_profile_summary(current_user_id, db)
+        if user_data is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
-        user_data = user_doc.to_dict()
 
         loc_data = post_data.get("location")
         if loc_data and loc_data.get("zipCode"):
             resolved = await resolve_location_from_zip(loc_data["zipCode"])
             if resolved:
                 post_data["location"] = resolved.model_dump(by_alias=True)
+        add_geohash_fields(post_data.get("location"))
         post_data.update({
             "userId": current_user_id,
             "firstName": user_data.get("firstName", "Unknown"),
@@ -43,18 +53,29 @@ async def create_post(post: PostCreate, current_user_id: str) -> PostResponse:
             "createdAt": now,
             "updatedAt": now,
             "edited": False,
-            "likedBy": [],
             "likes": 0,
+            "trendingScore": 0.0,
+            "trendingUpdatedAt": now,
         })
 
         new_post_ref = db.collection(COLLECTION_NAME).document()
         post_data["postId"] = new_post_ref.id
-        new_post_ref.set(post_data)
+        batch = db.batch()
+        batch.set(new_post_ref, post_data)
+        for shard_ref, shard_data in like_service.initial_shards(db, new_post_ref.id):
+            batch.set(shard_ref, shard_data)
+        batch.commit()
 
-        return PostResponse(**add_computed_fields(post_data, current_user_id))
+        return PostResponse(**add_computed_fields(post_data))
 
     except HTTPException:
         raise
+    except GeocodingUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except gcp_exceptions.GoogleCloudError as e:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -67,7 +88,10 @@ async def get_post(post_id: str, current_user_id: str) -> PostResponse:
         post_doc = db.collection(COLLECTION_NAME).document(post_id).get()
         if not post_doc.exists:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Post not found with post_id: {post_id}")
-        return PostResponse(**add_computed_fields(post_doc.to_dict(), current_user_id))
+        post_data = add_computed_fields(post_doc.to_dict(), post_id in like_service.liked_post_ids([post_id], current_user_id, db))
+        # A single post shows the exact count rather than the periodically rolled-up one
+        post_data["likes"] = like_service.current_like_count(post_id, db)
+        return PostResponse(**post_data)
 
     except HTTPException:
         raise
@@ -98,12 +122,21 @@ async def update_post(post_id: str, post_update: PostUpdate, current_user_id: st
             resolved = await resolve_location_from_zip(loc["zipCode"])
             if resolved:
                 update_data["location"] = resolved.model_dump(by_alias=True)
+        add_geohash_fields(update_data.get("location"))
         posts_ref.document(post_id).update(update_data)
         existing_data.update(update_data)
-        return PostResponse(**add_computed_fields(existing_data, current_user_id))
+        existing_data = add_computed_fields(existing_data, post_id in like_service.liked_post_ids([post_id], current_user_id, db))
+        existing_data["likes"] = like_service.current_like_count(post_id, db)
+        return PostResponse(**existing_data)
 
     except HTTPException:
         raise
+    except GeocodingUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except gcp_exceptions.GoogleCloudError as e:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -120,7 +153,8 @@ async def delete_post(post_id: str, current_user_id: str) -> None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Post not found with postId: {post_id}")
 
         verify_user_access(current_user_id, post_doc.to_dict().get("userId"))
-        posts_ref.document(post_id).delete()
+        # Also removes the likes and likeShards subcollections
+        db.recursive_delete(posts_ref.document(post_id))
 
     except HTTPException:
         raise
@@ -162,20 +196,30 @@ async def _list_posts_in_bbox(db, params: PostListParams, current_user_id: str)
         query = query.where(filter=FieldFilter("userId", "==", params.user_id))
     if params.post_type:
         query = query.where(filter=FieldFilter("postType", "==", params.post_type))
-    if params.genres:
-        query = query.where(filter=FieldFilter("genres", "array_contains_any", params.genres))
 
-    # Use a lat/lng bounding box (Firestore multi-field inequality, supported since March 2024).
-    # https://puf.io/posts/how-to-perform-geoqueries-on-firestore-somewhat-efficiently/
-    # Haversine below trims the corners.
-    base_query = (query
-        .where(filter=FieldFilter("location.lat", ">=", min_lat))
-        .where(filter=FieldFilter("location.lat", "<=", max_lat))
-        .where(filter=FieldFilter("location.lng", ">=", min_lng))
-        .where(filter=FieldFilter("location.lng", "<=", max_lng))
-        .order_by("location.lat")
-        .order_by("location.lng")
-    )
+    cover = geohash_cover(params.user_lat, params.user_lng, effective_radius) if settings.GEOHASH_PREFIX_QUERIES else None
+    # Firestore expands 'in' x 'array_contains_any' into one disjunction per pair and caps that at 30.
+    # Past the cap, genres are matched in memory below instead.
+    genres_in_memory = bool(params.genres) and cover is not None and len(cover[1]) * len(params.genres) > 30
+    if params.genres and not genres_in_memory:
+        query = query.where(filter=FieldFilter("genres", "array_contains_any", params.genres))
+    if cover:
+        # The 3x3 block of cells at the chosen precision contains the whole search circle, so a
+        # single equality 'in' lookup replaces the range scan; small radii read only nearby posts.
+        precision, cells = cover
+        base_query = query.where(filter=FieldFilter(f"location.geohashPrefixes.p{precision}", "in", cells))
+    else:
+        # Use a lat/lng bounding box (Firestore multi-field inequality, supported since March 2024).
+        # https://puf.io/posts/how-to-perform-geoqueries-on-firestore-somewhat-efficiently/
+        # Haversine below trims the corners.
+        base_query = (query
+            .where(filter=FieldFilter("location.lat", ">=", min_lat))
+            .where(filter=FieldFilter("location.lat", "<=", max_lat))
+            .where(filter=FieldFilter("location.lng", ">=", min_lng))
+            .where(filter=FieldFilter("location.lng", "<=", max_lng))
+            .order_by("location.lat")
+            .order_by("location.lng")
+        )
 
     # For distance sort we can stop once we have enough candidates (pragmatic optimisation;
     # acceptable because bounding-box corners are already trimmed by Haversine below).
@@ -218,6 +262,10 @@ async def _list_posts_in_bbox(db, params: PostListParams, current_user_id: str)
                 post_genres = data.get("genres", [])
                 if not all(g in post_genres for g in params.genres):
                     continue
+            elif genres_in_memory:
+                post_genres = data.get("genres", [])
+                if not any(g in post_genres for g in params.genres):
+                    continue
 
             # Instruments & skill level check
             if params.instrument_requirements:
@@ -230,7 +278,7 @@ async def _list_posts_in_bbox(db, params: PostListParams, current_user_id: str)
 
             data["postId"] = doc.id
             data["_dist"] = dist
-            candidates.append(add_computed_fields(data, current_user_id))
+            candidates.append(add_computed_fields(data))
 
         if len(docs) < BATCH_SIZE:
             break  # Exhausted the Firestore result set
@@ -241,6 +289,10 @@ async def _list_posts_in_bbox(db, params: PostListParams, current_user_id: str)
         candidates.sort(key=lambda p: p["_dist"], reverse=reverse)
     elif params.sort_by == "likes":
         candidates.sort(key=lambda p: p.get("likes", 0), reverse=reverse)
+    elif params.sort_by == "trending":
+        # Every candidate is in memory anyway, so rank on the exact score as of now
+        now = datetime.now(timezone.utc)
+        candidates.sort(key=lambda p: current_score(p, now), reverse=reverse)
     else:  # createdAt
         candidates.sort(
             key=lambda p: p.get("createdAt") or datetime.min.replace(tzinfo=timezone.utc),
@@ -253,6 +305,7 @@ async def _list_posts_in_bbox(db, params: PostListParams, current_user_id: str)
     start = params.page * params.limit
     end = start + params.limit
     page_results = candidates[start:end]
+    mark_liked_by_current_user(db, page_results, current_user_id)
     next_page = str(params.page + 1) if end < len(candidates) else None
 
     return {"posts": page_results, "nextPageToken": next_page}
@@ -288,7 +341,8 @@ async def list_posts(params: PostListParams, current_user_id: str) -> dict:
 
             direction = firestore.Query.ASCENDING if params.sort_order == "asc" else firestore.Query.DESCENDING
 
-            query = query.order_by(params.sort_by, direction=direction).limit(internal_fetch_limit)
+            sort_field = "trendingScore" if params.sort_by == "trending" else params.sort_by
+            query = query.order_by(sort_field, direction=direction).limit(internal_fetch_limit)
 
             # Pagination cursor for the current loop iteration
             if current_last_id:
@@ -326,10 +380,12 @@ async def list_posts(params: PostListParams, current_user_id: str) -> dict:
                         data[field] = data[field].to_datetime()
 
                 data["postId"] = doc.id
-                results.append(add_computed_fields(data, current_user_id))
+                results.append(add_computed_fields(data))
 
         # We only provide a token if we successfully filled a whole page.
         # If results < limit, it means we hit the end of the collection.
+        mark_liked_by_current_user(db, results, current_user_id)
+
         pagination_token = None
         if len(results) == params.limit:
             pagination_token = current_last_id
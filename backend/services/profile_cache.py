@@ -0,0 +1,103 @@
+from firebase_config import get_db
+from config import settings
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import time
+
+COLLECTION_NAME = "profiles"
+
+# Profile fields that other collections denormalize (post authors, conversation snapshots, reviewers)
+SUMMARY_FIELDS = ("firstName", "lastName", "profilePicUrl")
+
+
+class _ProfileSummaryCache:
+    """
+    Bounded in-process TTL cache of profile existence plus the summary fields.
+    A cached None means "no profile"; those entries use a much shorter TTL so a profile
+    created on another worker becomes visible quickly.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[Optional[dict], float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id: str) -> tuple[bool, Optional[dict]]:
+        """Return (hit, summary). summary is None for a cached missing profile."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False, None
+            summary, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return False, None
+            self._entries.move_to_end(user_id)
+            return True, summary
+
+    def put(self, user_id: str, summary: Optional[dict]) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = settings.PROFILE_CACHE_TTL_SECONDS if summary is not None else settings.PROFILE_CACHE_NEGATIVE_TTL_SECONDS
+        with self._lock:
+            self._entries[user_id] = (summary, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _ProfileSummaryCache(settings.PROFILE_CACHE_MAX_SIZE)
+
+
+def build_summary(profile_data: dict) -> dict:
+    """Pick the denormalized summary fields out of a full profile document.
+    Absent fields stay absent so callers' .get() defaults still apply."""
+    return {field: profile_data[field] for field in SUMMARY_FIELDS if field in profile_data}
+
+
+def get_profile_summary(user_id: str, db=None) -> Optional[dict]:
+    """Return the profile's summary fields, or None if the profile does not exist.
+    Reads Firestore only on a cache miss."""
+    hit, summary = _cache.get(user_id)
+    if hit:
+        return summary
+
+    db = db or get_db()
+    profile_doc = db.collection(COLLECTION_NAME).document(user_id).get()
+    summary = build_summary(profile_doc.to_dict() or {}) if profile_doc.exists else None
+    _cache.put(user_id, summary)
+    return summary
+
+
+def profile_exists(user_id: str, db=None) -> bool:
+    """Cached check that a profile document exists."""
+    return get_profile_summary(user_id, db) is not None
+
+
+def peek_profile_summary(user_id: str) -> tuple[bool, Optional[dict]]:
+    """Return (hit, summary) from the cache alone, never touching Firestore."""
+    return _cache.get(user_id)
+
+
+def prime_profile(user_id: str, profile_data: Optional[dict]) -> None:
+    """Record freshly read or written profile data (None for a missing profile)
+    so the next lookup needs no read."""
+    _cache.put(user_id, build_summary(profile_data) if profile_data is not None else None)
+
+
+def invalidate_profile(user_id: str) -> None:
+    """Drop any cached entry for the profile (call after it is deleted)."""
+    _cache.invalidate(user_id)
+
+
+def clear_profile_cache() -> None:
+    _cache.clear()
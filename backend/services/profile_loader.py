@@ -0,0 +1,88 @@
+from firebase_config import get_db
+from services.profile_cache import peek_profile_summary, prime_profile, build_summary
+from starlette.concurrency import run_in_threadpool
+from typing import Iterable, List, Optional
+import asyncio
+
+COLLECTION_NAME = "profiles"
+
+
+class ProfileLoader:
+    """
+    Request-scoped batching loader for profile documents.
+
+    Every load() issued in the same event-loop tick is collected and resolved with a single
+    get_all, and results are memoized for the rest of the request. Fetched profiles also
+    refresh the shared profile summary cache.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self._results: dict[str, Optional[dict]] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    def bind(self, db) -> "ProfileLoader":
+        """Use the caller's Firestore client unless the loader already has one."""
+        if self.db is None:
+            self.db = db
+        return self
+
+    async def load(self, user_id: str) -> Optional[dict]:
+        """Return the full profile document data, or None if the profile does not exist."""
+        if user_id in self._results:
+            return self._results[user_id]
+
+        future = self._pending.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[user_id] = future
+            if self._dispatch_task is None:
+                # The task's first step runs after every callback already queued this tick,
+                # so sibling load() calls (e.g. from asyncio.gather) join the same batch.
+                self._dispatch_task = loop.create_task(self._dispatch())
+        return await future
+
+    async def load_many(self, user_ids: Iterable[str]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(user_id) for user_id in user_ids)))
+
+    async def load_summary(self, user_id: str) -> Optional[dict]:
+        """Return the profile summary fields, served from the shared cache when possible."""
+        hit, summary = peek_profile_summary(user_id)
+        if hit:
+            return summary
+        data = await self.load(user_id)
+        return build_summary(data) if data is not None else None
+
+    async def load_summaries(self, user_ids: Iterable[str]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load_summary(user_id) for user_id in user_ids)))
+
+    async def _dispatch(self):
+        batch, self._pending = self._pending, {}
+        self._dispatch_task = None
+        try:
+            found = await run_in_threadpool(self._fetch, list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for user_id, future in batch.items():
+            data = found.get(user_id)
+            self._results[user_id] = data
+            prime_profile(user_id, data)
+            if not future.done():
+                future.set_result(data)
+
+    def _fetch(self, user_ids: List[str]) -> dict[str, dict]:
+        db = self.db or get_db()
+        refs = [db.collection(COLLECTION_NAME).document(user_id) for user_id in user_ids]
+        return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+
+def get_profile_loader() -> ProfileLoader:
+    """FastAPI dependency. Dependencies are cached per request, so every consumer in a
+    request shares one loader."""
+    return ProfileLoader()
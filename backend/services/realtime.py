@@ -0,0 +1,298 @@
+from firebase_config import get_db
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from fastapi import HTTPException, status
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Optional
+import asyncio
+import json
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from models import ConversationResponse, MessageResponse
+from services import conversation_service, message_archive
+from utils.cursors import encode_cursor, decode_cursor
+
+MESSAGES_SUBCOLLECTION = "messages"
+
+HEARTBEAT = ": keep-alive\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class Event:
+    """One server-sent event. key is (sort value, document ID) and doubles as the resume cursor."""
+
+    def __init__(self, name: str, data: dict, key: Optional[tuple] = None):
+        self.name = name
+        self.data = data
+        self.key = key
+
+    @property
+    def doc_id(self) -> Optional[str]:
+        return self.key[1] if self.key else None
+
+    def format(self) -> str:
+        lines = f"id: {encode_cursor(*self.key)}\n" if self.key else ""
+        return f"{lines}event: {self.name}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+# Put in place of a slow subscriber's backlog
+_OVERFLOW = Event("resync", {})
+
+
+class Subscriber:
+    """One connected client. Its queue is bounded so a stalled connection can't hold events forever."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.REALTIME_SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: Event) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog; the client reconnects from the last event it actually received
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+
+
+class _Channel:
+    def __init__(self, keep_state: bool):
+        self.subscribers: set = set()
+        # Latest event per document, replayed to subscribers that join a running listener
+        self.state: dict[str, Event] = {}
+        self.keep_state = keep_state
+        self.watch = None
+
+    def publish(self, events: list) -> None:
+        for event in events:
+            if self.keep_state:
+                if event.name.endswith("_removed"):
+                    self.state.pop(event.doc_id, None)
+                else:
+                    self.state[event.doc_id] = event
+            for subscriber in list(self.subscribers):
+                subscriber.offer(event)
+
+
+class RealtimeHub:
+    """
+    Shared Firestore listeners for this worker process: one per channel (a conversation's messages or
+    a user's inbox) however many clients are subscribed, opened by the first subscriber and closed
+    when the last one leaves. Listener callbacks run on Firestore's thread and are handed to the
+    event loop before touching subscriber queues.
+    """
+
+    def __init__(self):
+        self._channels: dict[str, _Channel] = {}
+
+    def ensure_capacity(self, key: str) -> None:
+        if key not in self._channels and len(self._channels) >= settings.REALTIME_MAX_LISTENERS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live streams on this server, try again shortly"
+            )
+
+    def subscribe(self, key: str, start: Callable, keep_state: bool = False,
+                  replay_after: Optional[tuple] = None) -> Subscriber:
+        """start(publish) opens the Firestore listener and returns its watch; only the first subscriber calls it."""
+        channel = self._channels.get(key)
+        if channel is None:
+            self.ensure_capacity(key)
+            channel = _Channel(keep_state)
+            loop = asyncio.get_running_loop()
+
+            def publish(events: list) -> None:
+                if events and not loop.is_closed():
+                    loop.call_soon_threadsafe(channel.publish, events)
+
+            self._channels[key] = channel
+            try:
+                channel.watch = start(publish)
+            except Exception:
+                del self._channels[key]
+                raise
+
+        subscriber = Subscriber()
+        replay = sorted(channel.state.values(), key=lambda e: e.key)
+        for event in replay:
+            if replay_after is None or event.key > replay_after:
+                subscriber.offer(event)
+        channel.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, key: str, subscriber: Subscriber) -> None:
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        channel.subscribers.discard(subscriber)
+        if not channel.subscribers:
+            del self._channels[key]
+            if channel.watch is not None:
+                channel.watch.unsubscribe()
+
+    def listener_count(self) -> int:
+        return len(self._channels)
+
+
+hub = RealtimeHub()
+
+
+def _message_event(conversation_id: str, doc) -> Event:
+    data = doc.to_dict()
+    message = MessageResponse(**data, message_id=doc.id, conversation_id=conversation_id)
+    return Event("message", message.model_dump(mode="json", by_alias=True), (data["createdAt"], doc.id))
+
+
+def _conversation_event(doc, removed: bool = False, read_time: Optional[datetime] = None) -> Event:
+    # Keyed on the document's update_time rather than updatedAt: marking a conversation read and
+    # refreshing participant snapshots change the doc without bumping updatedAt, and a resuming
+    # client must still get those. A removal is keyed on when the listener saw it.
+    data = doc.to_dict() or {}
+    changed_at = read_time if removed else getattr(doc, "update_time", None)
+    key = (changed_at or datetime.now(timezone.utc), doc.id)
+    if removed or data.get("is_deleting"):
+        return Event("conversation_removed", {"conversationId": doc.id}, key)
+    conversation = ConversationResponse(**data, conversation_id=doc.id)
+    return Event("conversation", conversation.model_dump(mode="json", by_alias=True), key)
+
+
+def _watch_messages(db, conversation_id: str, since: datetime) -> Callable:
+    def start(publish):
+        # Only messages sent after the listener opened, newest window only, so the listener's
+        # result set stays small however long the channel lives; older ones come from backfill
+        query = db.collection(conversation_service.COLLECTION_NAME).document(conversation_id)\
+            .collection(MESSAGES_SUBCOLLECTION)\
+            .where(filter=FieldFilter("createdAt", ">=", since))\
+            .order_by("createdAt", direction=firestore.Query.DESCENDING)\
+            .limit(settings.REALTIME_BACKFILL_PAGE_SIZE)
+
+        def on_snapshot(docs, changes, read_time):
+            added = [_message_event(conversation_id, c.document) for c in changes if c.type.name == "ADDED"]
+            publish(sorted(added, key=lambda e: e.key))
+
+        return query.on_snapshot(on_snapshot)
+    return start
+
+
+def _watch_inbox(db, user_id: str) -> Callable:
+    def start(publish):
+        query = db.collection(conversation_service.COLLECTION_NAME)\
+            .where(filter=FieldFilter("participant_ids", "array_contains", user_id))\
+            .order_by("updatedAt", direction=firestore.Query.DESCENDING)\
+            .limit(settings.REALTIME_INBOX_LIMIT)
+
+        def on_snapshot(docs, changes, read_time):
+            # REMOVED also covers conversations pushed off the first page by newer activity
+            publish([
+                _conversation_event(c.document, removed=c.type.name == "REMOVED", read_time=read_time)
+                for c in changes
+            ])
+
+        return query.on_snapshot(on_snapshot)
+    return start
+
+
+def _messages_after(db, conversation_id: str, after: tuple) -> list:
+    convo_ref = db.collection(conversation_service.COLLECTION_NAME).document(conversation_id)
+    # A cursor from long ago may point into the archive, which holds the oldest messages
+    archived = message_archive.archived_newer(convo_ref, conversation_id, after, settings.REALTIME_BACKFILL_PAGE_SIZE)
+    events = [
+        Event("message", message.model_dump(mode="json", by_alias=True), (message.created_at, message.message_id))
+        for message in archived
+    ]
+    if len(events) == settings.REALTIME_BACKFILL_PAGE_SIZE:
+        return events
+    created_at, message_id = after
+    docs = convo_ref.collection(MESSAGES_SUBCOLLECTION)\
+        .order_by("createdAt")\
+        .order_by("__name__")\
+        .start_after({"createdAt": created_at, "__name__": message_id})\
+        .limit(settings.REALTIME_BACKFILL_PAGE_SIZE - len(events))\
+        .stream()
+    return events + [_message_event(conversation_id, doc) for doc in docs]
+
+
+async def _pump(key: str, subscriber: Subscriber, last_key: Optional[tuple],
+                skip: Callable[[Event], bool] = lambda event: False) -> AsyncIterator[str]:
+    """Send queued events with a heartbeat while idle. A subscriber that overflowed gets a resync event
+    carrying its last delivered cursor and the stream ends; the client reconnects with it."""
+    while True:
+        try:
+            event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.REALTIME_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            yield HEARTBEAT
+            continue
+        if event is _OVERFLOW:
+            yield Event("resync", {"lastEventId": encode_cursor(*last_key) if last_key else None}).format()
+            return
+        if skip(event):
+            continue
+        yield event.format()
+        if event.key and (last_key is None or event.key > last_key):
+            last_key = event.key
+
+
+async def conversation_event_stream(conversation_id: str, current_user_id: str,
+                                    last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    SSE stream of new messages in a conversation. With last_event_id (a message cursor, as sent in
+    each event's id), messages after it are sent first, so reconnecting clients miss nothing.
+    Access is checked before the stream starts.
+    """
+    await conversation_service.get_conversation_by_id(conversation_id, current_user_id)
+    key = f"conversation:{conversation_id}"
+    hub.ensure_capacity(key)
+    db = get_db()
+    cursor = decode_cursor(last_event_id) if last_event_id else None
+
+    async def _events():
+        # Subscribe before backfilling so nothing sent in between is missed; overlap is skipped below
+        subscriber = hub.subscribe(key, _watch_messages(db, conversation_id, datetime.now(timezone.utc)))
+        try:
+            last_key = cursor
+            backfilled = set()
+            if cursor:
+                while True:
+                    page = await run_in_threadpool(_messages_after, db, conversation_id, last_key)
+                    for event in page:
+                        backfilled.add(event.doc_id)
+                        yield event.format()
+                        last_key = event.key
+                    if len(page) < settings.REALTIME_BACKFILL_PAGE_SIZE:
+                        break
+
+            def _already_sent(event: Event) -> bool:
+                return event.doc_id in backfilled or (cursor is not None and event.key <= cursor)
+
+            async for chunk in _pump(key, subscriber, last_key, _already_sent):
+                yield chunk
+        finally:
+            hub.unsubscribe(key, subscriber)
+
+    return _events()
+
+
+async def inbox_event_stream(current_user_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    SSE stream of changes to the first page of the user's inbox. A new subscriber first gets the current
+    page (only conversations whose documents changed after last_event_id when resuming), then each
+    change as it happens.
+    """
+    key = f"inbox:{current_user_id}"
+    hub.ensure_capacity(key)
+    db = get_db()
+    cursor = decode_cursor(last_event_id) if last_event_id else None
+
+    async def _events():
+        subscriber = hub.subscribe(key, _watch_inbox(db, current_user_id), keep_state=True, replay_after=cursor)
+        try:
+            async for chunk in _pump(key, subscriber, cursor):
+                yield chunk
+        finally:
+            hub.unsubscribe(key, subscriber)
+
+    return _events()
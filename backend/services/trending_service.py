@@ -0,0 +1,211 @@
+from firebase_config import get_db
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud import exceptions as gcp_exceptions
+from google.api_core import exceptions as api_exceptions
+from google.cloud import firestore
+from fastapi import HTTPException, status
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import math
+import uuid
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from utils.location import geohash_cover, haversine_miles
+
+COLLECTION_NAME = "posts"
+LEASES_COLLECTION = "backgroundLeases"
+DECAY_LEASE_ID = "trendingDecay"
+
+# Identifies this process as a lease holder
+_WORKER_ID = uuid.uuid4().hex
+
+# Posts store trendingScore decayed to trendingUpdatedAt. Each like adds 1 and each unlike removes 1
+# at the time it is rolled up; the score then halves every TRENDING_HALF_LIFE_HOURS.
+# Posts from before trending scores have no trendingScore and are left out of order_by("trendingScore")
+# until scripts/backfill_trending_scores.py has run.
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if hasattr(value, "to_datetime"):
+        value = value.to_datetime()
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def decay(score: float, updated_at, now: datetime) -> float:
+    """Score decayed from updated_at to now."""
+    updated_at = _as_datetime(updated_at)
+    if not score or updated_at is None:
+        return score or 0.0
+    elapsed_hours = max((now - updated_at).total_seconds(), 0) / 3600
+    return score * math.pow(0.5, elapsed_hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def current_score(post_data: dict, now: Optional[datetime] = None) -> float:
+    """The post's trending score as of now, for in-memory ranking."""
+    now = now or datetime.now(timezone.utc)
+    return decay(post_data.get("trendingScore", 0.0), post_data.get("trendingUpdatedAt"), now)
+
+
+def apply_like_delta(db, post_ref, likes: int, like_delta: int) -> bool:
+    """
+    Roll-up write for one post: set the exact like count and fold like_delta into the trending score,
+    in a transaction so concurrent roll-ups and the decay sweep don't lose updates.
+    Returns False if the post no longer exists.
+    """
+    @firestore.transactional
+    def _txn(transaction):
+        snap = post_ref.get(transaction=transaction)
+        if not snap.exists:
+            return False
+        data = snap.to_dict() or {}
+        now = datetime.now(timezone.utc)
+        score = max(decay(data.get("trendingScore", 0.0), data.get("trendingUpdatedAt"), now) + like_delta, 0.0)
+        transaction.update(post_ref, {
+            "likes": likes,
+            "trendingScore": score if score >= settings.TRENDING_MIN_SCORE else 0.0,
+            "trendingUpdatedAt": now,
+        })
+        return True
+
+    return _txn(db.transaction())
+
+
+def decay_trending_scores(db=None) -> int:
+    """
+    Decay sweep: bring every non-zero trendingScore down to the present so server-side
+    order_by("trendingScore") stays meaningful for posts nobody has liked lately.
+    Scores below TRENDING_MIN_SCORE drop to 0, which takes the post out of later sweeps.
+    Returns the number of posts updated.
+    """
+    db = db or get_db()
+    now = datetime.now(timezone.utc)
+    query = db.collection(COLLECTION_NAME).where(filter=FieldFilter("trendingScore", ">", 0))
+    updated = 0
+    for snap in query.stream():
+        data = snap.to_dict() or {}
+        score = decay(data.get("trendingScore", 0.0), data.get("trendingUpdatedAt"), now)
+        try:
+            # Skip the post if a roll-up rewrote it since it was read; that write already decayed it
+            snap.reference.update(
+                {"trendingScore": score if score >= settings.TRENDING_MIN_SCORE else 0.0, "trendingUpdatedAt": now},
+                option=db.write_option(last_update_time=snap.update_time),
+            )
+            updated += 1
+        except (api_exceptions.FailedPrecondition, gcp_exceptions.NotFound):
+            continue
+    return updated
+
+
+def claim_decay_lease(db, worker_id: str = _WORKER_ID) -> bool:
+    """
+    Take or renew the decay sweep lease for this worker. Every process runs the loop, but only the
+    lease holder sweeps; the lease lasts two sweep intervals, so another worker takes over within
+    a couple of intervals of the holder stopping.
+    """
+    lease_ref = db.collection(LEASES_COLLECTION).document(DECAY_LEASE_ID)
+
+    @firestore.transactional
+    def _claim(transaction):
+        snap = lease_ref.get(transaction=transaction)
+        lease = snap.to_dict() if snap.exists else {}
+        now = datetime.now(timezone.utc)
+        expires_at = _as_datetime(lease.get("expiresAt"))
+        if lease.get("holder") not in (None, worker_id) and expires_at is not None and expires_at > now:
+            return False
+        transaction.set(lease_ref, {
+            "holder": worker_id,
+            "expiresAt": now + timedelta(seconds=2 * settings.TRENDING_SWEEP_SECONDS),
+        })
+        return True
+
+    return _claim(db.transaction())
+
+
+def _decay_if_leased() -> int:
+    db = get_db()
+    if not claim_decay_lease(db):
+        return 0
+    return decay_trending_scores(db)
+
+
+async def keep_trending_scores_decayed() -> None:
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(settings.TRENDING_SWEEP_SECONDS)
+        try:
+            await run_in_threadpool(_decay_if_leased)
+        except Exception as e:
+            print(f"Warning: failed to decay trending scores: {str(e)}")
+
+
+async def list_trending_posts(
+    current_user_id: str,
+    limit: int = 20,
+    user_lat: Optional[float] = None,
+    user_lng: Optional[float] = None,
+    radius_miles: Optional[float] = None) -> dict:
+    """
+    Top posts by trending score, optionally near a point. With coordinates the query is served from
+    the location.geohashPrefixes cells covering the radius, ordered by trendingScore, so it reads
+    about `limit` documents instead of every post in the area.
+    """
+    from services.post_service import add_computed_fields, mark_liked_by_current_user, list_posts
+    from models import PostListParams
+    try:
+        db = get_db()
+        effective_radius = radius_miles if radius_miles is not None else 25.0
+        cover = None
+        if user_lat is not None:
+            cover = geohash_cover(user_lat, user_lng, effective_radius) if settings.GEOHASH_PREFIX_QUERIES else None
+            if cover is None:
+                # Prefixes not backfilled yet (or radius too big for one cell block): rank the radius
+                # candidates in memory instead
+                params = PostListParams(
+                    limit=limit, user_lat=user_lat, user_lng=user_lng, radius_miles=effective_radius,
+                    sort_by="trending", sort_order="desc",
+                )
+                result = await list_posts(params, current_user_id)
+                return {"posts": result["posts"], "nextPageToken": None}
+
+        query = db.collection(COLLECTION_NAME)
+        if cover:
+            precision, cells = cover
+            query = query.where(filter=FieldFilter(f"location.geohashPrefixes.p{precision}", "in", cells))
+        # Over-fetch a little: the cell block is square, so corners are trimmed by distance below
+        fetch_limit = limit * 2 if cover else limit
+        docs = query.order_by("trendingScore", direction=firestore.Query.DESCENDING).limit(fetch_limit).stream()
+
+        now = datetime.now(timezone.utc)
+        posts = []
+        for doc in docs:
+            data = doc.to_dict()
+            if cover:
+                loc = data.get("location") or {}
+                if loc.get("lat") is None or loc.get("lng") is None:
+                    continue
+                if haversine_miles(user_lat, user_lng, loc["lat"], loc["lng"]) > effective_radius:
+                    continue
+            for field in ["createdAt", "updatedAt"]:
+                if field in data and hasattr(data[field], "to_datetime"):
+                    data[field] = data[field].to_datetime()
+            data["postId"] = doc.id
+            data["_score"] = current_score(data, now)
+            posts.append(add_computed_fields(data))
+
+        # Stored scores were decayed at different times; re-rank on the score as of now
+        posts.sort(key=lambda p: p["_score"], reverse=True)
+        posts = posts[:limit]
+        for p in posts:
+            del p["_score"]
+        mark_liked_by_current_user(db, posts, current_user_id)
+        return {"posts": posts, "nextPageToken": None}
+
+    except HTTPException:
+        raise
+    except gcp_exceptions.GoogleCloudError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred while getting trending posts: {str(e)}")
@@ -49,3 +49,35 @@ def seed_dev_profile():
     yield
 
     profile_ref.delete()
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    """Tests write profiles straight to the emulator, bypassing cache invalidation."""
+    from services.profile_cache import clear_profile_cache
+    clear_profile_cache()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Rate-limit buckets are per process; start every test with full buckets."""
+    from rate_limit import reset_rate_limits
+    reset_rate_limits()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_participant_cache():
+    """Tests delete conversations straight from the emulator, bypassing cache invalidation."""
+    from services.participant_cache import clear_participant_cache
+    clear_participant_cache()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_inbox_cache():
+    """The same goes for cached inbox pages."""
+    from services.inbox_cache import clear_inbox_cache
+    clear_inbox_cache()
+    yield
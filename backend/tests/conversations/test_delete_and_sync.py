@@ -27,7 +27,8 @@ class TestDeleteConversation:
         with auth(USER_A):
             resp = client.delete(f"/conversations/{cid}")
 
-        assert resp.status_code == 204
+        assert resp.status_code == 202
+        assert resp.json()["status"] == "queued"
 
 
     def test_deleted_conversation_no_longer_fetchable(self, client, auth, db):
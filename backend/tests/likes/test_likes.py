@@ -17,10 +17,10 @@ from main import app
 from auth import get_current_user
 
 # Override the collection name for tests
-import routers.likes as likes_module
 import routers.posts as posts_module
 import services.post_service as post_service_module
-likes_module.COLLECTION_NAME = "test_posts"
+import services.like_service as like_service_module
+like_service_module.COLLECTION_NAME = "test_posts"
 posts_module.COLLECTION_NAME = "test_posts"
 post_service_module.COLLECTION_NAME = "test_posts"
 
@@ -243,3 +243,40 @@ def test_like_count_multiple_users():
     finally:
         app.dependency_overrides[get_current_user] = override_get_current_user
         client.delete(f"/api/v1/posts/{post_id}")
+
+
+def test_put_and_delete_like_are_idempotent():
+    """PUT/DELETE set the like state explicitly; repeating either leaves the count unchanged."""
+    resp = client.post(
+        "/api/v1/posts",
+        json={
+            "title": "Idempotent like test",
+            "body": "Testing PUT and DELETE on the like endpoint",
+            "postType": "looking_to_jam",
+        },
+    )
+    assert resp.status_code == 201
+    post_id = resp.json()["postId"]
+
+    try:
+        for expected_message in ("Post liked successfully", "Post already liked"):
+            resp = client.put(f"/api/v1/posts/{post_id}/like")
+            assert resp.status_code == 200
+            assert resp.json()["likes"] == 1
+            assert resp.json()["liked"] is True
+            assert resp.json()["message"] == expected_message
+
+        for expected_message in ("Post unliked successfully", "Post was not liked"):
+            resp = client.delete(f"/api/v1/posts/{post_id}/like")
+            assert resp.status_code == 200
+            assert resp.json()["likes"] == 0
+            assert resp.json()["liked"] is False
+            assert resp.json()["message"] == expected_message
+
+    finally:
+        client.delete(f"/api/v1/posts/{post_id}")
+
+
+def test_put_like_nonexistent_post():
+    response = client.put("/api/v1/posts/nonexistent_post_id/like")
+    assert response.status_code == 404
@@ -154,4 +154,26 @@ def test_bounding_box_from_miles_large_radius_clamps_lat():
     # A large radius near a pole must not push lat outside ±90
     min_lat, max_lat, min_lng, max_lng = bounding_box_from_miles(80.0, 0.0, 1000)
     assert min_lat >= -90.0
-    assert max_lat <= 90.0
\ No newline at end of file
+    assert max_lat <= 90.0
+
+def test_resolve_location_backoff_returns_503_with_retry_after(client):
+    from utils.location import GeocodingUnavailableError
+    with patch("routers.location.resolve_location_from_zip", new_callable=AsyncMock) as mock_resolve:
+        mock_resolve.side_effect = GeocodingUnavailableError("Geocoding temporarily unavailable", retry_after=30)
+        response = client.get("/api/v1/location/resolve/97209")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+
+
+def test_nearest_location_success(client):
+    mock_location = Location(zipCode="97209", lat=45.53, lng=-122.69, geohash="c20fb")
+    with patch("routers.location.nearest_zip", new_callable=AsyncMock) as mock_nearest:
+        mock_nearest.return_value = mock_location
+        response = client.get("/api/v1/location/nearest", params={"lat": 45.5, "lng": -122.7})
+        assert response.status_code == 200
+        assert response.json()["zipCode"] == "97209"
+
+
+def test_nearest_location_invalid_coordinates(client):
+    response = client.get("/api/v1/location/nearest", params={"lat": 95, "lng": -122.7})
+    assert response.status_code == 422
@@ -2,4 +2,41 @@
 import sys
 import os
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
\ No newline at end of file
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    """Profile lookups are cached in-process; don't let one test's fakes leak into the next."""
+    from services.profile_cache import clear_profile_cache
+    clear_profile_cache()
+    yield
+    clear_profile_cache()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Rate-limit buckets are per process; start every test with full buckets."""
+    from rate_limit import reset_rate_limits
+    reset_rate_limits()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_participant_cache():
+    """Conversation participants are cached in-process too."""
+    from services.participant_cache import clear_participant_cache
+    clear_participant_cache()
+    yield
+    clear_participant_cache()
+
+
+@pytest.fixture(autouse=True)
+def clear_inbox_cache():
+    """So are users' first inbox pages."""
+    from services.inbox_cache import clear_inbox_cache
+    clear_inbox_cache()
+    yield
+    clear_inbox_cache()
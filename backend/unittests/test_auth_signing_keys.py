@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import auth as auth_module
+from auth import refresh_signing_keys
+
+
+def _patch_cert_request(monkeypatch, status=200, cache_control="public, max-age=19800, must-revalidate"):
+    request = MagicMock(return_value=SimpleNamespace(status=status, headers={"cache-control": cache_control}))
+    client = SimpleNamespace(_token_verifier=SimpleNamespace(request=request))
+    monkeypatch.setattr(auth_module.auth, "_get_client", lambda app: client)
+    return request
+
+
+def test_refresh_signing_keys_bypasses_cache_and_returns_max_age(monkeypatch):
+    request = _patch_cert_request(monkeypatch)
+
+    assert refresh_signing_keys() == 19800
+
+    url = request.call_args.args[0]
+    assert url == auth_module._token_gen.ID_TOKEN_CERT_URI
+    assert request.call_args.kwargs["headers"] == {"Cache-Control": "no-cache"}
+
+
+def test_refresh_signing_keys_defaults_without_max_age(monkeypatch):
+    _patch_cert_request(monkeypatch, cache_control="public")
+
+    assert refresh_signing_keys() == 3600
+
+
+def test_refresh_signing_keys_raises_on_http_error(monkeypatch):
+    _patch_cert_request(monkeypatch, status=503)
+
+    with pytest.raises(RuntimeError):
+        refresh_signing_keys()
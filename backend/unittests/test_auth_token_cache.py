@@ -0,0 +1,85 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth as auth_module
+from auth import get_current_user
+
+
+def _credentials(token="token-abc"):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def token_cache(monkeypatch):
+    monkeypatch.setattr(auth_module.settings, "DEV_MODE", False)
+    monkeypatch.setattr(auth_module.settings, "AUTH_REVOCATION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(auth_module, "_token_cache", auth_module._VerifiedTokenCache(max_size=2))
+    return auth_module._token_cache
+
+
+def _patch_verify(monkeypatch, exp_offset=3600):
+    verify = MagicMock(side_effect=lambda token, **_: {"uid": f"uid-{token}", "exp": time.time() + exp_offset})
+    monkeypatch.setattr(auth_module.auth, "verify_id_token", verify)
+    return verify
+
+
+def test_repeated_token_is_verified_once(monkeypatch):
+    verify = _patch_verify(monkeypatch)
+
+    first = asyncio.run(get_current_user(_credentials()))
+    second = asyncio.run(get_current_user(_credentials()))
+
+    assert first == second == "uid-token-abc"
+    verify.assert_called_once_with("token-abc", check_revoked=False)
+
+
+def test_expired_claims_are_reverified(monkeypatch):
+    verify = _patch_verify(monkeypatch, exp_offset=-1)
+
+    asyncio.run(get_current_user(_credentials()))
+    asyncio.run(get_current_user(_credentials()))
+
+    assert verify.call_count == 2
+
+
+def test_cache_is_bounded(monkeypatch, token_cache):
+    verify = _patch_verify(monkeypatch)
+
+    for token in ("a", "b", "c", "a"):
+        asyncio.run(get_current_user(_credentials(token)))
+
+    # "a" was evicted by "c" (max_size=2), so it is verified again
+    assert verify.call_count == 4
+
+
+def test_revocation_interval_forces_checked_reverification(monkeypatch):
+    monkeypatch.setattr(auth_module.settings, "AUTH_REVOCATION_CHECK_SECONDS", 60)
+    verify = _patch_verify(monkeypatch)
+    clock = [1000.0]
+    monkeypatch.setattr(auth_module.time, "monotonic", lambda: clock[0])
+
+    asyncio.run(get_current_user(_credentials()))
+    clock[0] += 30
+    asyncio.run(get_current_user(_credentials()))
+    clock[0] += 31
+    asyncio.run(get_current_user(_credentials()))
+
+    assert verify.call_count == 2
+    verify.assert_called_with("token-abc", check_revoked=True)
+
+
+def test_invalid_token_is_not_cached(monkeypatch):
+    verify = MagicMock(side_effect=auth_module.auth.InvalidIdTokenError("bad token"))
+    monkeypatch.setattr(auth_module.auth, "verify_id_token", verify)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_current_user(_credentials()))
+        assert exc.value.status_code == 401
+
+    assert verify.call_count == 2
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import conversation_deletion
+
+
+@pytest.fixture(autouse=True)
+def deletion_settings(monkeypatch):
+    monkeypatch.setattr(conversation_deletion.settings, "CONVERSATION_DELETE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(conversation_deletion.settings, "CONVERSATION_DELETE_LEASE_SECONDS", 120)
+    monkeypatch.setattr(conversation_deletion.firestore, "transactional", lambda fn: fn)
+
+
+def _make_db(job, message_ids=()):
+    fake_db = MagicMock()
+    jobs_collection = MagicMock()
+    conversations_collection = MagicMock()
+    fake_db.collection.side_effect = lambda name: {
+        conversation_deletion.JOBS_COLLECTION: jobs_collection,
+        conversation_deletion.CONVERSATIONS_COLLECTION: conversations_collection,
+    }[name]
+
+    job_ref = jobs_collection.document.return_value
+    job_ref.get.return_value = MagicMock(exists=job is not None, **{"to_dict.return_value": job})
+
+    remaining = list(message_ids)
+
+    def _stream():
+        chunk = remaining[:conversation_deletion.settings.CONVERSATION_DELETE_CHUNK_SIZE]
+        del remaining[:len(chunk)]
+        return [MagicMock(id=message_id) for message_id in chunk]
+
+    convo_ref = conversations_collection.document.return_value
+    messages = convo_ref.collection.return_value
+    messages.select.return_value.limit.return_value.stream.side_effect = _stream
+    return fake_db, job_ref, convo_ref
+
+
+def _job(status="queued", heartbeat=None, deleted=0):
+    return {"conversationId": "conv-1", "status": status, "heartbeatAt": heartbeat, "deletedMessages": deleted, "attempts": 0}
+
+
+def test_job_deletes_messages_in_chunks_and_records_progress():
+    fake_db, job_ref, convo_ref = _make_db(_job(), message_ids=["m1", "m2", "m3"])
+
+    assert conversation_deletion.run_job(fake_db, "job-1") is True
+
+    writer = fake_db.bulk_writer.return_value
+    assert writer.delete.call_count == 3
+    assert writer.flush.call_count == 2
+    progress = [c.args[0]["deletedMessages"] for c in job_ref.update.call_args_list]
+    assert progress == [2, 3, 3]
+    assert job_ref.update.call_args.args[0]["status"] == "completed"
+    fake_db.recursive_delete.assert_called_once_with(convo_ref, bulk_writer=writer)
+
+
+def test_resumed_job_continues_the_count():
+    fake_db, job_ref, _ = _make_db(_job(status="running", deleted=40), message_ids=["m41"])
+
+    conversation_deletion.run_job(fake_db, "job-1")
+
+    assert job_ref.update.call_args.args[0]["deletedMessages"] == 41
+
+
+def test_job_with_a_live_lease_elsewhere_is_skipped():
+    fake_db, job_ref, _ = _make_db(_job(status="running", heartbeat=datetime.now(timezone.utc)))
+
+    assert conversation_deletion.run_job(fake_db, "job-1") is False
+    fake_db.bulk_writer.assert_not_called()
+
+
+def test_failed_attempt_goes_back_to_the_queue():
+    fake_db, job_ref, _ = _make_db(_job(), message_ids=["m1"])
+    fake_db.bulk_writer.return_value.flush.side_effect = RuntimeError("unavailable")
+
+    with pytest.raises(RuntimeError):
+        conversation_deletion.run_job(fake_db, "job-1")
+
+    last_update = job_ref.update.call_args.args[0]
+    assert last_update["status"] == "queued"
+    assert last_update["error"] == "unavailable"
+
+
+def test_rescan_picks_up_queued_and_abandoned_jobs():
+    now = datetime.now(timezone.utc)
+    snaps = [
+        MagicMock(id="queued", **{"to_dict.return_value": _job()}),
+        MagicMock(id="abandoned", **{"to_dict.return_value": _job("running", now - timedelta(minutes=10))}),
+        MagicMock(id="live", **{"to_dict.return_value": _job("running", now)}),
+    ]
+    fake_db = MagicMock()
+    fake_db.collection.return_value.where.return_value.stream.return_value = snaps
+
+    assert conversation_deletion.unfinished_job_ids(fake_db) == ["queued", "abandoned"]
+
+
+def test_queue_ignores_a_job_already_waiting():
+    queue = conversation_deletion.ConversationDeletionQueue()
+    queue.enqueue("job-1")
+    queue.enqueue("job-1")
+
+    assert queue._queue.qsize() == 1
+
+
+def test_job_drops_the_cached_participants_on_the_worker_running_it(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(conversation_deletion, "invalidate_participants", invalidated.append)
+    fake_db, _, _ = _make_db(_job())
+
+    conversation_deletion.run_job(fake_db, "job-1")
+
+    assert invalidated == ["conv-1"]
@@ -64,27 +64,33 @@ def test_delete_conversation_service_requires_participant():
     db.recursive_delete.assert_not_called()
 
 
-def test_delete_conversation_service_marks_deleting_before_recursive_delete():
+def test_delete_conversation_service_marks_deleting_and_queues_job():
     db = MagicMock()
     convo_ref = MagicMock()
     convo_doc = MagicMock()
     convo_doc.exists = True
     convo_doc.to_dict.return_value = {"participant_ids": [settings.DEV_USER_ID, "other-user"]}
     convo_ref.get.return_value = convo_doc
+    # The fake db hands out the same reference for the job document
     db.collection.return_value.document.return_value = convo_ref
+    convo_ref.id = "job-1"
 
     operations = []
-    convo_ref.update.side_effect = lambda *_, **__: operations.append("update")
-    db.recursive_delete.side_effect = lambda *_, **__: operations.append("recursive_delete")
+    batch = db.batch.return_value
+    batch.commit.side_effect = lambda *_, **__: operations.append("commit")
 
-    with patch("services.conversation_service.get_db", return_value=db):
-        asyncio.run(conversation_service.delete_conversation("convo-123", settings.DEV_USER_ID))
+    with patch("services.conversation_service.get_db", return_value=db), \
+            patch.object(conversation_service.conversation_deletion.deletion_queue, "enqueue",
+                         side_effect=lambda job_id: operations.append(f"enqueue:{job_id}")):
+        job = asyncio.run(conversation_service.delete_conversation("convo-123", settings.DEV_USER_ID))
 
-    assert operations == ["update", "recursive_delete"]
-    update_payload = convo_ref.update.call_args.args[0]
+    assert operations == ["commit", "enqueue:job-1"]
+    update_payload = batch.update.call_args.args[1]
     assert update_payload["is_deleting"] is True
+    assert update_payload["deletion_job_id"] == "job-1"
     assert "updatedAt" in update_payload
-    db.recursive_delete.assert_called_once_with(convo_ref)
+    assert job.status == "queued"
+    db.recursive_delete.assert_not_called()
 
 
 def test_send_message_rejects_when_is_deleting_true():
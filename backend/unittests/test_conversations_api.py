@@ -24,6 +24,11 @@ def app():
     return test_app
 
 
+@pytest.fixture(autouse=True)
+def run_transactions_inline(monkeypatch):
+    monkeypatch.setattr(conversation_service.firestore, "transactional", lambda fn: fn)
+
+
 @pytest.fixture()
 def client(app):
     return TestClient(app)
@@ -33,20 +38,25 @@ def _make_db():
     fake_db = MagicMock()
     profiles_collection = MagicMock()
     conversations_collection = MagicMock()
+    jobs_collection = MagicMock()
 
     def collection_side_effect(name):
         if name == "profiles":
             return profiles_collection
         if name == "conversations":
             return conversations_collection
+        if name == "conversationDeletionJobs":
+            return jobs_collection
         raise KeyError(name)
 
     fake_db.collection.side_effect = collection_side_effect
+    # Profiles are read in one batch through ProfileLoader
+    fake_db.get_all.side_effect = lambda refs, **_: [ref.get() for ref in refs]
     return fake_db, profiles_collection, conversations_collection
 
 
-def _make_profile_doc(first="Alice", last="Smith", pic=None, exists=True):
-    doc = MagicMock()
+def _make_profile_doc(first="Alice", last="Smith", pic=None, exists=True, user_id=None):
+    doc = MagicMock(id=user_id)
     doc.exists = exists
     doc.to_dict.return_value = {
         "firstName": first,
@@ -56,9 +66,9 @@ def _make_profile_doc(first="Alice", last="Smith", pic=None, exists=True):
     return doc
 
 
-def _make_profile_ref(first="Alice", last="Smith", pic=None, exists=True):
+def _make_profile_ref(user_id=None, first="Alice", last="Smith", pic=None, exists=True):
     ref = MagicMock()
-    ref.get.return_value = _make_profile_doc(first=first, last=last, pic=pic, exists=exists)
+    ref.get.return_value = _make_profile_doc(first=first, last=last, pic=pic, exists=exists, user_id=user_id)
     return ref
 
 
@@ -69,6 +79,47 @@ def _make_conversation_doc(conversation_id, data, exists=True):
     return doc
 
 
+class _FakeInboxQuery:
+    """Stands in for the ordered inbox query: updatedAt DESC, __name__ DESC, start_after, limit."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._after = None
+        self._limit = None
+        self.where = MagicMock(return_value=self)
+        self.order_by = MagicMock(return_value=self)
+
+    def _key(self, doc):
+        return (doc.to_dict()["updatedAt"], doc.id)
+
+    def start_after(self, cursor):
+        clone = _FakeInboxQuery(self.docs)
+        clone._limit = self._limit
+        if isinstance(cursor, dict):
+            clone._after = (cursor["updatedAt"], cursor["__name__"])
+        else:
+            clone._after = self._key(cursor)
+        return clone
+
+    def limit(self, count):
+        clone = _FakeInboxQuery(self.docs)
+        clone._after = self._after
+        clone._limit = count
+        return clone
+
+    def stream(self):
+        ordered = sorted(self.docs, key=self._key, reverse=True)
+        if self._after is not None:
+            ordered = [doc for doc in ordered if self._key(doc) < self._after]
+        return ordered[:self._limit] if self._limit is not None else ordered
+
+
+def _install_inbox(conversations_collection, docs):
+    query = _FakeInboxQuery(docs)
+    conversations_collection.where.return_value = query
+    return query
+
+
 def _first_value(body, *keys):
     for key in keys:
         if key in body:
@@ -118,13 +169,13 @@ def test_create_conversation_returns_201_and_stores_snapshots(client, monkeypatc
     fake_db, profiles_collection, conversations_collection = _make_db()
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(first="Alice", last="Smith"),
-        OTHER_USER_ID: _make_profile_ref(first="Bob", last="Jones"),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Bob", last="Jones"),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
-    conversations_collection.where.return_value.stream.return_value = []
 
     new_conversation_ref = MagicMock(id=CONVERSATION_ID)
+    new_conversation_ref.get.return_value = _make_conversation_doc(CONVERSATION_ID, None, exists=False)
     conversations_collection.document.return_value = new_conversation_ref
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
@@ -143,26 +194,29 @@ def test_create_conversation_returns_201_and_stores_snapshots(client, monkeypatc
     snapshots = _first_value(body, "participantSnapshots", "participant_snapshots")
     assert snapshots[TEST_USER_ID]["firstName"] == "Alice"
     assert snapshots[OTHER_USER_ID]["firstName"] == "Bob"
-    new_conversation_ref.set.assert_called_once()
+    conversations_collection.document.assert_called_once_with(
+        conversation_service.pair_conversation_id(TEST_USER_ID, OTHER_USER_ID)
+    )
+    fake_db.transaction.return_value.create.assert_called_once()
+    assert fake_db.transaction.return_value.create.call_args.args[0] is new_conversation_ref
+    conversations_collection.where.assert_not_called()
 
 
 def test_create_conversation_returns_existing_if_duplicate(client, monkeypatch):
     fake_db, profiles_collection, conversations_collection = _make_db()
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(first="Alice", last="Smith"),
-        OTHER_USER_ID: _make_profile_ref(first="Bob", last="Jones"),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Bob", last="Jones"),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
 
-    existing_ref = _make_conversation_doc(
+    conversation_ref = MagicMock(id=CONVERSATION_ID)
+    conversation_ref.get.return_value = _make_conversation_doc(
         CONVERSATION_ID,
-        _conversation_payload([TEST_USER_ID, OTHER_USER_ID]),
+        _conversation_payload([OTHER_USER_ID, TEST_USER_ID], last_message_preview="hey"),
     )
-    conversations_collection.where.return_value.stream.return_value = [existing_ref]
-
-    new_conversation_ref = MagicMock(id="new-conversation")
-    conversations_collection.document.return_value = new_conversation_ref
+    conversations_collection.document.return_value = conversation_ref
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -173,7 +227,32 @@ def test_create_conversation_returns_existing_if_duplicate(client, monkeypatch):
 
     assert response.status_code == 201
     assert _first_value(response.json(), "conversationId", "conversation_id") == CONVERSATION_ID
-    new_conversation_ref.set.assert_not_called()
+    assert _first_value(response.json(), "lastMessagePreview", "last_message_preview") == "hey"
+    fake_db.transaction.return_value.create.assert_not_called()
+
+
+def test_create_conversation_while_previous_one_is_being_deleted_returns_409(client, monkeypatch):
+    fake_db, profiles_collection, conversations_collection = _make_db()
+    profile_refs = {
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Bob", last="Jones"),
+    }
+    profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
+    conversations_collection.document.return_value.get.return_value = _make_conversation_doc(
+        CONVERSATION_ID,
+        _conversation_payload([TEST_USER_ID, OTHER_USER_ID], extra={"is_deleting": True}),
+    )
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.post("/api/v1/conversations", json={"recipient_id": OTHER_USER_ID})
+
+    assert response.status_code == 409
+
+
+def test_pair_conversation_id_is_symmetric():
+    assert conversation_service.pair_conversation_id("a", "b") == conversation_service.pair_conversation_id("b", "a")
+    assert conversation_service.pair_conversation_id("a", "b") != conversation_service.pair_conversation_id("a", "c")
+    assert "/" not in conversation_service.pair_conversation_id("x/y", "z")
 
 
 def test_create_conversation_with_self_returns_400(client):
@@ -196,11 +275,11 @@ def test_create_conversation_current_user_profile_missing_returns_404(client, mo
     fake_db, profiles_collection, conversations_collection = _make_db()
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(exists=False),
-        OTHER_USER_ID: _make_profile_ref(first="Bob", last="Jones"),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, exists=False),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Bob", last="Jones"),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
-    conversations_collection.where.return_value.stream.return_value = []
+    _install_inbox(conversations_collection, [])
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -217,11 +296,11 @@ def test_create_conversation_recipient_profile_missing_returns_404(client, monke
     fake_db, profiles_collection, conversations_collection = _make_db()
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(first="Alice", last="Smith"),
-        OTHER_USER_ID: _make_profile_ref(exists=False),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, exists=False),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
-    conversations_collection.where.return_value.stream.return_value = []
+    _install_inbox(conversations_collection, [])
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -236,7 +315,7 @@ def test_create_conversation_recipient_profile_missing_returns_404(client, monke
 
 def test_list_conversations_returns_empty_list_when_none_exist(client, monkeypatch):
     fake_db, _, conversations_collection = _make_db()
-    conversations_collection.where.return_value.stream.return_value = []
+    _install_inbox(conversations_collection, [])
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -255,7 +334,7 @@ def test_list_conversations_returns_only_current_users_conversations(client, mon
         "conv-current",
         _conversation_payload([TEST_USER_ID, OTHER_USER_ID]),
     )
-    conversations_collection.where.return_value.stream.return_value = [current_user_convo]
+    _install_inbox(conversations_collection, [current_user_convo])
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -278,7 +357,7 @@ def test_list_conversations_sorts_by_updated_at_descending(client, monkeypatch):
         "newer",
         _conversation_payload([TEST_USER_ID, THIRD_USER_ID], updated_at=now - timedelta(minutes=5)),
     )
-    conversations_collection.where.return_value.stream.return_value = [older, newer]
+    _install_inbox(conversations_collection, [older, newer])
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -292,6 +371,24 @@ def test_list_conversations_sorts_by_updated_at_descending(client, monkeypatch):
     assert ids == ["newer", "older"]
 
 
+def test_list_conversations_first_page_is_cached_until_a_participant_change(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    _install_inbox(conversations_collection, [
+        _make_conversation_doc(CONVERSATION_ID, _conversation_payload([TEST_USER_ID, OTHER_USER_ID])),
+    ])
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    first = client.get("/api/v1/conversations").json()
+    second = client.get("/api/v1/conversations").json()
+    assert first == second
+    conversations_collection.where.assert_called_once()
+
+    # Someone else's activity in a conversation drops this user's cached page
+    conversation_service.inbox_cache.invalidate_inboxes([OTHER_USER_ID, TEST_USER_ID])
+    client.get("/api/v1/conversations")
+    assert conversations_collection.where.call_count == 2
+
+
 def test_list_conversations_default_limit_is_ten(client, monkeypatch):
     fake_db, _, conversations_collection = _make_db()
     docs = []
@@ -302,7 +399,7 @@ def test_list_conversations_default_limit_is_ten(client, monkeypatch):
                 _conversation_payload([TEST_USER_ID, f"user-{index}"], updated_at=datetime.now(timezone.utc)),
             )
         )
-    conversations_collection.where.return_value.stream.return_value = docs
+    _install_inbox(conversations_collection, docs)
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -323,7 +420,7 @@ def test_list_conversations_custom_limit_respected(client, monkeypatch):
         )
         for index in range(5)
     ]
-    conversations_collection.where.return_value.stream.return_value = docs
+    _install_inbox(conversations_collection, docs)
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -353,7 +450,7 @@ def test_list_conversations_pagination_returns_next_page(client, monkeypatch):
                 _conversation_payload([TEST_USER_ID, f"user-{index}"], updated_at=now - timedelta(minutes=index)),
             )
         )
-    conversations_collection.where.return_value.stream.return_value = docs
+    _install_inbox(conversations_collection, docs)
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -383,7 +480,7 @@ def test_list_conversations_last_page_has_no_next_page_token(client, monkeypatch
         )
         for index in range(2)
     ]
-    conversations_collection.where.return_value.stream.return_value = docs
+    _install_inbox(conversations_collection, docs)
 
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
@@ -393,6 +490,50 @@ def test_list_conversations_last_page_has_no_next_page_token(client, monkeypatch
     assert _first_value(response.json(), "nextPageToken", "next_page_token") is None
 
 
+def test_list_conversations_cursor_does_not_read_the_last_document(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    now = datetime.now(timezone.utc)
+    docs = [
+        _make_conversation_doc(
+            f"conv-{index}",
+            _conversation_payload([TEST_USER_ID, f"user-{index}"], updated_at=now - timedelta(minutes=index)),
+        )
+        for index in range(3)
+    ]
+    _install_inbox(conversations_collection, docs)
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    token = _first_value(client.get("/api/v1/conversations?limit=1").json(), "nextPageToken", "next_page_token")
+    page2 = client.get(f"/api/v1/conversations?limit=1&last_doc_id={token}").json()
+
+    assert [_first_value(c, "conversationId", "conversation_id") for c in page2["conversations"]] == ["conv-1"]
+    conversations_collection.document.assert_not_called()
+
+
+def test_list_conversations_accepts_legacy_document_id_token(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    now = datetime.now(timezone.utc)
+    docs = [
+        _make_conversation_doc(
+            f"conv-{index}",
+            _conversation_payload([TEST_USER_ID, f"user-{index}"], updated_at=now - timedelta(minutes=index)),
+        )
+        for index in range(3)
+    ]
+    _install_inbox(conversations_collection, docs)
+    legacy_doc = docs[0]
+    legacy_doc.exists = True
+    conversations_collection.document.return_value.get.return_value = legacy_doc
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.get("/api/v1/conversations?limit=5&last_doc_id=conv-0")
+
+    assert response.status_code == 200
+    ids = [_first_value(c, "conversationId", "conversation_id") for c in response.json()["conversations"]]
+    assert ids == ["conv-1", "conv-2"]
+    conversations_collection.document.assert_called_once_with("conv-0")
+
+
 def test_get_conversation_returns_200_for_participant(client, monkeypatch):
     fake_db, _, conversations_collection = _make_db()
     convo_ref = MagicMock()
@@ -458,13 +599,75 @@ def test_delete_conversation_participant_can_delete(client, monkeypatch):
     )
     conversations_collection.document.return_value = convo_ref
 
+    job_ref = fake_db.collection("conversationDeletionJobs").document.return_value
+    job_ref.id = "job-1"
+    queued = []
+    monkeypatch.setattr(conversation_service.conversation_deletion.deletion_queue, "enqueue", queued.append)
     monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
 
     response = client.delete(f"/api/v1/conversations/{CONVERSATION_ID}")
 
-    assert response.status_code == 204
-    convo_ref.update.assert_called_once()
-    fake_db.recursive_delete.assert_called_once_with(convo_ref)
+    assert response.status_code == 202
+    body = response.json()
+    assert _first_value(body, "jobId", "job_id") == "job-1"
+    assert body["status"] == "queued"
+    batch = fake_db.batch.return_value
+    assert batch.update.call_args.args[1]["is_deleting"] is True
+    batch.create.assert_called_once()
+    assert queued == ["job-1"]
+    # Nothing is deleted inside the request
+    fake_db.recursive_delete.assert_not_called()
+
+
+def test_delete_conversation_concurrent_delete_returns_409(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    conversations_collection.document.return_value.get.return_value = _make_conversation_doc(
+        CONVERSATION_ID,
+        _conversation_payload([TEST_USER_ID, OTHER_USER_ID]),
+    )
+    fake_db.batch.return_value.commit.side_effect = conversation_service.api_exceptions.FailedPrecondition("changed")
+    queued = []
+    monkeypatch.setattr(conversation_service.conversation_deletion.deletion_queue, "enqueue", queued.append)
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.delete(f"/api/v1/conversations/{CONVERSATION_ID}")
+
+    assert response.status_code == 409
+    assert queued == []
+
+
+def test_deletion_job_status_visible_to_participants_only(client, monkeypatch):
+    fake_db, _, _ = _make_db()
+    now = datetime.now(timezone.utc)
+    job = {
+        "conversationId": CONVERSATION_ID,
+        "participant_ids": [TEST_USER_ID, OTHER_USER_ID],
+        "status": "running",
+        "deletedMessages": 1500,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    jobs_collection = fake_db.collection("conversationDeletionJobs")
+    jobs_collection.document.return_value.get.return_value = _make_conversation_doc("job-1", job)
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.get("/api/v1/conversations/deletion-jobs/job-1")
+    assert response.status_code == 200
+    assert _first_value(response.json(), "deletedMessages", "deleted_messages") == 1500
+
+    job["participant_ids"] = [OTHER_USER_ID, THIRD_USER_ID]
+    assert client.get("/api/v1/conversations/deletion-jobs/job-1").status_code == 404
+
+
+def test_get_conversation_being_deleted_returns_404(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    conversations_collection.document.return_value.get.return_value = _make_conversation_doc(
+        CONVERSATION_ID,
+        _conversation_payload([TEST_USER_ID, OTHER_USER_ID], extra={"is_deleting": True}),
+    )
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    assert client.get(f"/api/v1/conversations/{CONVERSATION_ID}").status_code == 404
 
 
 def test_delete_conversation_non_participant_returns_403(client, monkeypatch):
@@ -533,37 +736,15 @@ def test_sync_snapshots_updates_profiles(client, monkeypatch):
     convo_ref = MagicMock()
     
     # Original doc has outdated snapshot for OTHER_USER_ID
-    original_doc = _make_conversation_doc(
+    convo_ref.get.return_value = _make_conversation_doc(
         CONVERSATION_ID,
         _conversation_payload([TEST_USER_ID, OTHER_USER_ID]),
     )
-    # Updated doc has the new snapshot data that should be in the DB after the update
-    updated_doc = _make_conversation_doc(
-        CONVERSATION_ID,
-        _conversation_payload(
-            [TEST_USER_ID, OTHER_USER_ID],
-            
-            participant_snapshots={
-                TEST_USER_ID: {
-                    "firstName": "Alice",
-                    "lastName": "Smith",
-                    "profilePicUrl": None,
-                },
-                OTHER_USER_ID: {
-                    "firstName": "Robert",
-                    "lastName": "Jones",
-                    "profilePicUrl": None,
-                },
-            },
-        ),
-    )
-    
-    convo_ref.get.side_effect = [original_doc, updated_doc]
     conversations_collection.document.return_value = convo_ref
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(first="Alice", last="Smith"),
-        OTHER_USER_ID: _make_profile_ref(first="Robert", last="Jones"),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Robert", last="Jones"),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
     
@@ -577,6 +758,10 @@ def test_sync_snapshots_updates_profiles(client, monkeypatch):
 
     # Verify that the conversation document was updated with the new snapshots
     convo_ref.update.assert_called_once()
+    assert convo_ref.update.call_args.args[0]["participant_snapshots"][OTHER_USER_ID]["firstName"] == "Robert"
+    # Profiles are read in one batch and the response is built without reading the conversation back
+    fake_db.get_all.assert_called_once()
+    convo_ref.get.assert_called_once()
 
 
 def test_sync_snapshots_non_participant_returns_403(client, monkeypatch):
@@ -612,36 +797,15 @@ def test_sync_snapshots_updates_updated_at_timestamp(client, monkeypatch):
     fake_db, profiles_collection, conversations_collection = _make_db()
     old_time = datetime.now(timezone.utc) - timedelta(days=1)
     convo_ref = MagicMock()
-    original_doc = _make_conversation_doc(
+    convo_ref.get.return_value = _make_conversation_doc(
         CONVERSATION_ID,
         _conversation_payload([TEST_USER_ID, OTHER_USER_ID], updated_at=old_time),
     )
-    new_time = old_time + timedelta(seconds=1)
-    updated_doc = _make_conversation_doc(
-        CONVERSATION_ID,
-        _conversation_payload(
-            [TEST_USER_ID, OTHER_USER_ID],
-            updated_at=new_time,
-            participant_snapshots={
-                TEST_USER_ID: {
-                    "firstName": "Alice",
-                    "lastName": "Smith",
-                    "profilePicUrl": None,
-                },
-                OTHER_USER_ID: {
-                    "firstName": "Bob",
-                    "lastName": "Jones",
-                    "profilePicUrl": None,
-                },
-            },
-        ),
-    )
-    convo_ref.get.side_effect = [original_doc, updated_doc]
     conversations_collection.document.return_value = convo_ref
 
     profile_refs = {
-        TEST_USER_ID: _make_profile_ref(first="Alice", last="Smith"),
-        OTHER_USER_ID: _make_profile_ref(first="Bob", last="Jones"),
+        TEST_USER_ID: _make_profile_ref(TEST_USER_ID, first="Alice", last="Smith"),
+        OTHER_USER_ID: _make_profile_ref(OTHER_USER_ID, first="Bob", last="Jones"),
     }
     profiles_collection.document.side_effect = lambda user_id: profile_refs[user_id]
 
@@ -652,3 +816,87 @@ def test_sync_snapshots_updates_updated_at_timestamp(client, monkeypatch):
     assert response.status_code == 200
     updated_at = _first_value(response.json(), "updatedAt", "updated_at")
     assert datetime.fromisoformat(updated_at) > old_time
+
+
+def test_profile_change_fans_out_to_every_conversation_in_batches(monkeypatch):
+    fake_db = MagicMock()
+    monkeypatch.setattr(conversation_service, "BATCH_LIMIT", 2)
+    docs = [MagicMock(**{"to_dict.return_value": {}}) for _ in range(3)]
+    deleting = MagicMock(**{"to_dict.return_value": {"is_deleting": True}})
+    query = fake_db.collection.return_value.where.return_value
+    query.select.return_value.stream.return_value = docs + [deleting]
+
+    updated = conversation_service.fan_out_participant_snapshot(
+        OTHER_USER_ID, {"firstName": "Robert", "lastName": "Jones", "profilePicUrl": "https://x/pic.jpg"}, fake_db
+    )
+
+    assert updated == 3
+    batch = fake_db.batch.return_value
+    assert batch.commit.call_count == 2
+    written = [c.args[0] for c in batch.update.call_args_list]
+    assert written == [doc.reference for doc in docs]
+    field, snapshot = next(iter(batch.update.call_args.args[1].items()))
+    assert field == f"participant_snapshots.`{OTHER_USER_ID}`"
+    assert snapshot == {"firstName": "Robert", "lastName": "Jones", "profilePicUrl": "https://x/pic.jpg"}
+
+
+def test_deleted_profile_fans_out_placeholder_snapshot():
+    fake_db = MagicMock()
+    query = fake_db.collection.return_value.where.return_value
+    query.select.return_value.stream.return_value = [MagicMock(**{"to_dict.return_value": {}})]
+
+    conversation_service.fan_out_participant_snapshot(OTHER_USER_ID, None, fake_db)
+
+    snapshot = next(iter(fake_db.batch.return_value.update.call_args.args[1].values()))
+    assert snapshot == conversation_service.DELETED_PARTICIPANT_SNAPSHOT
+
+
+def test_mark_read_resets_only_the_callers_counter(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    convo_ref = conversations_collection.document.return_value
+    convo_ref.get.return_value = _make_conversation_doc(
+        CONVERSATION_ID,
+        _conversation_payload([TEST_USER_ID, OTHER_USER_ID], extra={"unread_counts": {TEST_USER_ID: 4, OTHER_USER_ID: 2}}),
+    )
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.post(f"/api/v1/conversations/{CONVERSATION_ID}/read")
+
+    assert response.status_code == 200
+    assert response.json()["unreadCounts"] == {TEST_USER_ID: 0, OTHER_USER_ID: 2}
+    written = convo_ref.update.call_args.args[0]
+    assert written[f"unread_counts.`{TEST_USER_ID}`"] == 0
+    assert f"last_read_at.`{TEST_USER_ID}`" in written
+    assert "updatedAt" not in written
+
+
+def test_mark_read_non_participant_returns_403(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    conversations_collection.document.return_value.get.return_value = _make_conversation_doc(
+        CONVERSATION_ID,
+        _conversation_payload([OTHER_USER_ID, THIRD_USER_ID]),
+    )
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    assert client.post(f"/api/v1/conversations/{CONVERSATION_ID}/read").status_code == 403
+
+
+def test_unread_summary_sums_the_callers_counters(client, monkeypatch):
+    fake_db, _, conversations_collection = _make_db()
+    docs = [
+        _make_conversation_doc("conv-a", {"unread_counts": {TEST_USER_ID: 3}}),
+        _make_conversation_doc("conv-b", {"unread_counts": {TEST_USER_ID: 0}}),
+        _make_conversation_doc("conv-c", {}),
+        _make_conversation_doc("conv-d", {"unread_counts": {TEST_USER_ID: 2}}),
+        _make_conversation_doc("conv-e", {"unread_counts": {TEST_USER_ID: 9}, "is_deleting": True}),
+    ]
+    query = conversations_collection.where.return_value
+    query.select.return_value.stream.return_value = docs
+    monkeypatch.setattr(conversation_service, "get_db", lambda: fake_db)
+
+    response = client.get("/api/v1/conversations/unread-summary")
+
+    assert response.status_code == 200
+    assert response.json() == {"totalUnread": 5, "unreadConversationIds": ["conv-a", "conv-d"]}
+    selected = query.select.call_args.args[0]
+    assert f"unread_counts.`{TEST_USER_ID}`" in selected
@@ -0,0 +1,65 @@
+import asyncio
+import math
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+from models import PostListParams
+from services import post_service
+from utils.location import add_geohash_fields, geohash_cover, geohash_prefixes
+
+
+def test_geohash_prefixes_are_nested():
+    prefixes = geohash_prefixes(45.5, -122.7)
+    assert list(prefixes) == ["p3", "p4", "p5", "p6", "p7"]
+    assert prefixes["p5"] == "c20dz"
+    assert all(prefixes["p7"].startswith(cell) for cell in prefixes.values())
+
+
+def test_add_geohash_fields_ignores_locations_without_coordinates():
+    assert add_geohash_fields(None) is None
+    assert add_geohash_fields({"zipCode": "97209"}) == {"zipCode": "97209"}
+
+
+@pytest.mark.parametrize("radius,expected_precision", [(0.05, 7), (0.3, 6), (2, 5), (10, 4), (50, 3)])
+def test_geohash_cover_picks_precision_for_radius(radius, expected_precision):
+    precision, cells = geohash_cover(45.5, -122.7, radius)
+    assert precision == expected_precision
+    assert len(cells) == 9
+
+
+def test_geohash_cover_falls_back_for_huge_radius():
+    assert geohash_cover(45.5, -122.7, 500) is None
+
+
+def test_geohash_cover_contains_every_point_in_radius():
+    rng = random.Random(3)
+    for radius in (0.3, 2, 10, 50):
+        precision, cells = geohash_cover(45.5, -122.7, radius)
+        for _ in range(200):
+            # Random point within radius miles (flat-earth offset is fine at these scales)
+            bearing = rng.uniform(0, 2 * math.pi)
+            dist = radius * math.sqrt(rng.random())
+            lat = 45.5 + dist * math.cos(bearing) / 69.0
+            lng = -122.7 + dist * math.sin(bearing) / (69.0 * math.cos(math.radians(45.5)))
+            assert geohash_prefixes(lat, lng)[f"p{precision}"] in cells
+
+
+def test_radius_query_uses_geohash_prefixes_when_enabled(monkeypatch):
+    fake_db = MagicMock()
+    query = fake_db.collection.return_value
+    query.where.return_value = query
+    query.limit.return_value = query
+    query.stream.return_value = []
+    monkeypatch.setattr(post_service, "get_db", lambda: fake_db)
+    monkeypatch.setattr(post_service.settings, "GEOHASH_PREFIX_QUERIES", True)
+
+    params = PostListParams(user_lat=45.5, user_lng=-122.7, radius_miles=2)
+    result = asyncio.run(post_service.list_posts(params, "user-1"))
+
+    assert result == {"posts": [], "nextPageToken": None}
+    field_filter = query.where.call_args.kwargs["filter"]
+    assert field_filter.field_path == "location.geohashPrefixes.p5"
+    assert field_filter.op_string == "in"
+    query.order_by.assert_not_called()
@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import inbox_cache
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    monkeypatch.setattr(inbox_cache.settings, "INBOX_CACHE_TTL_SECONDS", 30)
+    return inbox_cache._InboxCache(max_size=2)
+
+
+def test_page_is_served_per_limit_until_invalidated(cache):
+    cache.put("user-a", 10, "page", cache.version())
+
+    assert cache.get("user-a", 10) == "page"
+    assert cache.get("user-a", 20) is None
+
+    cache.invalidate(["user-a", "user-b"])
+    assert cache.get("user-a", 10) is None
+
+
+def test_page_read_before_an_invalidation_is_not_stored(cache):
+    version = cache.version()
+    cache.invalidate(["user-a"])
+    cache.put("user-a", 10, "stale", version)
+
+    assert cache.get("user-a", 10) is None
+    # Other users' pages are unaffected
+    cache.put("user-b", 10, "page", version)
+    assert cache.get("user-b", 10) == "page"
+
+
+def test_expired_page_is_a_miss(cache, monkeypatch):
+    monkeypatch.setattr(inbox_cache.settings, "INBOX_CACHE_TTL_SECONDS", 0)
+    cache.put("user-a", 10, "page", cache.version())
+
+    assert cache.get("user-a", 10) is None
+
+
+def test_evicting_a_user_closes_their_listener(cache):
+    watches = {user_id: MagicMock() for user_id in ("user-a", "user-b", "user-c")}
+    for user_id, watch in watches.items():
+        cache.put(user_id, 10, "page", cache.version(), start_watch=lambda watch=watch: watch)
+
+    watches["user-a"].unsubscribe.assert_called_once()
+    watches["user-c"].unsubscribe.assert_not_called()
+    assert cache.get("user-a", 10) is None
+
+
+def test_expired_entries_close_their_listeners(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(inbox_cache.time, "monotonic", lambda: now[0])
+    idle, active = MagicMock(), MagicMock()
+    cache.put("user-a", 10, "page", cache.version(), start_watch=lambda: idle)
+    now[0] += 20
+    cache.put("user-b", 10, "page", cache.version(), start_watch=lambda: active)
+
+    # user-a went idle: their listener is closed once the entry expires, without them coming back
+    now[0] += 15
+    assert cache.get("user-b", 10) == "page"
+    idle.unsubscribe.assert_called_once()
+    active.unsubscribe.assert_not_called()
+
+
+def test_listener_invalidates_on_changes_after_its_first_snapshot(monkeypatch):
+    cache = inbox_cache._InboxCache(max_size=10)
+    monkeypatch.setattr(inbox_cache, "_cache", cache)
+    monkeypatch.setattr(inbox_cache.settings, "INBOX_CACHE_LISTENERS_ENABLED", True)
+    fake_db = MagicMock()
+    query = fake_db.collection.return_value.where.return_value.order_by.return_value.limit.return_value
+
+    inbox_cache.put_first_page("user-a", 10, "page", inbox_cache.inbox_version(), fake_db)
+    on_snapshot = query.on_snapshot.call_args.args[0]
+
+    on_snapshot([], [MagicMock()], None)
+    assert inbox_cache.get_first_page("user-a", 10) == "page"
+
+    on_snapshot([], [MagicMock()], None)
+    assert inbox_cache.get_first_page("user-a", 10) is None
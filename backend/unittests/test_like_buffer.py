@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud.firestore import Increment
+
+from services import like_service
+from services.like_buffer import LikeWriteBuffer
+
+POST_ID = "post_123"
+
+
+def _make_db(existing_likes=(), shard_total=5):
+    fake_db = MagicMock()
+    post_ref = MagicMock()
+    likes_collection = MagicMock()
+    shards_collection = MagicMock()
+
+    fake_db.collection.return_value.document.return_value = post_ref
+    post_ref.collection.side_effect = lambda name: {
+        like_service.LIKES_SUBCOLLECTION: likes_collection,
+        like_service.LIKE_SHARDS_SUBCOLLECTION: shards_collection,
+    }[name]
+
+    def _like_ref(user_id):
+        ref = MagicMock(id=user_id)
+        ref.get.return_value = MagicMock(exists=user_id in existing_likes)
+        return ref
+
+    likes_collection.document.side_effect = _like_ref
+    fake_db.get_all.side_effect = lambda refs: [
+        MagicMock(exists=ref.id in existing_likes, reference=ref) for ref in refs
+    ]
+    shards_collection.stream.return_value = [MagicMock(**{"to_dict.return_value": {"count": shard_total}})]
+    return fake_db, shards_collection
+
+
+@pytest.fixture(autouse=True)
+def clean_dirty_posts():
+    like_service._dirty_posts.clear()
+    yield
+    like_service._dirty_posts.clear()
+
+
+def test_requests_are_coalesced_and_answered_from_the_buffer():
+    fake_db, shards_collection = _make_db(shard_total=5)
+    buffer = LikeWriteBuffer()
+
+    assert buffer.apply(fake_db, POST_ID, "u1", True) == (True, True, 6)
+    assert buffer.apply(fake_db, POST_ID, "u2", True) == (True, True, 7)
+    assert buffer.apply(fake_db, POST_ID, "u1", False) == (False, True, 6)
+    assert buffer.apply(fake_db, POST_ID, "u1", False) == (False, False, 6)
+
+    # The shard total is read once per post per flush interval, not per request
+    assert shards_collection.stream.call_count == 1
+    assert buffer.peek(POST_ID, "u2") == (True, 1)
+    fake_db.batch.assert_not_called()
+
+
+def test_toggle_reads_the_like_document_once():
+    fake_db, _ = _make_db(existing_likes={"u1"}, shard_total=1)
+    buffer = LikeWriteBuffer()
+
+    assert buffer.apply(fake_db, POST_ID, "u1", None) == (False, True, 0)
+    assert buffer.apply(fake_db, POST_ID, "u1", None) == (True, True, 1)
+
+
+def test_flush_writes_only_real_transitions_in_one_batch():
+    fake_db, shards_collection = _make_db(existing_likes={"already", "leaving"})
+    buffer = LikeWriteBuffer()
+    buffer.apply(fake_db, POST_ID, "already", True)
+    buffer.apply(fake_db, POST_ID, "new", True)
+    buffer.apply(fake_db, POST_ID, "leaving", False)
+    buffer.apply(fake_db, POST_ID, "never", False)
+
+    assert buffer.flush(fake_db) == 2
+
+    batch = fake_db.batch.return_value
+    assert [c.args[0].id for c in batch.create.call_args_list] == ["new"]
+    assert [c.args[0].id for c in batch.delete.call_args_list] == ["leaving"]
+    batch.update.assert_called_once_with(shards_collection.document.return_value, {"count": Increment(0)})
+    batch.commit.assert_called_once()
+    assert like_service._dirty_posts == {POST_ID: 0}
+    assert buffer.peek(POST_ID, "new") == (None, 0)
+
+
+def test_failed_flush_is_requeued_without_overwriting_newer_requests():
+    fake_db, _ = _make_db()
+    fake_db.batch.return_value.commit.side_effect = gcp_exceptions.ServiceUnavailable("down")
+    buffer = LikeWriteBuffer()
+    buffer.apply(fake_db, POST_ID, "u1", True)
+    buffer.apply(fake_db, POST_ID, "u2", True)
+
+    buffer.flush(fake_db)
+
+    assert buffer.peek(POST_ID, "u1")[0] is True
+    buffer.apply(fake_db, POST_ID, "u2", False)
+    assert buffer.peek(POST_ID, "u2")[0] is False
+
+
+def test_set_like_uses_the_buffer_when_enabled(monkeypatch):
+    fake_db, _ = _make_db(shard_total=2)
+    buffer = LikeWriteBuffer()
+    monkeypatch.setattr(like_service.settings, "LIKE_WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr("services.like_buffer.like_buffer", buffer)
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, "u1", liked=True))
+
+    assert response.liked is True
+    assert response.likes == 3
+    fake_db.batch.assert_not_called()
+    assert like_service.liked_post_ids([POST_ID], "u1", fake_db) == {POST_ID}
+    fake_db.get_all.assert_not_called()
+
+
+def test_request_retried_after_a_flush_is_not_counted_again():
+    fake_db, shards_collection = _make_db(shard_total=5)
+    buffer = LikeWriteBuffer()
+    assert buffer.apply(fake_db, POST_ID, "u1", True) == (True, True, 6)
+
+    buffer.flush(fake_db)
+    shards_collection.stream.return_value = [MagicMock(**{"to_dict.return_value": {"count": 6}})]
+
+    assert buffer.apply(fake_db, POST_ID, "u1", True) == (True, False, 6)
+    assert buffer.apply(fake_db, POST_ID, "u1", False) == (False, True, 5)
+
+
+def test_likes_being_flushed_still_count_towards_new_requests():
+    fake_db, _ = _make_db(shard_total=5)
+    buffer = LikeWriteBuffer()
+    buffer.apply(fake_db, POST_ID, "u1", True)
+
+    def _commit():
+        # A retry of u1's like and a new like land while the batch is being written
+        assert buffer.apply(fake_db, POST_ID, "u1", True) == (True, False, 6)
+        assert buffer.apply(fake_db, POST_ID, "u2", True) == (True, True, 7)
+
+    fake_db.batch.return_value.commit.side_effect = _commit
+
+    assert buffer.flush(fake_db) == 1
+    assert buffer.peek(POST_ID, "u1") == (True, 1)
+    assert buffer.peek(POST_ID, "u2") == (True, 1)
+
+
+def test_flushes_run_one_at_a_time():
+    fake_db, _ = _make_db()
+    buffer = LikeWriteBuffer()
+    buffer.apply(fake_db, POST_ID, "u1", True)
+    started = threading.Event()
+    release = threading.Event()
+
+    def _commit():
+        started.set()
+        release.wait(5)
+
+    fake_db.batch.return_value.commit.side_effect = _commit
+    first = threading.Thread(target=buffer.flush, args=(fake_db,))
+    first.start()
+    started.wait(5)
+
+    second = threading.Thread(target=buffer.flush, args=(fake_db,))
+    second.start()
+    second.join(0.05)
+    # The second flush waits for the first rather than racing over its in-flight entries
+    assert second.is_alive()
+
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert buffer.peek(POST_ID, "u1") == (None, 0)
@@ -0,0 +1,276 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from google.cloud import exceptions as gcp_exceptions
+from google.cloud.firestore import Increment
+
+from services import like_service
+
+POST_ID = "post_123"
+USER_ID = "user-liker"
+
+
+def _snap(exists=True, data=None):
+    snap = MagicMock()
+    snap.exists = exists
+    snap.to_dict.return_value = data
+    return snap
+
+
+def _make_db(post_exists=True, liked=False, shard_counts=(1, 2)):
+    fake_db = MagicMock()
+    post_ref = MagicMock()
+    likes_collection = MagicMock()
+    shards_collection = MagicMock()
+    like_doc_ref = MagicMock()
+    transaction = MagicMock()
+
+    fake_db.collection.return_value.document.return_value = post_ref
+    fake_db.transaction.return_value = transaction
+    post_ref.collection.side_effect = lambda name: {
+        like_service.LIKES_SUBCOLLECTION: likes_collection,
+        like_service.LIKE_SHARDS_SUBCOLLECTION: shards_collection,
+    }[name]
+    likes_collection.document.return_value = like_doc_ref
+
+    post_ref.get.return_value = _snap(post_exists, {"userId": "author"})
+    like_doc_ref.get.return_value = _snap(liked)
+    shards_collection.stream.return_value = [_snap(True, {"count": c}) for c in shard_counts]
+
+    return fake_db, post_ref, like_doc_ref, shards_collection, transaction
+
+
+@pytest.fixture(autouse=True)
+def inline_transactions(monkeypatch):
+    monkeypatch.setattr(like_service.firestore, "transactional", lambda fn: fn)
+    like_service._dirty_posts.clear()
+    yield
+    like_service._dirty_posts.clear()
+
+
+def test_toggle_like_adds_like_doc_and_increments_a_shard(monkeypatch):
+    fake_db, _, like_doc_ref, shards_collection, transaction = _make_db(liked=False, shard_counts=(2, 1))
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.toggle_like(POST_ID, USER_ID))
+
+    assert response.liked is True
+    assert response.likes == 3
+    like_write = transaction.set.call_args_list[0]
+    assert like_write.args[0] is like_doc_ref
+    assert like_write.args[1]["userId"] == USER_ID
+    shard_write = transaction.set.call_args_list[1]
+    assert shard_write.args[0] is shards_collection.document.return_value
+    assert shard_write.args[1] == {"count": Increment(1)}
+    assert shard_write.kwargs == {"merge": True}
+    assert like_service._dirty_posts == {POST_ID: 1}
+
+
+def test_toggle_like_removes_existing_like(monkeypatch):
+    fake_db, _, like_doc_ref, _, transaction = _make_db(liked=True, shard_counts=(1,))
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.toggle_like(POST_ID, USER_ID))
+
+    assert response.liked is False
+    transaction.delete.assert_called_once_with(like_doc_ref)
+    assert transaction.set.call_args.args[1] == {"count": Increment(-1)}
+
+
+def test_toggle_like_missing_post_is_404(monkeypatch):
+    fake_db, *_, transaction = _make_db(post_exists=False)
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(like_service.toggle_like(POST_ID, USER_ID))
+
+    assert exc.value.status_code == 404
+    transaction.set.assert_not_called()
+
+
+def test_like_count_is_never_negative():
+    fake_db, *_ = _make_db(shard_counts=(-1, 0))
+    assert like_service.get_like_count(POST_ID, fake_db) == 0
+
+
+def test_roll_up_writes_shard_totals_and_skips_deleted_posts(monkeypatch):
+    fake_db, post_ref, *_ = _make_db(shard_counts=(4, 3))
+    apply_like_delta = MagicMock(side_effect=[True, False])
+    monkeypatch.setattr("services.trending_service.apply_like_delta", apply_like_delta)
+    like_service.mark_dirty("a", 1)
+    like_service.mark_dirty("a", 1)
+    like_service.mark_dirty("b", -1)
+
+    assert like_service.roll_up_like_counts(fake_db) == 1
+    apply_like_delta.assert_any_call(fake_db, post_ref, 7, 2)
+    apply_like_delta.assert_any_call(fake_db, post_ref, 7, -1)
+    assert like_service._dirty_posts == {}
+
+
+def test_roll_up_failure_keeps_posts_dirty(monkeypatch):
+    fake_db, *_ = _make_db()
+    monkeypatch.setattr(
+        "services.trending_service.apply_like_delta",
+        MagicMock(side_effect=gcp_exceptions.ServiceUnavailable("down")),
+    )
+    like_service.mark_dirty("a", 3)
+
+    with pytest.raises(gcp_exceptions.ServiceUnavailable):
+        like_service.roll_up_like_counts(fake_db)
+
+    assert like_service._dirty_posts == {"a": 3}
+
+
+def _make_batch_db(commit_errors=(), post_exists=True, like_exists=False):
+    """Fake db whose like-writing batches raise commit_errors in order (shard-only batches always succeed)."""
+    fake_db, post_ref, like_doc_ref, shards_collection, _ = _make_db(post_exists=post_exists, liked=like_exists)
+    errors = list(commit_errors)
+    batches = []
+
+    def _commit(batch):
+        if (batch.create.called or batch.delete.called) and errors:
+            raise errors.pop(0)
+
+    def _new_batch():
+        batch = MagicMock()
+        batch.commit.side_effect = lambda: _commit(batch)
+        batches.append(batch)
+        return batch
+
+    fake_db.batch.side_effect = _new_batch
+    return fake_db, post_ref, like_doc_ref, shards_collection, batches
+
+
+def test_put_like_creates_like_and_updates_shard_without_reads(monkeypatch):
+    fake_db, post_ref, like_doc_ref, shards_collection, batches = _make_batch_db()
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=True))
+
+    assert response.liked is True and response.likes == 3
+    batches[0].create.assert_called_once()
+    assert batches[0].create.call_args.args[0] is like_doc_ref
+    batches[0].update.assert_called_once_with(shards_collection.document.return_value, {"count": Increment(1)})
+    post_ref.get.assert_not_called()
+    like_doc_ref.get.assert_not_called()
+    assert POST_ID in like_service._dirty_posts
+
+
+def test_put_like_twice_is_a_no_op(monkeypatch):
+    fake_db, *_, batches = _make_batch_db(commit_errors=[gcp_exceptions.Conflict("exists")])
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=True))
+
+    assert response.liked is True
+    assert response.message == "Post already liked"
+    assert len(batches) == 1
+    assert like_service._dirty_posts == {}
+
+
+def test_delete_like_when_not_liked_is_a_no_op(monkeypatch):
+    fake_db, post_ref, like_doc_ref, _, batches = _make_batch_db(
+        commit_errors=[gcp_exceptions.NotFound("no like")], like_exists=False)
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=False))
+
+    assert response.liked is False
+    assert response.message == "Post was not liked"
+    batches[0].delete.assert_called_once()
+    assert batches[0].delete.call_args.kwargs["option"] is fake_db.write_option.return_value
+    fake_db.write_option.assert_called_with(exists=True)
+    # A repeated unlike costs one read of the like document and no shard writes
+    assert len(batches) == 1
+    like_doc_ref.get.assert_called_once()
+    post_ref.get.assert_not_called()
+
+
+def test_unlike_on_post_without_shards_creates_them_and_retries(monkeypatch):
+    fake_db, *_, batches = _make_batch_db(commit_errors=[gcp_exceptions.NotFound("no shard")], like_exists=True)
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=False))
+
+    assert response.message == "Post unliked successfully"
+    assert batches[1].set.call_count == like_service.settings.LIKE_COUNTER_SHARDS
+    batches[2].delete.assert_called_once()
+
+
+def test_like_on_post_without_shards_creates_them_and_retries(monkeypatch):
+    fake_db, *_, batches = _make_batch_db(commit_errors=[gcp_exceptions.NotFound("no shard")])
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    response = asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=True))
+
+    assert response.message == "Post liked successfully"
+    shard_batch = batches[1]
+    assert shard_batch.set.call_count == like_service.settings.LIKE_COUNTER_SHARDS
+    assert shard_batch.set.call_args.args[1] == {"count": Increment(0)}
+    batches[2].create.assert_called_once()
+
+
+def test_like_on_missing_post_is_404(monkeypatch):
+    fake_db, *_ = _make_batch_db(commit_errors=[gcp_exceptions.NotFound("no shard")], post_exists=False)
+    monkeypatch.setattr(like_service, "get_db", lambda: fake_db)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(like_service.set_like(POST_ID, USER_ID, liked=True))
+
+    assert exc.value.status_code == 404
+
+
+def test_liked_post_ids_uses_one_get_all():
+    fake_db = MagicMock()
+
+    def _like_ref(post_id):
+        ref = MagicMock()
+        ref.parent.parent.id = post_id
+        return ref
+
+    fake_db.collection.return_value.document.side_effect = lambda post_id: MagicMock(
+        **{"collection.return_value.document.return_value": _like_ref(post_id)}
+    )
+    fake_db.get_all.side_effect = lambda refs: [
+        MagicMock(exists=ref.parent.parent.id in {"p1", "p3"}, reference=ref) for ref in refs
+    ]
+
+    liked = like_service.liked_post_ids(["p1", "p2", "p3", "p1"], USER_ID, fake_db)
+
+    assert liked == {"p1", "p3"}
+    fake_db.get_all.assert_called_once()
+    assert len(fake_db.get_all.call_args.args[0]) == 3
+
+
+def test_liked_post_ids_empty_page_reads_nothing():
+    fake_db = MagicMock()
+    assert like_service.liked_post_ids([], USER_ID, fake_db) == set()
+    fake_db.get_all.assert_not_called()
+
+
+def test_migration_counts_likedby_and_existing_like_docs_once(monkeypatch):
+    from scripts import migrate_likes_to_subcollection as migration
+
+    monkeypatch.setattr(migration.settings, "LIKE_COUNTER_SHARDS", 2)
+    post_ref = MagicMock(id=POST_ID)
+    likes_collection = MagicMock()
+    shards_collection = MagicMock()
+    post_ref.collection.side_effect = lambda name: {
+        like_service.LIKES_SUBCOLLECTION: likes_collection,
+        like_service.LIKE_SHARDS_SUBCOLLECTION: shards_collection,
+    }[name]
+    likes_collection.document.side_effect = lambda user_id: user_id
+    shards_collection.document.side_effect = lambda shard_id: MagicMock(name=f"shard-{shard_id}")
+    post_ref.get.return_value = _snap(True, {"likedBy": ["old", "both", "old"]})
+    fake_db = MagicMock()
+    transaction = fake_db.transaction.return_value
+    # "both" is in likedBy and already liked through the new code; "new" liked only after deploy
+    transaction.get.return_value = [MagicMock(id="both"), MagicMock(id="new")]
+
+    assert migration.migrate_post(fake_db, post_ref) == 3
+
+    assert [c.args[0] for c in transaction.create.call_args_list] == ["old"]
+    assert [c.args[1] for c in transaction.set.call_args_list] == [{"count": 3}, {"count": 0}]
+    transaction.update.assert_called_once_with(post_ref, {"likes": 3, "likedBy": migration.DELETE_FIELD})
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth as auth_module
+from auth import get_current_user
+from utils.local_jwt import LocalTokenIssuer, LocalTokenVerifier, generate_keypair
+
+
+@pytest.fixture(scope="module")
+def keypair():
+    return generate_keypair()
+
+
+def test_minted_token_round_trips(keypair):
+    private_pem, public_pem = keypair
+    token = LocalTokenIssuer(private_pem).mint("loadtest_user_42")
+
+    claims = LocalTokenVerifier(public_pem)(token)
+
+    assert claims["uid"] == "loadtest_user_42"
+
+
+def test_token_from_other_key_is_rejected(keypair):
+    other_private, _ = generate_keypair()
+    token = LocalTokenIssuer(other_private).mint("loadtest_user_1")
+
+    with pytest.raises(auth_module.auth.InvalidIdTokenError):
+        LocalTokenVerifier(keypair[1])(token)
+
+
+def test_expired_token_is_rejected(keypair):
+    private_pem, public_pem = keypair
+    token = LocalTokenIssuer(private_pem).mint("loadtest_user_1", ttl_seconds=-60)
+
+    with pytest.raises(auth_module.auth.ExpiredIdTokenError):
+        LocalTokenVerifier(public_pem)(token)
+
+
+def test_get_current_user_accepts_local_tokens_when_configured(keypair, tmp_path, monkeypatch):
+    private_pem, public_pem = keypair
+    key_path = tmp_path / "public.pem"
+    key_path.write_bytes(public_pem)
+    monkeypatch.setattr(auth_module.settings, "DEV_MODE", False)
+    monkeypatch.setattr(auth_module.settings, "LOAD_TEST_JWT_PUBLIC_KEY_PATH", str(key_path))
+    monkeypatch.setattr(auth_module, "_local_verifier", None)
+    monkeypatch.setattr(auth_module, "_token_cache", auth_module._VerifiedTokenCache(max_size=100))
+
+    issuer = LocalTokenIssuer(private_pem)
+    uids = [asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=issuer.mint(f"u{n}"))))
+            for n in range(3)]
+    assert uids == ["u0", "u1", "u2"]
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-jwt")))
+    assert exc.value.status_code == 401
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from utils import location as location_utils
+from utils.location import GeocodingUnavailableError, resolve_location_from_zip
+
+
+TEST_ZIP = "97209"
+
+
+def _make_cache_db(cached_data=None):
+    fake_db = MagicMock()
+    cache_ref = MagicMock()
+    cached_doc = MagicMock()
+    cached_doc.exists = cached_data is not None
+    cached_doc.to_dict.return_value = cached_data
+    cache_ref.get.return_value = cached_doc
+    fake_db.collection.return_value.document.return_value = cache_ref
+    return fake_db, cache_ref
+
+
+def _patch_geocoding(monkeypatch, payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    client = MagicMock()
+    client.get = AsyncMock(return_value=response)
+    client_cm = MagicMock()
+    client_cm.__aenter__ = AsyncMock(return_value=client)
+    client_cm.__aexit__ = AsyncMock(return_value=False)
+    monkeypatch.setattr(location_utils.httpx, "AsyncClient", lambda **_: client_cm)
+    monkeypatch.setattr(location_utils.settings, "GOOGLE_MAPS_API_KEY", "test-key")
+    return client
+
+
+def test_zero_results_is_cached_as_negative_entry(monkeypatch):
+    fake_db, cache_ref = _make_cache_db()
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    _patch_geocoding(monkeypatch, {"status": "ZERO_RESULTS", "results": []})
+
+    assert asyncio.run(resolve_location_from_zip(TEST_ZIP)) is None
+
+    cached = cache_ref.set.call_args.args[0]
+    assert cached["status"] == "ZERO_RESULTS"
+    assert cached["expiresAt"] > datetime.now(timezone.utc)
+
+
+def test_live_negative_entry_skips_geocoding(monkeypatch):
+    fake_db, cache_ref = _make_cache_db({
+        "status": "ZERO_RESULTS",
+        "expiresAt": datetime.now(timezone.utc) + timedelta(hours=1),
+    })
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    client = _patch_geocoding(monkeypatch, {"status": "OK", "results": []})
+
+    assert asyncio.run(resolve_location_from_zip(TEST_ZIP)) is None
+
+    client.get.assert_not_called()
+    cache_ref.set.assert_not_called()
+
+
+def test_expired_negative_entry_retries_geocoding(monkeypatch):
+    fake_db, cache_ref = _make_cache_db({
+        "status": "ZERO_RESULTS",
+        "expiresAt": datetime.now(timezone.utc) - timedelta(seconds=1),
+    })
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    client = _patch_geocoding(monkeypatch, {
+        "status": "OK",
+        "results": [{
+            "geometry": {"location": {"lat": 45.5, "lng": -122.7}},
+            "formatted_address": "Portland, OR 97209, USA",
+            "place_id": "place_123",
+        }],
+    })
+
+    result = asyncio.run(resolve_location_from_zip(TEST_ZIP))
+
+    assert result.lat == 45.5
+    client.get.assert_awaited_once()
+    assert "status" not in cache_ref.set.call_args.args[0]
+
+
+def test_quota_error_is_cached_as_backoff(monkeypatch):
+    fake_db, cache_ref = _make_cache_db()
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    _patch_geocoding(monkeypatch, {"status": "OVER_QUERY_LIMIT", "error_message": "quota"})
+
+    # The request that hits the failure gets the same 503-able error as the ones after it
+    with pytest.raises(GeocodingUnavailableError) as exc:
+        asyncio.run(resolve_location_from_zip(TEST_ZIP))
+
+    assert exc.value.retry_after == location_utils.settings.LOCATION_ERROR_BACKOFF_SECONDS
+    cached = cache_ref.set.call_args.args[0]
+    assert cached["status"] == "ERROR"
+    assert cached["error"] == "OVER_QUERY_LIMIT"
+
+
+def test_transport_error_is_cached_as_backoff_and_chained(monkeypatch):
+    fake_db, cache_ref = _make_cache_db()
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    client = _patch_geocoding(monkeypatch, {})
+    client.get.side_effect = location_utils.httpx.ConnectTimeout("timed out")
+
+    with pytest.raises(GeocodingUnavailableError) as exc:
+        asyncio.run(resolve_location_from_zip(TEST_ZIP))
+
+    assert isinstance(exc.value.__cause__, location_utils.httpx.ConnectTimeout)
+    assert cache_ref.set.call_args.args[0]["error"] == "ConnectTimeout"
+
+
+def test_request_denied_is_not_cached(monkeypatch):
+    fake_db, cache_ref = _make_cache_db()
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    _patch_geocoding(monkeypatch, {"status": "REQUEST_DENIED", "error_message": "bad key"})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(resolve_location_from_zip(TEST_ZIP))
+
+    cache_ref.set.assert_not_called()
+
+
+def test_live_backoff_entry_raises_without_calling_api(monkeypatch):
+    fake_db, _ = _make_cache_db({
+        "status": "ERROR",
+        "error": "OVER_QUERY_LIMIT",
+        "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=30),
+    })
+    monkeypatch.setattr(location_utils, "get_db", lambda: fake_db)
+    client = _patch_geocoding(monkeypatch, {"status": "OK", "results": []})
+
+    with pytest.raises(GeocodingUnavailableError) as exc:
+        asyncio.run(resolve_location_from_zip(TEST_ZIP))
+
+    assert 0 < exc.value.retry_after <= 30
+    client.get.assert_not_called()
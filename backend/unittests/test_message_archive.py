@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import message_archive
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+OLD = NOW - timedelta(days=90)
+
+
+@pytest.fixture(autouse=True)
+def archive_settings(monkeypatch):
+    monkeypatch.setattr(message_archive.settings, "MESSAGE_CHUNK_SIZE", 3)
+    monkeypatch.setattr(message_archive.settings, "MESSAGE_COMPACTION_AGE_DAYS", 30)
+
+
+def _message(message_id, minutes, content="hi"):
+    return MagicMock(id=message_id, to_dict=MagicMock(return_value={
+        "sender_id": "user-a", "content": content, "createdAt": OLD + timedelta(minutes=minutes),
+    }))
+
+
+def _make_db(old_messages):
+    """Old messages, oldest first; each committed batch removes the ones it deleted."""
+    fake_db = MagicMock()
+    convo_ref = fake_db.collection.return_value.document.return_value
+    messages_ref = MagicMock()
+    chunks_ref = MagicMock()
+    convo_ref.collection.side_effect = lambda name: {
+        message_archive.MESSAGES_SUBCOLLECTION: messages_ref,
+        message_archive.CHUNKS_SUBCOLLECTION: chunks_ref,
+    }[name]
+    remaining = list(old_messages)
+    batches = []
+
+    def _stream():
+        return remaining[:message_archive.settings.MESSAGE_CHUNK_SIZE]
+
+    messages_ref.where.return_value.order_by.return_value.order_by.return_value.limit.return_value.stream.side_effect = _stream
+    messages_ref.document.side_effect = lambda message_id: message_id
+
+    def _batch():
+        batch = MagicMock()
+
+        def _commit():
+            deleted = {c.args[0] for c in batch.delete.call_args_list}
+            remaining[:] = [m for m in remaining if m.id not in deleted]
+
+        batch.commit.side_effect = _commit
+        batches.append(batch)
+        return batch
+
+    fake_db.batch.side_effect = _batch
+    return fake_db, batches
+
+
+def test_full_chunks_of_old_messages_are_archived_and_deleted_together():
+    fake_db, batches = _make_db([_message(f"m{i}", i) for i in range(7)])
+
+    assert message_archive.compact_conversation(fake_db, "conv-1", now=NOW) == 6
+
+    # m6 is left loose: there aren't enough old messages for another full chunk
+    assert len(batches) == 2
+    chunk = batches[0].create.call_args.args[1]
+    assert chunk["messageIds"] == ["m0", "m1", "m2"]
+    assert chunk["messages"][0]["id"] == "m0"
+    assert chunk["firstCreatedAt"] == OLD
+    assert chunk["lastCreatedAt"] == OLD + timedelta(minutes=2)
+    assert batches[0].delete.call_count == 3
+    counters = batches[0].update.call_args.args[1]
+    assert counters["loose_message_count"] == message_archive.firestore.Increment(-3)
+    assert counters["archived_message_count"] == message_archive.firestore.Increment(3)
+
+
+def test_chunk_is_cut_short_before_the_document_size_limit(monkeypatch):
+    monkeypatch.setattr(message_archive, "CHUNK_MAX_BYTES", 5000)
+    big = "x" * 2000
+    fake_db, batches = _make_db([_message(f"m{i}", i, big) for i in range(3)])
+
+    assert message_archive.compact_conversation(fake_db, "conv-1", now=NOW) == 2
+
+    assert batches[0].create.call_args.args[1]["count"] == 2
+
+
+def test_sweep_skips_deleting_conversations_and_survives_races(monkeypatch):
+    fake_db = MagicMock()
+    fake_db.collection.return_value.where.return_value.select.return_value.stream.return_value = [
+        MagicMock(id="deleting", **{"to_dict.return_value": {"is_deleting": True}}),
+        MagicMock(id="raced", **{"to_dict.return_value": {}}),
+        MagicMock(id="ok", **{"to_dict.return_value": {}}),
+    ]
+
+    def _compact(db, conversation_id):
+        if conversation_id == "raced":
+            raise message_archive.gcp_exceptions.NotFound("message already gone")
+        return 300
+
+    compacted = MagicMock(side_effect=_compact)
+    monkeypatch.setattr(message_archive, "compact_conversation", compacted)
+
+    assert message_archive.compact_due_conversations(fake_db) == 300
+    assert [c.args[1] for c in compacted.call_args_list] == ["raced", "ok"]
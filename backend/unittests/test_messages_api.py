@@ -1,14 +1,14 @@
+import itertools
 from datetime import datetime, timezone
-from types import SimpleNamespace
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import MagicMock
 
 import pytest
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from auth import get_current_user
 from routers.messages import router as messages_router
-from services import message_service
+from services import message_service, participant_cache
 
 
 
@@ -53,19 +53,136 @@ def _make_send_message_db(participant_ids, exists=True):
     return fake_db, conversation_ref, transaction, message_ref
 
 
-def _make_list_messages_db(message_docs):
+class _FakeMessageQuery:
+    """Ordered message query: createdAt then __name__, either direction, with start_at/start_after and limit."""
+
+    def __init__(self, docs, descending=False, bound=None, inclusive=False, count=None):
+        self.docs = docs
+        self.descending = descending
+        self.bound = bound
+        self.inclusive = inclusive
+        self.count = count
+
+    def _clone(self, **changes):
+        fields = dict(descending=self.descending, bound=self.bound, inclusive=self.inclusive, count=self.count)
+        fields.update(changes)
+        return _FakeMessageQuery(self.docs, **fields)
+
+    def order_by(self, field, direction=None):
+        return self._clone(descending=direction == message_service.firestore.Query.DESCENDING)
+
+    def start_at(self, position):
+        return self._clone(bound=(position["createdAt"], position["__name__"]), inclusive=True)
+
+    def start_after(self, position):
+        return self._clone(bound=(position["createdAt"], position["__name__"]), inclusive=False)
+
+    def limit(self, count):
+        return self._clone(count=count)
+
+    def stream(self):
+        key = lambda doc: (doc.to_dict()["createdAt"], doc.id)
+        ordered = sorted(self.docs, key=key, reverse=self.descending)
+        if self.bound is not None:
+            def past(doc):
+                if self.inclusive and key(doc) == self.bound:
+                    return True
+                return key(doc) < self.bound if self.descending else key(doc) > self.bound
+            ordered = [doc for doc in ordered if past(doc)]
+        return ordered[:self.count]
+
+
+def _make_message_doc(message_id, minute, sender_id=TEST_USER_ID):
+    return MagicMock(
+        id=message_id,
+        exists=True,
+        to_dict=MagicMock(return_value={
+            "content": f"Message {message_id}",
+            "sender_id": sender_id,
+            "createdAt": datetime(2026, 1, 1, 12, minute, tzinfo=timezone.utc),
+        }),
+    )
+
+
+class _FakeChunkQuery:
+    """messageChunks query: where filters, one order_by field, start_after a chunk snapshot, limit."""
+
+    def __init__(self, chunks, filters=(), field=None, descending=False, after=None, count=None):
+        self.chunks = chunks
+        self.filters = filters
+        self.field = field
+        self.descending = descending
+        self.after = after
+        self.count = count
+
+    def _clone(self, **changes):
+        fields = dict(filters=self.filters, field=self.field, descending=self.descending, after=self.after, count=self.count)
+        fields.update(changes)
+        return _FakeChunkQuery(self.chunks, **fields)
+
+    def where(self, filter):
+        return self._clone(filters=self.filters + (filter,))
+
+    def order_by(self, field, direction=None):
+        return self._clone(field=field, descending=direction == message_service.firestore.Query.DESCENDING)
+
+    def start_after(self, snapshot):
+        return self._clone(after=snapshot)
+
+    def limit(self, count):
+        return self._clone(count=count)
+
+    def stream(self):
+        ops = {
+            "<=": lambda a, b: a <= b,
+            ">=": lambda a, b: a >= b,
+            "array_contains": lambda a, b: b in a,
+        }
+        found = [
+            chunk for chunk in self.chunks
+            if all(ops[f.op_string](chunk.to_dict()[f.field_path], f.value) for f in self.filters)
+        ]
+        if self.field:
+            found.sort(key=lambda chunk: chunk.to_dict()[self.field], reverse=self.descending)
+        if self.after is not None:
+            found = found[found.index(self.after) + 1:]
+        return found[:self.count]
+
+
+def _make_chunk(message_docs):
+    entries = [{**doc.to_dict(), "id": doc.id} for doc in message_docs]
+    return MagicMock(to_dict=MagicMock(return_value={
+        "messages": entries,
+        "messageIds": [entry["id"] for entry in entries],
+        "firstCreatedAt": entries[0]["createdAt"],
+        "lastCreatedAt": entries[-1]["createdAt"],
+    }))
+
+
+def _make_list_messages_db(message_docs, participant_ids=(TEST_USER_ID, OTHER_USER_ID), exists=True, chunks=()):
     fake_db = MagicMock()
     conversation_ref = MagicMock()
     message_collection = MagicMock()
-    query = MagicMock()
 
     fake_db.collection.return_value.document.return_value = conversation_ref
-    conversation_ref.collection.return_value = message_collection
-    message_collection.order_by.return_value = query
-    query.limit.return_value = query
-    query.stream.return_value = message_docs
+    conversation_ref.get.return_value = MagicMock(
+        exists=exists, to_dict=MagicMock(return_value={"participant_ids": list(participant_ids)})
+    )
+    conversation_ref.collection.side_effect = lambda name: {
+        "messages": message_collection,
+        "messageChunks": _FakeChunkQuery([_make_chunk(chunk) for chunk in chunks]),
+    }[name]
+    message_collection.order_by.side_effect = _FakeMessageQuery(message_docs).order_by
+    by_id = {doc.id: doc for doc in message_docs}
+    message_collection.document.side_effect = lambda message_id: MagicMock(
+        get=MagicMock(return_value=by_id.get(message_id, MagicMock(exists=False)))
+    )
 
-    return fake_db, conversation_ref, message_collection, query
+    return fake_db, conversation_ref, message_collection
+
+
+def _ids(body):
+    return [message["messageId"] for message in body["messages"]]
 
 
 def test_send_message_returns_201_and_updates_conversation(client, monkeypatch):
@@ -95,6 +212,105 @@ def test_send_message_returns_201_and_updates_conversation(client, monkeypatch):
     assert update_args["last_message_preview"] == "Ready to jam this weekend?"
     assert update_args["last_message_sender_id"] == TEST_USER_ID
     assert update_args["updatedAt"] == update_args["last_message_sent_at"]
+    assert update_args[f"unread_counts.`{OTHER_USER_ID}`"] == message_service.firestore.Increment(1)
+    assert update_args[f"unread_counts.`{TEST_USER_ID}`"] == 0
+    assert update_args[f"last_read_at.`{TEST_USER_ID}`"] == update_args["updatedAt"]
+
+
+def test_batch_send_writes_all_messages_with_one_conversation_update(client, monkeypatch):
+    fake_db, conversation_ref, transaction, _ = _make_send_message_db([TEST_USER_ID, OTHER_USER_ID])
+    conversation_ref.collection.return_value.document.side_effect = lambda message_id=None: MagicMock(id=message_id or "new")
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+    monkeypatch.setattr(message_service.firestore, "transactional", lambda fn: fn)
+
+    response = client.post(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages:batch",
+        json={"messages": [{"content": "Gig is at 8"}, {"content": "Load in at 6"}, {"content": "Bring cables"}]},
+    )
+
+    assert response.status_code == 201
+    messages = response.json()["messages"]
+    assert [m["content"] for m in messages] == ["Gig is at 8", "Load in at 6", "Bring cables"]
+    assert messages[0]["createdAt"] < messages[1]["createdAt"] < messages[2]["createdAt"]
+    assert transaction.set.call_count == 3
+    assert transaction.update.call_count == 1
+    conversation_ref.get.assert_called_once()
+    update_args = transaction.update.call_args.args[1]
+    assert update_args["last_message_preview"] == "Bring cables"
+    assert update_args[f"unread_counts.`{OTHER_USER_ID}`"] == message_service.firestore.Increment(3)
+
+
+def test_batch_send_rejects_empty_batch_with_422(client):
+    response = client.post(f"/api/v1/conversations/{CONVERSATION_ID}/messages:batch", json={"messages": []})
+
+    assert response.status_code == 422
+
+
+def _make_broadcast_db(conversations):
+    """conversations: conversation_id -> participant IDs, or None for a missing conversation."""
+    fake_db = MagicMock()
+    message_ids = itertools.count()
+
+    def _conversation_ref(conversation_id):
+        ref = MagicMock(id=conversation_id)
+        ref.collection.return_value.document.side_effect = lambda: MagicMock(id=f"msg_{next(message_ids)}")
+        return ref
+
+    fake_db.collection.return_value.document.side_effect = _conversation_ref
+    fake_db.get_all.side_effect = lambda refs: [
+        MagicMock(
+            id=ref.id,
+            exists=conversations.get(ref.id) is not None,
+            to_dict=MagicMock(return_value={"participant_ids": conversations.get(ref.id)}),
+        )
+        for ref in refs
+    ]
+    return fake_db
+
+
+def test_broadcast_sends_in_bounded_batches_and_reports_failures(client, monkeypatch):
+    conversations = {f"conv_{i}": [TEST_USER_ID, f"member_{i}"] for i in range(5)}
+    conversations["strangers"] = [OTHER_USER_ID, "someone"]
+    fake_db = _make_broadcast_db(conversations)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+    monkeypatch.setattr(message_service.settings, "MESSAGE_BROADCAST_BATCH_SIZE", 2)
+
+    response = client.post(
+        "/api/v1/messages:broadcast",
+        json={"content": "Band audition tomorrow", "conversationIds": [*conversations, "missing", "conv_0"]},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(m["conversationId"] for m in body["sent"]) == [f"conv_{i}" for i in range(5)]
+    assert {f["conversationId"]: f["statusCode"] for f in body["failed"]} == {"strangers": 403, "missing": 404}
+    # Five conversations, two per batch; participants were read in one call
+    assert fake_db.batch.call_count == 3
+    fake_db.get_all.assert_called_once()
+
+
+def test_broadcast_retries_a_failed_batch_per_conversation(client, monkeypatch):
+    fake_db = _make_broadcast_db({"conv_a": [TEST_USER_ID, OTHER_USER_ID], "conv_b": [TEST_USER_ID, OTHER_USER_ID]})
+    batches = []
+
+    def _batch():
+        batch = MagicMock()
+        batches.append(batch)
+        # The combined batch and conv_b's own batch fail: conv_b was deleted meanwhile
+        if len(batches) in (1, 3):
+            batch.commit.side_effect = message_service.gcp_exceptions.NotFound("gone")
+        return batch
+
+    fake_db.batch.side_effect = _batch
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    body = client.post(
+        "/api/v1/messages:broadcast",
+        json={"content": "Practice moved", "conversationIds": ["conv_a", "conv_b"]},
+    ).json()
+
+    assert [m["conversationId"] for m in body["sent"]] == ["conv_a"]
+    assert body["failed"] == [{"conversationId": "conv_b", "statusCode": 404, "detail": "Conversation not found"}]
 
 
 def test_send_message_rejects_non_participant_with_403(client, monkeypatch):
@@ -123,52 +339,130 @@ def test_send_message_rejects_empty_content_with_422(client):
 
 
 def test_list_messages_returns_paginated_results(client, monkeypatch):
-    docs = [
-        MagicMock(
-            id="msg_2",
-            to_dict=MagicMock(
-                return_value={
-                    "content": "Second message",
-                    "sender_id": OTHER_USER_ID,
-                    "created_at": datetime(2026, 1, 1, 12, 1, tzinfo=timezone.utc),
-                }
-            ),
-        ),
-        MagicMock(
-            id="msg_1",
-            to_dict=MagicMock(
-                return_value={
-                    "content": "First message",
-                    "sender_id": TEST_USER_ID,
-                    "created_at": datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc),
-                }
-            ),
-        ),
+    docs = [_make_message_doc(f"msg_{i}", i) for i in range(1, 4)]
+    fake_db, conversation_ref, message_collection = _make_list_messages_db(docs)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    page1 = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"limit": 2}).json()
+    page2 = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages",
+        params={"limit": 2, "last_doc_id": page1["nextPageToken"]},
+    ).json()
+
+    assert _ids(page1) == ["msg_3", "msg_2"]
+    assert page1["messages"][0]["content"] == "Message msg_3"
+    assert page1["prevPageToken"] is None
+    assert _ids(page2) == ["msg_1"]
+    assert page2["nextPageToken"] is None
+    # The token carries its own position and the participant check is cached: one read in total
+    conversation_ref.get.assert_called_once()
+    message_collection.document.assert_not_called()
+
+
+def test_list_messages_accepts_legacy_message_id_token(client, monkeypatch):
+    docs = [_make_message_doc(f"msg_{i}", i) for i in range(1, 4)]
+    fake_db, _, message_collection = _make_list_messages_db(docs)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    body = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"last_doc_id": "msg_2"}).json()
+
+    assert _ids(body) == ["msg_1"]
+    message_collection.document.assert_called_once_with("msg_2")
+
+
+def test_list_messages_after_pages_towards_newer_messages(client, monkeypatch):
+    docs = [_make_message_doc(f"msg_{i}", i) for i in range(1, 6)]
+    fake_db, _, _ = _make_list_messages_db(docs)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    body = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"after": "msg_1", "limit": 2}
+    ).json()
+
+    assert _ids(body) == ["msg_3", "msg_2"]
+    newer = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"after": body["prevPageToken"], "limit": 2}
+    ).json()
+    assert _ids(newer) == ["msg_5", "msg_4"]
+    assert newer["prevPageToken"] is None
+    older = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"before": body["nextPageToken"], "limit": 2}
+    ).json()
+    assert _ids(older) == ["msg_1"]
+
+
+def test_list_messages_around_centres_on_the_message(client, monkeypatch):
+    docs = [_make_message_doc(f"msg_{i}", i) for i in range(1, 10)]
+    fake_db, _, _ = _make_list_messages_db(docs)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    body = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"around": "msg_5", "limit": 4}
+    ).json()
+
+    assert _ids(body) == ["msg_7", "msg_6", "msg_5", "msg_4"]
+    assert body["nextPageToken"] is not None
+    assert body["prevPageToken"] is not None
+
+
+def _archived_history():
+    """msg_1..msg_6 compacted into two chunks, msg_7..msg_9 still loose."""
+    docs = [_make_message_doc(f"msg_{i}", i) for i in range(1, 10)]
+    return docs[6:], [docs[0:3], docs[3:6]]
+
+
+def test_list_messages_continues_from_messages_into_archived_chunks(client, monkeypatch):
+    loose, chunks = _archived_history()
+    fake_db, _, _ = _make_list_messages_db(loose, chunks=chunks)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    pages = []
+    token = None
+    while True:
+        params = {"limit": 4, **({"before": token} if token else {})}
+        body = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages", params=params).json()
+        pages.append(_ids(body))
+        token = body["nextPageToken"]
+        if token is None:
+            break
+
+    assert pages == [
+        ["msg_9", "msg_8", "msg_7", "msg_6"],
+        ["msg_5", "msg_4", "msg_3", "msg_2"],
+        ["msg_1"],
     ]
-    fake_db, _, _, query = _make_list_messages_db(docs)
-    conversation_service_stub = SimpleNamespace(
-        get_conversation_by_id=AsyncMock(return_value={"conversation_id": CONVERSATION_ID})
-    )
 
+
+def test_list_messages_after_an_archived_message_reads_chunks_then_messages(client, monkeypatch):
+    loose, chunks = _archived_history()
+    fake_db, _, _ = _make_list_messages_db(loose, chunks=chunks)
     monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
-    monkeypatch.setattr(message_service, "conversation_service", conversation_service_stub, raising=False)
 
-    response = client.get(
+    # A bare ID of an archived message is found through the chunks' messageIds
+    body = client.get(
         f"/api/v1/conversations/{CONVERSATION_ID}/messages",
-        params={"limit": 1},
-    )
+        params={"limit": 3, "after": "msg_5"},
+    ).json()
 
-    assert response.status_code == 200
-    body = response.json()
-    assert len(body["messages"]) == 1
-    assert body["messages"][0]["messageId"] == "msg_2"
-    assert body["messages"][0]["content"] == "Second message"
-    assert body["nextPageToken"] == "msg_2"
-    conversation_service_stub.get_conversation_by_id.assert_awaited_once_with(
-        CONVERSATION_ID,
-        TEST_USER_ID,
+    assert _ids(body) == ["msg_8", "msg_7", "msg_6"]
+    assert body["prevPageToken"] is not None
+
+
+def test_list_messages_rejects_more_than_one_position(client):
+    response = client.get(
+        f"/api/v1/conversations/{CONVERSATION_ID}/messages", params={"before": "msg_1", "after": "msg_2"}
     )
-    query.limit.assert_called_once_with(2)
+
+    assert response.status_code == 422
+
+
+def test_list_messages_non_participant_returns_403(client, monkeypatch):
+    fake_db, _, _ = _make_list_messages_db([], participant_ids=[OTHER_USER_ID])
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+
+    response = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages")
+
+    assert response.status_code == 403
 
 
 def test_list_messages_rejects_invalid_limit_with_422(client):
@@ -181,12 +475,8 @@ def test_list_messages_rejects_invalid_limit_with_422(client):
 
 
 def test_list_messages_propagates_not_found_from_conversation_lookup(client, monkeypatch):
-    conversation_service_stub = SimpleNamespace(
-        get_conversation_by_id=AsyncMock(
-            side_effect=HTTPException(status_code=404, detail="Conversation not found")
-        )
-    )
-    monkeypatch.setattr(message_service, "conversation_service", conversation_service_stub, raising=False)
+    fake_db, _, _ = _make_list_messages_db([], exists=False)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
 
     response = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages")
 
@@ -250,14 +540,8 @@ def test_send_message_propagates_db_errors_as_500(client, monkeypatch):
 
 
 def test_list_messages_returns_empty_list_when_no_messages(client, monkeypatch):
-    docs = []
-    fake_db, _, _, query = _make_list_messages_db(docs)
-    conversation_service_stub = SimpleNamespace(
-        get_conversation_by_id=AsyncMock(return_value={"conversation_id": CONVERSATION_ID})
-    )
-
+    fake_db, _, _ = _make_list_messages_db([])
     monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
-    monkeypatch.setattr(message_service, "conversation_service", conversation_service_stub, raising=False)
 
     response = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages")
 
@@ -275,4 +559,27 @@ def test_list_messages_propagates_db_errors_as_500(client, monkeypatch):
 
     response = client.get(f"/api/v1/conversations/{CONVERSATION_ID}/messages")
 
-    assert response.status_code == 500
\ No newline at end of file
+    assert response.status_code == 500
+
+def test_broadcast_rereads_conversations_deleted_on_another_worker(client, monkeypatch):
+    conversations = {"conv_a": [TEST_USER_ID, OTHER_USER_ID]}
+    fake_db = _make_broadcast_db(conversations)
+    monkeypatch.setattr(message_service, "get_db", lambda: fake_db)
+    participant_cache._cache.put("conv_a", frozenset(conversations["conv_a"]))
+    # Another worker marked conv_a for deletion after this worker cached its participants
+    fake_db.get_all.side_effect = lambda refs: [
+        MagicMock(id=ref.id, exists=True, to_dict=MagicMock(return_value={
+            "participant_ids": conversations[ref.id], "is_deleting": True,
+        }))
+        for ref in refs
+    ]
+
+    body = client.post(
+        "/api/v1/messages:broadcast",
+        json={"content": "Practice moved", "conversationIds": ["conv_a"]},
+    ).json()
+
+    assert body["sent"] == []
+    assert body["failed"] == [{"conversationId": "conv_a", "statusCode": 404, "detail": "Conversation not found"}]
+    assert participant_cache._cache.get("conv_a") is None
+    fake_db.batch.assert_not_called()
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock
+
+from services import profile_cache
+from services.profile_cache import (
+    get_profile_summary,
+    invalidate_profile,
+    prime_profile,
+    profile_exists,
+)
+
+
+def _make_profiles_db(exists=True, data=None):
+    fake_db = MagicMock()
+    profile_ref = fake_db.collection.return_value.document.return_value
+    profile_doc = MagicMock()
+    profile_doc.exists = exists
+    profile_doc.to_dict.return_value = data if data is not None else {
+        "firstName": "Lisa",
+        "lastName": "Simpson",
+        "profilePicUrl": None,
+        "email": "lisa@example.com",
+    }
+    profile_ref.get.return_value = profile_doc
+    return fake_db, profile_ref
+
+
+def test_summary_is_read_once_and_trimmed_to_summary_fields():
+    fake_db, profile_ref = _make_profiles_db()
+
+    first = get_profile_summary("user-lisa", fake_db)
+    second = get_profile_summary("user-lisa", fake_db)
+
+    assert first == second == {"firstName": "Lisa", "lastName": "Simpson", "profilePicUrl": None}
+    profile_ref.get.assert_called_once()
+
+
+def test_missing_profile_is_cached_with_negative_ttl(monkeypatch):
+    fake_db, profile_ref = _make_profiles_db(exists=False)
+    clock = [100.0]
+    monkeypatch.setattr(profile_cache.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(profile_cache.settings, "PROFILE_CACHE_NEGATIVE_TTL_SECONDS", 5)
+
+    assert profile_exists("user-ghost", fake_db) is False
+    assert profile_exists("user-ghost", fake_db) is False
+    assert profile_ref.get.call_count == 1
+
+    clock[0] += 6
+    assert profile_exists("user-ghost", fake_db) is False
+    assert profile_ref.get.call_count == 2
+
+
+def test_prime_and_invalidate():
+    fake_db, profile_ref = _make_profiles_db(exists=False)
+
+    prime_profile("user-bart", {"firstName": "Bart", "lastName": "Simpson", "bio": "Eat my shorts"})
+    assert get_profile_summary("user-bart", fake_db) == {"firstName": "Bart", "lastName": "Simpson"}
+    profile_ref.get.assert_not_called()
+
+    invalidate_profile("user-bart")
+    assert profile_exists("user-bart", fake_db) is False
+    profile_ref.get.assert_called_once()
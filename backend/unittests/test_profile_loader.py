@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from services.profile_cache import prime_profile
+from services.profile_loader import ProfileLoader
+
+
+def _make_db(profiles):
+    fake_db = MagicMock()
+
+    def _document(user_id):
+        ref = MagicMock(id=user_id)
+        return ref
+
+    def _get_all(refs, **_):
+        snaps = []
+        for ref in refs:
+            snap = MagicMock(id=ref.id)
+            snap.exists = ref.id in profiles
+            snap.to_dict.return_value = profiles.get(ref.id)
+            snaps.append(snap)
+        return list(reversed(snaps))  # get_all does not preserve request order
+
+    fake_db.collection.return_value.document.side_effect = _document
+    fake_db.get_all.side_effect = _get_all
+    return fake_db
+
+
+PROFILES = {
+    "user-lisa": {"firstName": "Lisa", "lastName": "Simpson", "bio": "Sax"},
+    "user-bart": {"firstName": "Bart", "lastName": "Simpson"},
+}
+
+
+def test_loads_in_the_same_tick_share_one_get_all():
+    fake_db = _make_db(PROFILES)
+    loader = ProfileLoader(fake_db)
+
+    async def _run():
+        return await asyncio.gather(
+            loader.load("user-lisa"),
+            loader.load("user-bart"),
+            loader.load("user-ghost"),
+            loader.load("user-lisa"),
+        )
+
+    lisa, bart, ghost, lisa_again = asyncio.run(_run())
+
+    assert lisa["bio"] == "Sax"
+    assert bart["firstName"] == "Bart"
+    assert ghost is None
+    assert lisa_again is lisa
+    fake_db.get_all.assert_called_once()
+    assert len(fake_db.get_all.call_args.args[0]) == 3
+
+
+def test_results_are_memoized_for_the_request():
+    fake_db = _make_db(PROFILES)
+    loader = ProfileLoader(fake_db)
+
+    async def _run():
+        await loader.load("user-lisa")
+        return await loader.load_many(["user-lisa", "user-bart"])
+
+    lisa, bart = asyncio.run(_run())
+
+    assert lisa["firstName"] == "Lisa" and bart["firstName"] == "Bart"
+    assert fake_db.get_all.call_count == 2
+    assert [ref.id for ref in fake_db.get_all.call_args.args[0]] == ["user-bart"]
+
+
+def test_load_summaries_uses_profile_cache_before_reading():
+    fake_db = _make_db(PROFILES)
+    prime_profile("user-lisa", PROFILES["user-lisa"])
+    loader = ProfileLoader(fake_db)
+
+    lisa, bart = asyncio.run(loader.load_summaries(["user-lisa", "user-bart"]))
+
+    assert lisa == {"firstName": "Lisa", "lastName": "Simpson"}
+    assert bart == {"firstName": "Bart", "lastName": "Simpson"}
+    assert [ref.id for ref in fake_db.get_all.call_args.args[0]] == ["user-bart"]
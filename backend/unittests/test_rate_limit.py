@@ -0,0 +1,116 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import rate_limit as rate_limit_module
+from auth import get_current_user
+from rate_limit import InMemoryRateLimitStore, FirestoreRateLimitStore, parse_limit, rate_limit
+
+
+@pytest.fixture
+def limited_app(monkeypatch):
+    monkeypatch.setattr(rate_limit_module.settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit_module.settings, "RATE_LIMITS", {"like": "2/minute"})
+    monkeypatch.setattr(rate_limit_module, "_store", InMemoryRateLimitStore())
+
+    app = FastAPI()
+    user = {"id": "user-1"}
+
+    @app.post("/posts/{post_id}/like", dependencies=[Depends(rate_limit("like"))])
+    async def like(post_id: str):
+        return {"ok": True}
+
+    @app.get("/unlimited", dependencies=[Depends(rate_limit("unconfigured"))])
+    async def unlimited():
+        return {"ok": True}
+
+    app.dependency_overrides[get_current_user] = lambda: user["id"]
+    return TestClient(app), user
+
+
+def test_parse_limit():
+    assert parse_limit("30/minute") == (30, 0.5)
+    assert parse_limit(" 5 / second ") == (5, 5.0)
+    with pytest.raises(ValueError):
+        parse_limit("30 per minute")
+
+
+def test_bucket_exhaustion_returns_429_with_retry_after(limited_app):
+    client, _ = limited_app
+
+    assert client.post("/posts/p1/like").status_code == 200
+    assert client.post("/posts/p2/like").status_code == 200
+    response = client.post("/posts/p1/like")
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+
+def test_buckets_are_per_user(limited_app):
+    client, user = limited_app
+    for _ in range(2):
+        client.post("/posts/p1/like")
+
+    user["id"] = "user-2"
+    assert client.post("/posts/p1/like").status_code == 200
+
+
+def test_unconfigured_bucket_is_not_limited(limited_app):
+    client, _ = limited_app
+    for _ in range(5):
+        assert client.get("/unlimited").status_code == 200
+
+
+def test_disabled_limits_allow_everything(limited_app, monkeypatch):
+    client, _ = limited_app
+    monkeypatch.setattr(rate_limit_module.settings, "RATE_LIMIT_ENABLED", False)
+    for _ in range(5):
+        assert client.post("/posts/p1/like").status_code == 200
+
+
+def test_in_memory_bucket_refills_over_time(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr(rate_limit_module.time, "monotonic", lambda: clock["now"])
+    store = InMemoryRateLimitStore()
+
+    assert store.consume("k", 1, 0.5) == (True, 0.0)
+    allowed, retry_after = store.consume("k", 1, 0.5)
+    assert not allowed and retry_after == pytest.approx(2.0)
+
+    clock["now"] += 2.0
+    assert store.consume("k", 1, 0.5)[0]
+
+
+def test_in_memory_store_drops_least_recently_used_buckets():
+    store = InMemoryRateLimitStore(max_size=2)
+    store.consume("a", 1, 0.0)
+    store.consume("b", 1, 0.0)
+    store.consume("a", 1, 0.0)
+    store.consume("c", 1, 0.0)
+
+    assert list(store._buckets) == ["a", "c"]
+
+
+def test_firestore_store_persists_bucket_state(monkeypatch):
+    monkeypatch.setattr(rate_limit_module.firestore, "transactional", lambda fn: fn)
+    monkeypatch.setattr(rate_limit_module.time, "time", lambda: 1000.0)
+    snap = MagicMock(exists=True)
+    snap.to_dict.return_value = {"tokens": 0.25, "updatedAt": 999.0}
+    bucket_ref = MagicMock()
+    bucket_ref.get.return_value = snap
+    fake_db = MagicMock()
+    fake_db.collection.return_value.document.return_value = bucket_ref
+    transaction = fake_db.transaction.return_value
+    monkeypatch.setattr(rate_limit_module, "get_db", lambda: fake_db)
+
+    # 1s at 0.5 tokens/s refills 0.25 -> 0.75, still short of a whole token
+    allowed, retry_after = FirestoreRateLimitStore().consume("like:user-1", 30, 0.5)
+
+    assert not allowed
+    assert retry_after == pytest.approx(0.5)
+    fake_db.collection.assert_called_with("rate_limits")
+    written = transaction.set.call_args[0][1]
+    assert written["tokens"] == pytest.approx(0.75)
+    assert written["updatedAt"] == 1000.0
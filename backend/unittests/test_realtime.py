@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from services import realtime
+from utils.cursors import encode_cursor
+
+T0 = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def realtime_settings(monkeypatch):
+    monkeypatch.setattr(realtime.settings, "REALTIME_SUBSCRIBER_QUEUE_SIZE", 3)
+    monkeypatch.setattr(realtime.settings, "REALTIME_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(realtime.settings, "REALTIME_MAX_LISTENERS", 2)
+    monkeypatch.setattr(realtime, "hub", realtime.RealtimeHub())
+
+
+class FakeListener:
+    """Stands in for query.on_snapshot: records publish so tests can push events."""
+
+    def __init__(self):
+        self.publish = None
+        self.starts = 0
+        self.watch = MagicMock()
+
+    def __call__(self, publish):
+        self.publish = publish
+        self.starts += 1
+        return self.watch
+
+
+def _message(message_id, minutes):
+    return realtime.Event("message", {"messageId": message_id}, (T0 + timedelta(minutes=minutes), message_id))
+
+
+async def _take(stream, count):
+    chunks = []
+    async for chunk in stream:
+        if chunk != realtime.HEARTBEAT:
+            chunks.append(chunk)
+        if len(chunks) == count:
+            break
+    return chunks
+
+
+def test_subscribers_share_one_listener_until_the_last_leaves():
+    async def scenario():
+        listener = FakeListener()
+        first = realtime.hub.subscribe("conversation:c1", listener)
+        second = realtime.hub.subscribe("conversation:c1", listener)
+        listener.publish([_message("m1", 1)])
+        await asyncio.sleep(0)
+
+        assert listener.starts == 1
+        assert first.queue.get_nowait().doc_id == "m1"
+        assert second.queue.get_nowait().doc_id == "m1"
+
+        realtime.hub.unsubscribe("conversation:c1", first)
+        listener.watch.unsubscribe.assert_not_called()
+        realtime.hub.unsubscribe("conversation:c1", second)
+        listener.watch.unsubscribe.assert_called_once()
+        assert realtime.hub.listener_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_listener_cap_rejects_new_channels_with_503():
+    async def scenario():
+        realtime.hub.subscribe("a", FakeListener())
+        realtime.hub.subscribe("b", FakeListener())
+        with pytest.raises(HTTPException) as exc:
+            realtime.hub.subscribe("c", FakeListener())
+        assert exc.value.status_code == 503
+        # Joining an existing channel needs no new listener
+        realtime.hub.subscribe("a", FakeListener())
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_gets_resync_with_its_last_cursor():
+    async def scenario():
+        listener = FakeListener()
+        subscriber = realtime.hub.subscribe("conversation:c1", listener)
+        listener.publish([_message(f"m{i}", i) for i in range(5)])
+        await asyncio.sleep(0)
+
+        last = (T0, "seen")
+        chunks = [chunk async for chunk in realtime._pump("conversation:c1", subscriber, last)]
+
+        assert len(chunks) == 1
+        assert chunks[0].startswith("event: resync")
+        assert encode_cursor(*last) in chunks[0]
+
+    asyncio.run(scenario())
+
+
+def test_conversation_stream_backfills_from_cursor_then_skips_the_overlap(monkeypatch):
+    listener = FakeListener()
+    monkeypatch.setattr(realtime.conversation_service, "get_conversation_by_id", AsyncMock())
+    monkeypatch.setattr(realtime, "get_db", lambda: MagicMock())
+    monkeypatch.setattr(realtime, "_watch_messages", lambda db, conversation_id, since: listener)
+    monkeypatch.setattr(realtime, "_messages_after", lambda db, conversation_id, after: [_message("m2", 2), _message("m3", 3)])
+
+    async def scenario():
+        stream = await realtime.conversation_event_stream("c1", "user-a", encode_cursor(T0 + timedelta(minutes=1), "m1"))
+        first = await _take(stream, 2)
+        # m3 arrived on the listener too; m1 is older than the cursor
+        listener.publish([_message("m1", 1), _message("m3", 3), _message("m4", 4)])
+        rest = await _take(stream, 1)
+        await stream.aclose()
+        return first + rest
+
+    chunks = asyncio.run(scenario())
+
+    assert ['"m2"' in chunks[0], '"m3"' in chunks[1], '"m4"' in chunks[2]] == [True, True, True]
+    assert chunks[0].startswith(f"id: {encode_cursor(T0 + timedelta(minutes=2), 'm2')}\nevent: message\n")
+    listener.watch.unsubscribe.assert_called_once()
+
+
+def test_inbox_late_joiner_gets_current_page_after_its_cursor():
+    async def scenario():
+        listener = FakeListener()
+        realtime.hub.subscribe("inbox:u1", listener, keep_state=True)
+        listener.publish([
+            realtime.Event("conversation", {"conversationId": "old"}, (T0, "old")),
+            realtime.Event("conversation", {"conversationId": "new"}, (T0 + timedelta(hours=1), "new")),
+            realtime.Event("conversation", {"conversationId": "gone"}, (T0 + timedelta(hours=2), "gone")),
+        ])
+        listener.publish([realtime.Event("conversation_removed", {"conversationId": "gone"}, (T0 + timedelta(hours=2), "gone"))])
+        await asyncio.sleep(0)
+
+        late = realtime.hub.subscribe("inbox:u1", listener, keep_state=True, replay_after=(T0, "old"))
+        replayed = [late.queue.get_nowait().doc_id for _ in range(late.queue.qsize())]
+        assert replayed == ["new"]
+
+    asyncio.run(scenario())
+
+
+def test_inbox_events_are_keyed_on_the_document_write_time():
+    # Marking a conversation read changes the doc but not updatedAt
+    doc = MagicMock(id="c1", update_time=T0 + timedelta(minutes=5))
+    doc.to_dict.return_value = {
+        "participant_ids": ["u1", "u2"], "createdAt": T0, "updatedAt": T0, "unread_counts": {"u1": 0},
+    }
+
+    event = realtime._conversation_event(doc)
+    assert event.key == (T0 + timedelta(minutes=5), "c1")
+    assert event.key > (T0 + timedelta(minutes=1), "c1")
+
+    removed = realtime._conversation_event(doc, removed=True, read_time=T0 + timedelta(minutes=6))
+    assert removed.name == "conversation_removed"
+    assert removed.key == (T0 + timedelta(minutes=6), "c1")
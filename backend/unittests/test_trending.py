@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from services import trending_service
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def trending_settings(monkeypatch):
+    monkeypatch.setattr(trending_service.settings, "TRENDING_HALF_LIFE_HOURS", 6.0)
+    monkeypatch.setattr(trending_service.settings, "TRENDING_MIN_SCORE", 0.01)
+    monkeypatch.setattr(trending_service.firestore, "transactional", lambda fn: fn)
+
+
+def test_score_halves_every_half_life():
+    assert trending_service.decay(8.0, NOW - timedelta(hours=12), NOW) == pytest.approx(2.0)
+    assert trending_service.decay(8.0, None, NOW) == 8.0
+    assert trending_service.current_score({}, NOW) == 0.0
+
+
+def test_like_delta_is_added_to_the_decayed_score():
+    post_ref = MagicMock()
+    post_ref.get.return_value = MagicMock(
+        exists=True,
+        **{"to_dict.return_value": {"trendingScore": 4.0, "trendingUpdatedAt": datetime.now(timezone.utc) - timedelta(hours=6)}},
+    )
+    fake_db = MagicMock()
+    transaction = fake_db.transaction.return_value
+
+    assert trending_service.apply_like_delta(fake_db, post_ref, likes=12, like_delta=3) is True
+
+    written = transaction.update.call_args.args[1]
+    assert written["likes"] == 12
+    assert written["trendingScore"] == pytest.approx(5.0, rel=1e-3)
+
+
+def test_unlikes_never_make_the_score_negative():
+    post_ref = MagicMock()
+    post_ref.get.return_value = MagicMock(exists=True, **{"to_dict.return_value": {"trendingScore": 0.5}})
+    fake_db = MagicMock()
+
+    trending_service.apply_like_delta(fake_db, post_ref, likes=0, like_delta=-2)
+
+    assert fake_db.transaction.return_value.update.call_args.args[1]["trendingScore"] == 0.0
+
+
+def test_like_delta_on_deleted_post_is_skipped():
+    post_ref = MagicMock()
+    post_ref.get.return_value = MagicMock(exists=False)
+    fake_db = MagicMock()
+
+    assert trending_service.apply_like_delta(fake_db, post_ref, likes=1, like_delta=1) is False
+    fake_db.transaction.return_value.update.assert_not_called()
+
+
+def test_sweep_decays_scores_and_skips_concurrently_updated_posts():
+    stale = MagicMock(**{"to_dict.return_value": {"trendingScore": 2.0, "trendingUpdatedAt": datetime.now(timezone.utc) - timedelta(hours=6)}})
+    cold = MagicMock(**{"to_dict.return_value": {"trendingScore": 0.011, "trendingUpdatedAt": datetime.now(timezone.utc) - timedelta(hours=6)}})
+    raced = MagicMock(**{"to_dict.return_value": {"trendingScore": 1.0}})
+    raced.reference.update.side_effect = api_exceptions.FailedPrecondition("changed")
+    fake_db = MagicMock()
+    fake_db.collection.return_value.where.return_value.stream.return_value = [stale, cold, raced]
+
+    assert trending_service.decay_trending_scores(fake_db) == 2
+
+    assert stale.reference.update.call_args.args[0]["trendingScore"] == pytest.approx(1.0, rel=1e-3)
+    assert cold.reference.update.call_args.args[0]["trendingScore"] == 0.0
+    fake_db.write_option.assert_any_call(last_update_time=stale.update_time)
+
+
+def _doc(post_id, score, lat, lng, hours_ago=0):
+    data = {
+        "postId": post_id,
+        "userId": "author",
+        "firstName": "A",
+        "lastName": "B",
+        "title": "t",
+        "body": "b",
+        "postType": "looking_to_jam",
+        "edited": False,
+        "likes": 1,
+        "createdAt": NOW,
+        "updatedAt": NOW,
+        "location": {"lat": lat, "lng": lng},
+        "trendingScore": score,
+        "trendingUpdatedAt": datetime.now(timezone.utc) - timedelta(hours=hours_ago),
+    }
+    return MagicMock(id=post_id, **{"to_dict.return_value": data})
+
+
+def _lease_db(lease):
+    fake_db = MagicMock()
+    lease_ref = fake_db.collection.return_value.document.return_value
+    lease_ref.get.return_value = MagicMock(exists=lease is not None, **{"to_dict.return_value": lease})
+    return fake_db, fake_db.transaction.return_value
+
+
+def test_decay_lease_is_taken_when_free_or_expired_and_renewed_by_its_holder():
+    expired = {"holder": "other", "expiresAt": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    live_own = {"holder": "me", "expiresAt": datetime.now(timezone.utc) + timedelta(minutes=5)}
+    for lease in (None, expired, live_own):
+        fake_db, transaction = _lease_db(lease)
+        assert trending_service.claim_decay_lease(fake_db, worker_id="me") is True
+        assert transaction.set.call_args.args[1]["holder"] == "me"
+
+
+def test_decay_lease_held_by_another_live_worker_skips_the_sweep(monkeypatch):
+    fake_db, transaction = _lease_db({"holder": "other", "expiresAt": datetime.now(timezone.utc) + timedelta(minutes=5)})
+    monkeypatch.setattr(trending_service, "get_db", lambda: fake_db)
+    sweep = MagicMock()
+    monkeypatch.setattr(trending_service, "decay_trending_scores", sweep)
+
+    assert trending_service._decay_if_leased() == 0
+    transaction.set.assert_not_called()
+    sweep.assert_not_called()
+
+
+def test_trending_near_a_point_queries_geocells_and_reranks(monkeypatch):
+    monkeypatch.setattr(trending_service.settings, "GEOHASH_PREFIX_QUERIES", True)
+    docs = [
+        _doc("old-hot", 10.0, 44.05, -123.09, hours_ago=24),  # 10 / 16 = 0.625 now
+        _doc("fresh", 2.0, 44.05, -123.09),
+        _doc("far", 5.0, 45.5, -122.6),
+    ]
+    fake_db = MagicMock()
+    query = fake_db.collection.return_value.where.return_value
+    query.order_by.return_value.limit.return_value.stream.return_value = docs
+    fake_db.get_all.return_value = []
+    monkeypatch.setattr(trending_service, "get_db", lambda: fake_db)
+
+    result = asyncio.run(trending_service.list_trending_posts("viewer", 5, 44.05, -123.09, 10))
+
+    assert [p["postId"] for p in result["posts"]] == ["fresh", "old-hot"]
+    field_filter = fake_db.collection.return_value.where.call_args.kwargs["filter"]
+    assert field_filter.field_path.startswith("location.geohashPrefixes.p")
+    assert field_filter.op_string == "in"
+    query.order_by.assert_called_once_with("trendingScore", direction=trending_service.firestore.Query.DESCENDING)
@@ -0,0 +1,80 @@
+import asyncio
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+from models import Location
+from utils import zip_index
+from utils.location import haversine_miles
+from utils.zip_index import ZipKDTree, nearest_zip
+
+
+def _location(zip_code, lat, lng):
+    return Location(zipCode=zip_code, lat=lat, lng=lng, geohash="x")
+
+
+@pytest.fixture(autouse=True)
+def reset_index(monkeypatch):
+    monkeypatch.setattr(zip_index, "_index", None)
+    monkeypatch.setattr(zip_index, "_index_built_at", 0.0)
+    monkeypatch.setattr(zip_index, "_refresh", None)
+
+
+def test_kd_tree_matches_brute_force():
+    rng = random.Random(7)
+    locations = [
+        _location(f"{i:05d}", rng.uniform(25, 49), rng.uniform(-124, -67))
+        for i in range(300)
+    ]
+    tree = ZipKDTree(locations)
+
+    for _ in range(25):
+        lat, lng = rng.uniform(25, 49), rng.uniform(-124, -67)
+        expected = sorted(locations, key=lambda loc: haversine_miles(lat, lng, loc.lat, loc.lng))[:3]
+        result = tree.query(lat, lng, k=3)
+        assert [loc.zip_code for _, loc in result] == [loc.zip_code for loc in expected]
+        assert result[0][0] <= result[1][0] <= result[2][0]
+
+
+def test_kd_tree_empty_returns_no_matches():
+    assert ZipKDTree([]).query(45.5, -122.7) == []
+
+
+def test_nearest_zip_skips_negative_cache_entries(monkeypatch):
+    docs = [
+        MagicMock(to_dict=MagicMock(return_value={"zipCode": "97209", "lat": 45.53, "lng": -122.69, "geohash": "c20fb"})),
+        MagicMock(to_dict=MagicMock(return_value={"zipCode": "98101", "lat": 47.61, "lng": -122.33, "geohash": "c23nb"})),
+        MagicMock(to_dict=MagicMock(return_value={"status": "ZERO_RESULTS", "expiresAt": None})),
+    ]
+    fake_db = MagicMock()
+    fake_db.collection.return_value.stream.return_value = docs
+    monkeypatch.setattr(zip_index, "get_db", lambda: fake_db)
+
+    result = asyncio.run(nearest_zip(45.5, -122.7))
+
+    assert result.zip_code == "97209"
+
+
+def test_stale_index_keeps_serving_while_one_rebuild_runs(monkeypatch):
+    stale = ZipKDTree([_location("97209", 45.53, -122.69)])
+    monkeypatch.setattr(zip_index, "_index", stale)
+    monkeypatch.setattr(zip_index, "_index_built_at", -1e9)
+    loads = []
+
+    def _load():
+        loads.append(1)
+        return [_location("98101", 47.61, -122.33)]
+
+    monkeypatch.setattr(zip_index, "_load_cached_locations", _load)
+
+    async def scenario():
+        served = [await zip_index.get_zip_index(), await zip_index.get_zip_index()]
+        await zip_index._refresh
+        return served
+
+    served = asyncio.run(scenario())
+
+    assert served == [stale, stale]
+    assert loads == [1]
+    assert zip_index._index.query(47.6, -122.3)[0][1].zip_code == "98101"
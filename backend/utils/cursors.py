@@ -0,0 +1,26 @@
+"""
+Opaque keyset pagination cursors.
+
+A cursor carries the sort value and document ID of the last item on a page, so the next page is
+a start_after() on the same ordered query: no read of the cursor document, and stable even if
+that document has since moved in the ordering.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    payload = json.dumps({"t": sort_value.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Optional[tuple[datetime, str]]:
+    """Return (sort_value, doc_id), or None if token isn't a cursor (e.g. a bare document ID)."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return None
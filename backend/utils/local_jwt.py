@@ -0,0 +1,71 @@
+"""
+Local stand-in for Firebase ID tokens, for load testing authenticated endpoints offline.
+
+Tokens are RS256 JWTs signed with a local keypair. When LOAD_TEST_JWT_PUBLIC_KEY_PATH is set,
+get_current_user verifies bearer tokens against that public key instead of Firebase Auth, so
+benchmarks can drive thousands of distinct synthetic users through the real auth, caching and
+access-control paths. WARNING: never configure the public key in production.
+"""
+import time
+from typing import Tuple
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from firebase_admin import auth
+from google.auth import crypt, jwt
+
+LOAD_TEST_ISSUER = "jam-find-load-test"
+LOAD_TEST_AUDIENCE = "jam-find-api"
+
+
+def generate_keypair() -> Tuple[bytes, bytes]:
+    """Return a new (private_key_pem, public_key_pem) RSA keypair."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem, public_pem
+
+
+class LocalTokenIssuer:
+    """Mints ID-token-shaped JWTs for synthetic users."""
+
+    def __init__(self, private_key_pem: bytes):
+        self._signer = crypt.RSASigner.from_string(private_key_pem)
+
+    def mint(self, uid: str, ttl_seconds: int = 3600) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": LOAD_TEST_ISSUER,
+            "aud": LOAD_TEST_AUDIENCE,
+            "sub": uid,
+            "iat": now,
+            "exp": now + ttl_seconds,
+        }
+        return jwt.encode(self._signer, payload).decode()
+
+
+class LocalTokenVerifier:
+    """Drop-in for firebase_admin.auth.verify_id_token that checks tokens from LocalTokenIssuer.
+    Raises the same Firebase error types so get_current_user's error mapping is unchanged."""
+
+    def __init__(self, public_key_pem: bytes):
+        self._public_key_pem = public_key_pem
+
+    def __call__(self, token: str, check_revoked: bool = False) -> dict:
+        try:
+            claims = jwt.decode(token, certs=self._public_key_pem, audience=LOAD_TEST_AUDIENCE)
+        except ValueError as e:
+            if "Token expired" in str(e):
+                raise auth.ExpiredIdTokenError(str(e), cause=e)
+            raise auth.InvalidIdTokenError(str(e), cause=e)
+        if claims.get("iss") != LOAD_TEST_ISSUER or not claims.get("sub"):
+            raise auth.InvalidIdTokenError("Token was not issued by the local load-test issuer")
+        # Local tokens are never revoked; check_revoked is accepted for signature compatibility
+        claims["uid"] = claims["sub"]
+        return claims
@@ -2,6 +2,7 @@ import re
 import math
 import pygeohash as pgh
 import httpx
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from starlette.concurrency import run_in_threadpool
 from firebase_config import get_db
@@ -10,6 +11,18 @@ from config import settings
 
 LOCATION_CACHE_COLLECTION = "location_cache"
 
+# Geocoding statuses that are worth retrying later. Anything else (REQUEST_DENIED,
+# INVALID_REQUEST) is a configuration problem and is surfaced immediately, uncached.
+_TRANSIENT_GEOCODING_STATUSES = {"OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class GeocodingUnavailableError(RuntimeError):
+    """Raised while a ZIP is in backoff after a quota or transient Geocoding failure."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 # Accepts 5-digit ZIP (e.g. "97209") or ZIP+4 (e.g. "97209-1234")
 _ZIP_RE = re.compile(r"^\d{5}(?:-\d{4})?$")
 
@@ -24,6 +37,59 @@ def calculate_geohash(lat: float, lng: float, precision: int = 5) -> str:
     """Calculate geohash from latitude and longitude"""
     return pgh.encode(lat, lng, precision=precision)
 
+# Precisions stored under location.geohashPrefixes as {"p3": ..., "p7": ...}.
+# p3 cells are ~97 miles tall, p7 cells ~0.1 miles, so radius queries always have a fitting level.
+GEOHASH_PREFIX_PRECISIONS = (3, 4, 5, 6, 7)
+
+def geohash_prefixes(lat: float, lng: float) -> dict[str, str]:
+    """Return the geohash cell containing lat/lng at every stored precision, keyed 'p{precision}'."""
+    full = pgh.encode(lat, lng, precision=max(GEOHASH_PREFIX_PRECISIONS))
+    return {f"p{precision}": full[:precision] for precision in GEOHASH_PREFIX_PRECISIONS}
+
+def add_geohash_fields(location: Optional[dict]) -> Optional[dict]:
+    """Stamp geohash and geohashPrefixes onto a camelCase location dict that has coordinates."""
+    if not location or location.get("lat") is None or location.get("lng") is None:
+        return location
+    location["geohash"] = calculate_geohash(location["lat"], location["lng"])
+    location["geohashPrefixes"] = geohash_prefixes(location["lat"], location["lng"])
+    return location
+
+def _geohash_cell_miles(precision: int, lat: float) -> tuple[float, float]:
+    """Approximate (height, width) in miles of a geohash cell at the given latitude."""
+    bits = 5 * precision
+    lat_bits = bits // 2
+    lng_bits = bits - lat_bits
+    height = 180.0 / (2 ** lat_bits) * 69.0
+    width = 360.0 / (2 ** lng_bits) * 69.0 * math.cos(math.radians(lat))
+    return height, width
+
+def geohash_cover(lat: float, lng: float, radius_miles: float) -> Optional[tuple[int, list[str]]]:
+    """
+    Choose the finest stored precision whose cells are at least radius_miles on each side and
+    return (precision, [centre cell + 8 neighbours]). That 3x3 block always contains the whole
+    search circle, so it can be queried with a single equality 'in' filter.
+
+    Returns None when even the coarsest cell is too small (huge radius, or close to a pole).
+    """
+    # Cells narrow towards the poles, so size them at the poleward edge of the search area
+    edge_lat = min(abs(lat) + radius_miles / 69.0, 90.0)
+    for precision in sorted(GEOHASH_PREFIX_PRECISIONS, reverse=True):
+        height, width = _geohash_cell_miles(precision, edge_lat)
+        if min(height, width) >= radius_miles:
+            centre = pgh.encode(lat, lng, precision=precision)
+            try:
+                north, south = pgh.get_adjacent(centre, "top"), pgh.get_adjacent(centre, "bottom")
+                cells = [
+                    north, centre, south,
+                    pgh.get_adjacent(north, "right"), pgh.get_adjacent(centre, "right"), pgh.get_adjacent(south, "right"),
+                    pgh.get_adjacent(north, "left"), pgh.get_adjacent(centre, "left"), pgh.get_adjacent(south, "left"),
+                ]
+            except ValueError:
+                # pygeohash can't step across the poles or the antimeridian
+                return None
+            return precision, list(dict.fromkeys(cells))
+    return None
+
 # Haversine distance in miles between two lat/lng points using pygeohash's implementation.
 # https://pygeohash.mcginniscommawill.com/examples.html#distance-calculations
 def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
@@ -47,14 +113,46 @@ def bounding_box_from_miles(lat: float, lng: float, radius_miles: float) -> tupl
     # Clamp lat to valid range — large radius near a pole can otherwise exceed ±90.
     return max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0), min_lng, max_lng
 
+def _negative_cache_entry(status: str, ttl_seconds: int, error: Optional[str] = None) -> dict:
+    """Build a location_cache document recording a failed lookup until it expires."""
+    return {
+        "status": status,
+        "error": error,
+        "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+    }
+
+
+def _read_negative_cache_entry(zip_code: str, data: dict) -> Optional[bool]:
+    """
+    Interpret a negative cache entry.
+
+    Returns True for a live ZERO_RESULTS entry, raises GeocodingUnavailableError for a live
+    backoff entry, and returns None when the entry has expired and the API should be retried.
+    """
+    expires_at = data.get("expiresAt")
+    now = datetime.now(timezone.utc)
+    if expires_at is None or expires_at <= now:
+        return None
+    if data.get("status") == "ZERO_RESULTS":
+        return True
+    retry_after = max(int((expires_at - now).total_seconds()), 1)
+    raise GeocodingUnavailableError(
+        f"Geocoding temporarily unavailable for {zip_code}: {data.get('error') or data.get('status')}",
+        retry_after=retry_after,
+    )
+
+
 async def resolve_location_from_zip(zip_code: str) -> Optional[Location]:
     """
     Check Firestore cache for zip code data.
     If missing, fetch from Google Geocoding and update cache.
 
-    Returns None only when the zip code yields no geocoding results.
-    All other failures (network errors, Firestore errors, bad API key) propagate
-    as exceptions so callers can return accurate 4xx/5xx responses.
+    Returns None only when the zip code yields no geocoding results. That outcome is
+    cached for LOCATION_NEGATIVE_CACHE_TTL_SECONDS so repeated bad ZIPs don't hit the API.
+    Quota and transient failures raise GeocodingUnavailableError, and are cached for
+    LOCATION_ERROR_BACKOFF_SECONDS so later requests get the same error without calling the API.
+    All other failures (Firestore errors, bad API key) propagate as exceptions so callers can
+    return accurate 4xx/5xx responses.
     """
     zip_code = normalize_zip_code(zip_code)
     db = get_db()
@@ -63,30 +161,59 @@ async def resolve_location_from_zip(zip_code: str) -> Optional[Location]:
     # Firestore client is synchronous — run in threadpool to avoid blocking the event loop
     cached = await run_in_threadpool(cache_ref.get)
     if cached.exists:
-        # We use the cached data exists
-        return Location(**cached.to_dict())
+        cached_data = cached.to_dict()
+        if "status" not in cached_data:
+            # We use the cached data exists
+            return Location(**cached_data)
+        if _read_negative_cache_entry(zip_code, cached_data):
+            return None
 
     # Cache miss: Call Google Maps
     if not getattr(settings, "GOOGLE_MAPS_API_KEY", None):
         raise RuntimeError("Google Maps API key not configured")
 
-    async with httpx.AsyncClient(timeout=settings.GOOGLE_MAPS_API_TIMEOUT) as client:
-        response = await client.get(
-            "https://maps.googleapis.com/maps/api/geocode/json",
-            params={"address": zip_code, "key": settings.GOOGLE_MAPS_API_KEY},
+    async def _back_off(error: str) -> GeocodingUnavailableError:
+        """Cache the backoff entry; returns the error to raise, so this request gets a 503 too."""
+        await run_in_threadpool(
+            cache_ref.set,
+            _negative_cache_entry("ERROR", settings.LOCATION_ERROR_BACKOFF_SECONDS, error),
+        )
+        return GeocodingUnavailableError(
+            f"Geocoding temporarily unavailable for {zip_code}: {error}",
+            retry_after=settings.LOCATION_ERROR_BACKOFF_SECONDS,
         )
-    response.raise_for_status()
+
+    try:
+        async with httpx.AsyncClient(timeout=settings.GOOGLE_MAPS_API_TIMEOUT) as client:
+            response = await client.get(
+                "https://maps.googleapis.com/maps/api/geocode/json",
+                params={"address": zip_code, "key": settings.GOOGLE_MAPS_API_KEY},
+            )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        # 4xx means our request is wrong; only server-side failures are worth backing off on
+        if e.response.status_code >= 500:
+            raise await _back_off(f"HTTP {e.response.status_code}") from e
+        raise
+    except httpx.TransportError as e:
+        raise await _back_off(type(e).__name__) from e
 
     data = response.json()
     api_status = data.get("status")
-    if api_status != "OK":
+    if api_status not in ("OK", "ZERO_RESULTS"):
         error_message = data.get("error_message", "Unknown error from Google Geocoding API")
+        if api_status in _TRANSIENT_GEOCODING_STATUSES:
+            raise await _back_off(api_status)
         raise RuntimeError(
             f"Google Geocoding API error for {zip_code}: {api_status}: {error_message}"
         )
 
     results = data.get("results")
     if not results:
+        await run_in_threadpool(
+            cache_ref.set,
+            _negative_cache_entry("ZERO_RESULTS", settings.LOCATION_NEGATIVE_CACHE_TTL_SECONDS),
+        )
         return None
 
     result = results[0]
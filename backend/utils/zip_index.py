@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import math
+import time
+from typing import List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from firebase_config import get_db
+from models import Location
+from config import settings
+from utils.location import LOCATION_CACHE_COLLECTION
+
+EARTH_RADIUS_MILES = 3958.8
+
+def _to_unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    """Project lat/lng onto the unit sphere so straight-line distance orders like great-circle distance."""
+    lat_r, lng_r = math.radians(lat), math.radians(lng)
+    cos_lat = math.cos(lat_r)
+    return (cos_lat * math.cos(lng_r), cos_lat * math.sin(lng_r), math.sin(lat_r))
+
+def _chord_sq_to_miles(chord_sq: float) -> float:
+    """Convert a squared chord length on the unit sphere to a great-circle distance in miles."""
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(math.sqrt(chord_sq) / 2, 1.0))
+
+
+class ZipKDTree:
+    """Static 3-d tree over ZIP centroids. Rebuilt wholesale rather than updated in place."""
+
+    def __init__(self, locations: List[Location]):
+        points = [
+            (_to_unit_vector(loc.lat, loc.lng), loc)
+            for loc in locations
+            if loc.lat is not None and loc.lng is not None
+        ]
+        self.size = len(points)
+        self._root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        return (
+            points[mid][0],
+            points[mid][1],
+            axis,
+            self._build(points[:mid], depth + 1),
+            self._build(points[mid + 1:], depth + 1),
+        )
+
+    def query(self, lat: float, lng: float, k: int = 1) -> List[Tuple[float, Location]]:
+        """Return up to k (distance_miles, Location) pairs, nearest first."""
+        target = _to_unit_vector(lat, lng)
+        # Max-heap on squared chord length; the counter breaks ties without comparing Locations.
+        best: List[Tuple[float, int, Location]] = []
+        counter = 0
+
+        def _search(node):
+            nonlocal counter
+            if node is None:
+                return
+            point, loc, axis, left, right = node
+            dist_sq = sum((t - p) ** 2 for t, p in zip(target, point))
+            if len(best) < k:
+                heapq.heappush(best, (-dist_sq, counter, loc))
+                counter += 1
+            elif dist_sq < -best[0][0]:
+                heapq.heapreplace(best, (-dist_sq, counter, loc))
+                counter += 1
+
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            _search(near)
+            # Only cross the splitting plane if it is closer than the current k-th best
+            if len(best) < k or diff * diff < -best[0][0]:
+                _search(far)
+
+        _search(self._root)
+        ordered = sorted(best, key=lambda item: -item[0])
+        return [(_chord_sq_to_miles(-neg_dist_sq), loc) for neg_dist_sq, _, loc in ordered]
+
+
+_index: Optional[ZipKDTree] = None
+_index_built_at: float = 0.0
+# The rebuild in progress, if any; requests keep using _index until it replaces it
+_refresh: Optional["asyncio.Task[ZipKDTree]"] = None
+_index_lock = asyncio.Lock()
+
+def _load_cached_locations() -> List[Location]:
+    """Read every resolved ZIP from location_cache, skipping negative cache entries."""
+    db = get_db()
+    locations = []
+    for doc in db.collection(LOCATION_CACHE_COLLECTION).stream():
+        data = doc.to_dict()
+        if "status" in data:
+            continue
+        locations.append(Location(**data))
+    return locations
+
+async def _rebuild_index() -> ZipKDTree:
+    global _index, _index_built_at
+    locations = await run_in_threadpool(_load_cached_locations)
+    # Tree construction is CPU-bound; keep it off the event loop as well
+    index = await run_in_threadpool(ZipKDTree, locations)
+    _index, _index_built_at = index, time.monotonic()
+    return index
+
+def _refresh_done(task: "asyncio.Task[ZipKDTree]") -> None:
+    global _refresh
+    _refresh = None
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Warning: failed to rebuild ZIP index: {str(task.exception())}")
+
+async def get_zip_index() -> ZipKDTree:
+    """
+    Return the process-wide ZIP index. Once it is older than ZIP_INDEX_REFRESH_SECONDS a single
+    rebuild starts in the background and the current index keeps serving until it is replaced;
+    only a cold start waits for the build.
+    """
+    global _refresh
+    async with _index_lock:
+        stale = _index is None or time.monotonic() - _index_built_at > settings.ZIP_INDEX_REFRESH_SECONDS
+        if stale and _refresh is None:
+            _refresh = asyncio.create_task(_rebuild_index())
+            _refresh.add_done_callback(_refresh_done)
+        index, refresh = _index, _refresh
+    if index is None:
+        return await refresh
+    return index
+
+async def nearest_zips(lat: float, lng: float, k: int = 1) -> List[Tuple[float, Location]]:
+    """Return the k known ZIP centroids nearest to lat/lng as (distance_miles, Location) pairs."""
+    index = await get_zip_index()
+    return index.query(lat, lng, k)
+
+async def nearest_zip(lat: float, lng: float) -> Optional[Location]:
+    """Reverse-geocode lat/lng to the nearest known ZIP without calling the Geocoding API."""
+    matches = await nearest_zips(lat, lng, k=1)
+    return matches[0][1] if matches else None